@@ -0,0 +1,130 @@
+from collections import deque
+import threading
+import time
+import uuid
+
+from agents.sender_agent import send_message_to_robot
+from utils.log_utils import bump_version, BROADCAST_PANEL
+from utils.state_store import ingest_action
+from utils.runtime import runtime
+
+from config import ACK_TIMEOUT_SECONDS, ACK_LATENCY_HISTORY
+
+# Commands sent with `broadcast_command` carry a `correlation_id` metadata
+# field; robots answer with a message of type "ack" echoing it. Round trips
+# are measured from the moment each message is actually sent.
+_broadcasts = {}
+_latest = {}
+_latencies = {}
+_lock = threading.Lock()
+
+
+class Broadcast:
+    def __init__(self, correlation_id, command, robot_ids):
+        self.correlation_id = correlation_id
+        self.command = command
+        self.robot_ids = list(robot_ids)
+        self.created_at = time.monotonic()
+        self.sent_at = {}
+        self.acked_at = {}
+
+    def round_trip(self, robot_id):
+        if robot_id in self.acked_at and robot_id in self.sent_at:
+            return self.acked_at[robot_id] - self.sent_at[robot_id]
+        return None
+
+    def status(self, robot_id):
+        if robot_id in self.acked_at:
+            return "acked"
+        if time.monotonic() - self.created_at > ACK_TIMEOUT_SECONDS:
+            return "timeout"
+        return "sent" if robot_id in self.sent_at else "queued"
+
+    def receive_spread(self):
+        """How far apart the robots got the command, or None until all acked.
+
+        Each robot's receive time is estimated as the middle of its round trip.
+        """
+        if len(self.acked_at) < len(self.robot_ids):
+            return None
+        received = [
+            self.sent_at[robot_id] + self.round_trip(robot_id) / 2
+            for robot_id in self.robot_ids
+        ]
+        return max(received) - min(received)
+
+
+@ingest_action
+def broadcast_command(robot_ids, command, msg_type="log"):
+    """Send `command` to every robot at once and track their acknowledgements."""
+    correlation_id = uuid.uuid4().hex
+    broadcast = Broadcast(correlation_id, command, robot_ids)
+    with _lock:
+        _broadcasts[correlation_id] = broadcast
+        _latest[command] = broadcast
+
+    for robot_id in broadcast.robot_ids:
+        send_message_to_robot(
+            robot_id,
+            command,
+            msg_type=msg_type,
+            metadata={"correlation_id": correlation_id},
+            on_sent=lambda _robot_id=robot_id: _mark_sent(broadcast, _robot_id),
+        )
+
+    bump_version(BROADCAST_PANEL)
+    # Refresh once more when unanswered robots turn into timeouts
+    runtime.call_later(ACK_TIMEOUT_SECONDS, _expire, correlation_id)
+    return broadcast
+
+def _mark_sent(broadcast, robot_id):
+    broadcast.sent_at.setdefault(robot_id, time.monotonic())
+    bump_version(BROADCAST_PANEL)
+
+def _expire(correlation_id):
+    with _lock:
+        broadcast = _broadcasts.pop(correlation_id, None)
+    if broadcast and len(broadcast.acked_at) < len(broadcast.robot_ids):
+        missing = [robot_id for robot_id in broadcast.robot_ids if robot_id not in broadcast.acked_at]
+        print(f"⚠️ No ack for '{broadcast.command}' from {', '.join(missing)}", flush=True)
+        bump_version(BROADCAST_PANEL)
+
+def handle_ack(robot_id, correlation_id):
+    """Match an "ack" message to its broadcast; returns the round trip in seconds."""
+    now = time.monotonic()
+    with _lock:
+        broadcast = _broadcasts.get(correlation_id)
+    if not broadcast or robot_id not in broadcast.robot_ids or robot_id in broadcast.acked_at:
+        return None
+
+    broadcast.acked_at[robot_id] = now
+    # Messages acked before the send callback ran fall back to creation time
+    broadcast.sent_at.setdefault(robot_id, broadcast.created_at)
+    round_trip = broadcast.round_trip(robot_id)
+    with _lock:
+        _latencies.setdefault(robot_id, deque(maxlen=ACK_LATENCY_HISTORY)).append(round_trip)
+
+    bump_version(BROADCAST_PANEL)
+    return round_trip
+
+@ingest_action
+def latest_broadcast(command):
+    return _latest.get(command)
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+@ingest_action
+def latency_percentiles(robot_id):
+    """p50/p90/p99 command round trip in seconds over the recent history."""
+    with _lock:
+        values = sorted(_latencies.get(robot_id, ()))
+    if not values:
+        return None
+    return {
+        "count": len(values),
+        "p50": _percentile(values, 0.50),
+        "p90": _percentile(values, 0.90),
+        "p99": _percentile(values, 0.99),
+    }
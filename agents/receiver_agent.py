@@ -1,70 +1,194 @@
 from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour
+from spade.template import Template
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
 from utils.log_utils import add_log, add_arm_log
-from utils.log_utils import latest_frames, latest_path_frames
+from utils.log_utils import set_frame, set_path_frame, add_path_points, set_cube_detections
+from utils.robot_registry import register_robot
+from agents.broadcast import handle_ack
+from utils.metrics import counter, gauge, histogram, SIZE_BUCKETS
+from utils.race_recorder import traffic_capture, XMPP
+from utils.runtime import runtime
 import asyncio
+import json
+import operator
 import spade
+import time
 import utils.connection_status as conn_status
+from config import TOP_CAMERA_NAME, RECEIVER_BATCH_SIZE, RECEIVER_WORKERS
+
+# Message types sent by the robots themselves, as opposed to the arm or the top camera
+ROBOT_MESSAGE_TYPES = {"image", "log", "cube_detection", "path_image", "path_points", "ack"}
+# Frame payloads are base64 in the message body
+FRAME_MESSAGE_TYPES = {"image", "path_image"}
+# Handled on the receiver's worker threads rather than the event loop
+OFFLOADED_MESSAGE_TYPES = {"image", "path_image", "cube_detection"}
+# Behaviour for the message types without a handler
+OTHER_TYPES = "other"
+
+XMPP_MESSAGES = counter("dashboard_xmpp_messages_total", "XMPP messages received", ["type"])
+XMPP_HANDLING = histogram("dashboard_xmpp_handling_seconds", "Time spent handling an XMPP message", ["type"])
+XMPP_BATCH = histogram("dashboard_xmpp_batch_size", "XMPP messages handled per wake-up", ["type"], buckets=(1, 2, 5, 10, 20, 50, 100))
+FRAME_BYTES = histogram("dashboard_frame_bytes", "Decoded size of received frames", ["type"], buckets=SIZE_BUCKETS)
+
+# Running receive behaviours by message type, for the backlog gauge
+_behaviours = {}
+
+gauge("dashboard_xmpp_backlog", "XMPP messages waiting for their receive behaviour", ["type"], collect=lambda: {
+    (msg_type,): behaviour.mailbox_size() for msg_type, behaviour in _behaviours.items()
+})
+
+def serialize_message(msg):
+    """Captured form of a message, rebuilt by `deserialize_message`."""
+    return json.dumps({"to": str(msg.to), "sender": str(msg.sender), "body": msg.body, "metadata": dict(msg.metadata)})
+
+def deserialize_message(data):
+    fields = json.loads(data)
+    msg = spade.message.Message(to=fields["to"], sender=fields["sender"], body=fields["body"])
+    for key, value in fields["metadata"].items():
+        msg.set_metadata(key, value)
+    return msg
+
+def type_template(msg_type):
+    return Template(metadata={"type": msg_type})
 
 class ReceiverAgent(Agent):
     class ReceiveMessageBehaviour(CyclicBehaviour):
-        async def run(self):
-            timeout = 10
-            print("Waiting for message...", flush=True)
-            msg = await self.receive(timeout=timeout)
+        """Handles received messages, all of the queued ones on every wake-up.
+
+        The agent runs one behaviour per message type (see `setup`), so a
+        burst of frames does not hold up logs and acks. With an `executor`,
+        batches are handled on it instead of the event loop; the next batch
+        waits for the previous one, so messages keep their order.
+        """
 
+        # Message type -> handler method, called with (robot_id, msg)
+        HANDLERS = {
+            "image": "handle_image",
+            "log": "handle_log",
+            "cube_detection": "handle_cube_detection",
+            "arm_log": "handle_arm_log",
+            "path_image": "handle_path_image",
+            "path_points": "handle_path_points",
+            "ack": "handle_ack",
+        }
+
+        def __init__(self, msg_type=None, executor=None):
+            super().__init__()
+            self.msg_type = msg_type
+            self.executor = executor
+
+        async def run(self):
+            msg = await self.receive(timeout=10)
             if not msg:
-                print(f"Did not receive any message after {timeout} seconds")
                 return
-            
+
+            batch = [msg]
+            while len(batch) < RECEIVER_BATCH_SIZE:
+                # Without a timeout, receive only takes what is already queued
+                msg = await self.receive()
+                if not msg:
+                    break
+                batch.append(msg)
+
+            XMPP_BATCH.observe(len(batch), type=self.msg_type or "all")
+            for msg in batch:
+                traffic_capture.record(XMPP, str(msg.sender), msg, convert=serialize_message, size=len(msg.body or ""))
+            if self.executor:
+                await asyncio.get_running_loop().run_in_executor(self.executor, self.handle_batch, batch)
+            else:
+                self.handle_batch(batch)
+
+        def handle_batch(self, batch):
+            for msg in batch:
+                try:
+                    self.handle_message(msg)
+                except Exception as e:
+                    print(f"⚠️ Failed to handle {msg.metadata.get('type')} message from {msg.sender}: {e}", flush=True)
+
+        def handle_message(self, msg):
+            """Dispatch one received message to its handler (also used by replay.py)."""
             robot_id = msg.metadata.get("robot_id", "unknown")
             type_msg = msg.metadata.get("type", "unknown")
 
-            handlers = {
-                "image": lambda: self.handle_image(robot_id, msg.body),
-                "log": lambda: self.handle_log(robot_id, msg.sender, msg.body),
-                "cube_detection": lambda: self.handle_cube_detection(robot_id, msg.body),
-                "arm_log": lambda: self.handle_arm_log(msg.body),
-                "path_image": lambda: self.handle_path_image(robot_id, msg.body),
-            }
+            if type_msg in ROBOT_MESSAGE_TYPES and robot_id not in ("unknown", TOP_CAMERA_NAME):
+                register_robot(robot_id)
+
+            XMPP_MESSAGES.inc(type=type_msg)
+            if type_msg in FRAME_MESSAGE_TYPES and msg.body:
+                FRAME_BYTES.observe(len(msg.body) * 3 // 4, type=type_msg)
 
-            handler = handlers.get(type_msg)
+            handler = self.HANDLERS.get(type_msg)
             if handler:
-                handler()
+                started = time.perf_counter()
+                getattr(self, handler)(robot_id, msg)
+                XMPP_HANDLING.observe(time.perf_counter() - started, type=type_msg)
             else:
                 print(f"Unknown message type: {type_msg}", flush=True)
                 add_log(robot_id, f"Unknown message type: {type_msg}")
 
-        def handle_image(self, robot_id, body):
+        def handle_image(self, robot_id, msg):
             print(f"Received image from {robot_id}", flush=True)
-            latest_frames[robot_id] = body
+            set_frame(robot_id, msg.body)
             add_log(robot_id, f"Image received from {robot_id}")
 
-        def handle_log(self, robot_id, sender, body):
-            log_entry = f"From {sender}: {body}"
+        def handle_log(self, robot_id, msg):
+            log_entry = f"From {msg.sender}: {msg.body}"
             print(f"Log added : {log_entry}", flush=True)
-            add_log(robot_id, body)
+            add_log(robot_id, msg.body)
 
-        def handle_cube_detection(self, robot_id, body):
-            print(f"Received cube detection data from {robot_id} {body}", flush=True)
-            add_log(robot_id, f"Cube detection data: {body}")
+        def handle_cube_detection(self, robot_id, msg):
+            try:
+                detections = set_cube_detections(robot_id, msg.body)
+            except ValueError:
+                # Not in the structured format: keep it readable in the log
+                print(f"Received cube detection data from {robot_id} {msg.body}", flush=True)
+                add_log(robot_id, f"Cube detection data: {msg.body}")
+                return
+            print(f"Received {len(detections.labels)} cube detections from {robot_id}", flush=True)
 
-        def handle_arm_log(self, body):
-            print(f"Received arm log: {body}", flush=True)
-            add_arm_log(body)
+        def handle_arm_log(self, robot_id, msg):
+            print(f"Received arm log: {msg.body}", flush=True)
+            add_arm_log(msg.body)
 
-        def handle_path_image(self, robot_id, body):
+        def handle_path_image(self, robot_id, msg):
             print(f"Received path image from {robot_id}", flush=True)
-            latest_path_frames[robot_id] = body
+            set_path_frame(robot_id, msg.body)
             add_log(robot_id, f"Path image received from {robot_id}")
 
+        def handle_path_points(self, robot_id, msg):
+            # Sent at telemetry rate: kept out of the robot log
+            try:
+                add_path_points(robot_id, msg.body)
+            except ValueError as e:
+                print(f"⚠️ Invalid path points from {robot_id}: {e}", flush=True)
+
+        def handle_ack(self, robot_id, msg):
+            body = msg.body
+            round_trip = handle_ack(robot_id, msg.metadata.get("correlation_id"))
+            if round_trip is None:
+                print(f"Unmatched ack from {robot_id}: {body}", flush=True)
+                return
+            print(f"Ack from {robot_id} for '{body}' in {round_trip * 1000:.1f} ms", flush=True)
+            add_log(robot_id, f"Ack '{body}' ({round_trip * 1000:.0f} ms)")
+
         async def on_end(self):
             await self.agent.stop()
             conn_status.set_xmpp_connected(False)
 
     async def setup(self):
         print("ReceiverAgent started setup", flush=True)
-        self.add_behaviour(self.ReceiveMessageBehaviour())
+        executor = ThreadPoolExecutor(max_workers=RECEIVER_WORKERS, thread_name_prefix="xmpp-handler")
+        handled = self.ReceiveMessageBehaviour.HANDLERS
+        for msg_type in handled:
+            behaviour = self.ReceiveMessageBehaviour(msg_type, executor if msg_type in OFFLOADED_MESSAGE_TYPES else None)
+            self.add_behaviour(behaviour, type_template(msg_type))
+            _behaviours[msg_type] = behaviour
+        # Everything else, e.g. messages without a type
+        other = self.ReceiveMessageBehaviour(OTHER_TYPES)
+        self.add_behaviour(other, ~reduce(operator.or_, map(type_template, handled)))
+        _behaviours[OTHER_TYPES] = other
 
     async def on_connection_failed(self, reason):
         """Called automatically when connection to server is lost."""
@@ -77,6 +201,7 @@ class ReceiverAgent(Agent):
         print("⚠️ ReceiverAgent got disconnected.", flush=True)
 
 def start_agent():
+    """Run the ReceiverAgent on the shared event loop."""
     async def agent_task():
         from config import XMPP_USERNAME, XMPP_SERVER, XMPP_PASSWORD
         try:
@@ -85,11 +210,8 @@ def start_agent():
             conn_status.set_xmpp_connected(True)
             print("ReceiverAgent started", flush=True)
             await spade.wait_until_finished(receiver)
-        except spade.exception.XMPPError as e:
-            print(f"XMPP Error: {e}", flush=True)
-            conn_status.set_xmpp_connected(False)
         except Exception as e:
             print(f"Error: {e}", flush=True)
             conn_status.set_xmpp_connected(False)
 
-    asyncio.run(agent_task())
+    runtime.submit(agent_task())
@@ -1,31 +1,118 @@
 from spade.agent import Agent
-from spade.behaviour import OneShotBehaviour
+from spade.behaviour import CyclicBehaviour
+from collections import deque, namedtuple
+from contextlib import suppress
 import asyncio
+import random
 import threading
 import utils.connection_status as conn_status
+from utils.state_store import ingest_action
+from utils.runtime import runtime
+from utils.metrics import counter, gauge
+
+from config import SENDER_OUTBOX_SIZE, XMPP_RECONNECT_MIN_SECONDS, XMPP_RECONNECT_MAX_SECONDS
+
+XMPP_SENT = counter("dashboard_xmpp_sent_total", "XMPP messages sent to robots", ["type", "result"])
+
+# `metadata` is added to the XMPP message; `on_sent` (if any) is called once it is on the wire
+OutboundMessage = namedtuple("OutboundMessage", ["robot_id", "body", "msg_type", "metadata", "on_sent"])
+
+class Outbox:
+    """Thread-safe queue of outbound messages, consumed on the sender's event loop."""
+
+    def __init__(self, maxsize):
+        self._items = deque()
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._loop = None
+        self._ready = None
+
+    def bind(self, loop):
+        with self._lock:
+            self._loop = loop
+            self._ready = asyncio.Event()
+            if self._items:
+                self._ready.set()
+
+    def put(self, item):
+        with self._lock:
+            if len(self._items) >= self._maxsize:
+                return False
+            self._items.append(item)
+            loop, ready = self._loop, self._ready
+        if loop:
+            loop.call_soon_threadsafe(ready.set)
+        return True
+
+    def requeue(self, item):
+        """Put back a message that could not be sent, ahead of newer ones."""
+        with self._lock:
+            self._items.appendleft(item)
+            self._ready.set()
+
+    async def get_all(self):
+        """Wait for at least one message, then take everything queued."""
+        while True:
+            with self._lock:
+                if self._items:
+                    items = list(self._items)
+                    self._items.clear()
+                    return items
+                self._ready.clear()
+            await self._ready.wait()
+
+    def __len__(self):
+        return len(self._items)
 
 class SenderAgent(Agent):
-    class SendBehaviour(OneShotBehaviour):
-        def __init__(self, robot_id, message, msg_type="log"):
+    class OutboxBehaviour(CyclicBehaviour):
+        """Sends every queued message over the agent's single XMPP session."""
+
+        def __init__(self, outbox):
             super().__init__()
-            self.robot_id = robot_id
-            self.message = message
-            self.msg_type = msg_type
+            self.outbox = outbox
 
         async def run(self):
+            # Everything queued goes out together, e.g. a broadcast to all robots
+            outbound = await self.outbox.get_all()
+            results = await asyncio.gather(*[self.send_one(item) for item in outbound], return_exceptions=True)
+
+            failed = [item for item, result in zip(outbound, results) if isinstance(result, Exception)]
+            if failed:
+                # Keep the messages for the next session and let the sender reconnect
+                for item in reversed(failed):
+                    self.outbox.requeue(item)
+                self.kill(exit_code=results[outbound.index(failed[0])])
+
+        async def send_one(self, item):
             from spade.message import Message
             from config import XMPP_SERVER
-            to = f"{self.robot_id}@{XMPP_SERVER}"
+
+            to = f"{item.robot_id}@{XMPP_SERVER}"
             msg = Message(
                 to=to,
-                body=self.message
+                body=item.body
             )
-            print(f"Sending message to {to}: {self.message}", flush=True)
+            print(f"Sending message to {to}: {item.body}", flush=True)
 
-            msg.set_metadata("robot_id", self.robot_id)
-            msg.set_metadata("type", self.msg_type)
-            
-            await self.send(msg)
+            msg.set_metadata("robot_id", item.robot_id)
+            msg.set_metadata("type", item.msg_type)
+            for key, value in (item.metadata or {}).items():
+                msg.set_metadata(key, value)
+
+            try:
+                await self.send(msg)
+            except Exception as e:
+                XMPP_SENT.inc(type=item.msg_type, result="error")
+                print(f"⚠️ SenderAgent failed to send to {to}: {e}", flush=True)
+                raise
+            XMPP_SENT.inc(type=item.msg_type, result="ok")
+            if item.on_sent:
+                # The message is out: a failing callback must not resend it
+                try:
+                    item.on_sent()
+                except Exception as e:
+                    print(f"⚠️ SenderAgent on_sent callback for {to} failed: {e}", flush=True)
 
     async def on_connection_failed(self, reason):
         conn_status.set_xmpp_connected(False)
@@ -35,26 +122,72 @@ class SenderAgent(Agent):
         conn_status.set_xmpp_connected(False)
         print("⚠️ SenderAgent got disconnected.", flush=True)
 
-def send_message_to_robot(robot_id, message, msg_type="log"):
-    def _send():
-        async def task():
-            from config import XMPP_USERNAME, XMPP_SERVER, XMPP_PASSWORD
+class SenderService:
+    """One long-lived SenderAgent on the shared event loop (utils.runtime).
+
+    Dash callbacks only enqueue messages, so sending costs no thread, loop or
+    XMPP login per message. The session is re-established with jittered
+    exponential backoff when it drops; queued messages are kept meanwhile.
+    """
+
+    def __init__(self):
+        self.outbox = Outbox(SENDER_OUTBOX_SIZE)
+        self._task = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._task is None:
+                self._task = runtime.submit(self._serve())
+                gauge("dashboard_xmpp_outbox_depth", "XMPP messages waiting to be sent", collect=lambda: len(self.outbox))
+
+    def send(self, robot_id, message, msg_type="log", metadata=None, on_sent=None):
+        self.start()
+        if not self.outbox.put(OutboundMessage(robot_id, message, msg_type, metadata, on_sent)):
+            XMPP_SENT.inc(type=msg_type, result="dropped")
+            print(f"⚠️ Sender outbox full, dropping message to {robot_id}: {message}", flush=True)
+            return False
+        return True
+
+    async def _serve(self):
+        from config import XMPP_USERNAME, XMPP_SERVER, XMPP_PASSWORD
+
+        self.outbox.bind(asyncio.get_running_loop())
+        backoff = XMPP_RECONNECT_MIN_SECONDS
+
+        while True:
+            sender = SenderAgent(f"{XMPP_USERNAME}@{XMPP_SERVER}", XMPP_PASSWORD)
             try:
-                sender = SenderAgent(f"{XMPP_USERNAME}@{XMPP_SERVER}", XMPP_PASSWORD)
                 await sender.start(auto_register=True)
+                # Same account as the receiver: a negative priority keeps the
+                # server from routing robot replies to this session.
+                sender.presence.set_presence(priority=-1)
                 conn_status.set_xmpp_connected(True)
-                sender.add_behaviour(sender.SendBehaviour(robot_id, message, msg_type))
-                await asyncio.sleep(10)
-                await sender.stop()
-                print("✅ SenderAgent finished and stopped.", flush=True)
+                print("✅ SenderAgent connected.", flush=True)
+                backoff = XMPP_RECONNECT_MIN_SECONDS
+
+                outbox_behaviour = sender.OutboxBehaviour(self.outbox)
+                sender.add_behaviour(outbox_behaviour)
+                while sender.is_alive() and sender.client.established and not outbox_behaviour.is_killed():
+                    await asyncio.sleep(1)
+                await sender.on_disconnected()
             except Exception as e:
-                conn_status.set_xmpp_connected(False)
-                print(f"⚠️ Could not start/send with SenderAgent: {e}", flush=True)
+                await sender.on_connection_failed(e)
+            finally:
+                with suppress(Exception):
+                    await sender.stop()
+
+            delay = backoff * random.uniform(0.5, 1.5)
+            print(f"🔄 SenderAgent reconnecting in {delay:.1f}s ({len(self.outbox)} queued)", flush=True)
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, XMPP_RECONNECT_MAX_SECONDS)
+
+_sender = SenderService()
 
-        try:
-            asyncio.run(task())
-        except Exception as e:
-            conn_status.set_xmpp_connected(False)
-            print(f"⚠️ Fatal error during SenderAgent send: {e}", flush=True)
+def start_sender():
+    """Open the persistent sender session ahead of the first message."""
+    _sender.start()
 
-    threading.Thread(target=_send, daemon=True).start()
\ No newline at end of file
+@ingest_action
+def send_message_to_robot(robot_id, message, msg_type="log", metadata=None, on_sent=None):
+    return _sender.send(robot_id, message, msg_type, metadata, on_sent)
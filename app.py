@@ -1,12 +1,17 @@
+import os
+
 import dash
 import dash_bootstrap_components as dbc
 
 from layout import layout
-from callbacks import register_callbacks
+from callbacks import register_callbacks, register_push
+from utils.frame_utils import register_frame_routes
+from utils.metrics import register_metrics_route
+from utils.profiling import instrument_callbacks
 from agents.receiver_agent import start_agent
+from agents.sender_agent import start_sender
 from mqtt.mqtt_client import start_mqtt_client, init_mqtt_pub_client
-
-import threading
+from utils.race_utils import restore_race_state
 
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 app.title = "Multi-Robot Dashboard"
@@ -15,8 +20,27 @@ app.layout = layout
 # Register all callbacks
 register_callbacks(app)
 
+# Opt-in per-callback timing and profiling (CALLBACK_PROFILING)
+instrument_callbacks(app)
+
+# Serve camera frames as cacheable JPEGs instead of base64 in callbacks
+register_frame_routes(app.server)
+
+# Push live updates over SSE, with interval polling as fallback
+register_push(app)
+
+# Prometheus metrics on /metrics, plus per-callback timing
+register_metrics_route(app.server)
+
+DEBUG = True
+
 if __name__ == "__main__":
-    threading.Thread(target=start_agent, daemon=True).start()
-    threading.Thread(target=start_mqtt_client, daemon=True).start()
-    init_mqtt_pub_client()
-    app.run(host="0.0.0.0", port=8050, debug=True)
+    # The reloader runs this module in a parent process that only watches
+    # for changes and in the child that serves; only the child may ingest
+    if not DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        restore_race_state()
+        start_agent()
+        start_sender()
+        start_mqtt_client()
+        init_mqtt_pub_client()
+    app.run(host="0.0.0.0", port=8050, debug=DEBUG)
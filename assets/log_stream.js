@@ -0,0 +1,45 @@
+// Merges log deltas ({entries: [[seq, text], ...] newest first, reset, base,
+// seq, limit}) into a log list, so only new entries ever travel to the browser.
+// The cursor store keeps the last sequence number already displayed. A delta
+// following entries this browser never got (`base` past the cursor) is not
+// merged; the push channel is asked for a fresh snapshot instead.
+(function () {
+    function logItem(text) {
+        return {type: "Li", namespace: "dash_html_components", props: {children: text}};
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        logs: {
+            merge: function (delta, children, cursor) {
+                var noUpdate = window.dash_clientside.no_update;
+                if (!delta) {
+                    return [noUpdate, noUpdate];
+                }
+
+                var last = delta.reset ? 0 : (cursor || 0);
+                if (!delta.reset && delta.base > last) {
+                    if (window.dashboardPush) {
+                        window.dashboardPush.resync();
+                    }
+                    return [noUpdate, noUpdate];
+                }
+                var fresh = delta.entries.filter(function (entry) {
+                    return entry[0] > last;
+                });
+                var nextCursor = Math.max(last, delta.seq);
+                if (!fresh.length && !delta.reset) {
+                    return [noUpdate, nextCursor === cursor ? noUpdate : nextCursor];
+                }
+
+                var existing = delta.reset ? [] : (children || []);
+                if (!Array.isArray(existing)) {
+                    existing = [existing];
+                }
+                var merged = fresh.map(function (entry) {
+                    return logItem(entry[1]);
+                }).concat(existing).slice(0, delta.limit);
+                return [merged, nextCursor];
+            }
+        }
+    });
+})();
@@ -0,0 +1,68 @@
+// Applies server-pushed diffs ({component_id: {prop: value}}) from the SSE
+// channel to the existing components; pattern-matching ids arrive as their
+// JSON encoding. While the stream is connected the `update-interval` polling
+// fallback is disabled; it is re-enabled as soon as the stream drops.
+// `window.dashboardPush.resync()` reconnects, which sends a full snapshot.
+(function () {
+    var PUSH_ROUTE = "/events";
+    var RETRY_MS = 2000;
+    var current = null;
+
+    function ready() {
+        return window.dash_clientside && window.dash_clientside.set_props &&
+            document.getElementById("live-timer");
+    }
+
+    function setPolling(enabled) {
+        window.dash_clientside.set_props("update-interval", {disabled: !enabled});
+    }
+
+    function applyDiff(diff) {
+        Object.keys(diff).forEach(function (key) {
+            var componentId = key.charAt(0) === "{" ? JSON.parse(key) : key;
+            window.dash_clientside.set_props(componentId, diff[key]);
+        });
+    }
+
+    function connect() {
+        var source = new EventSource(PUSH_ROUTE);
+        current = source;
+        source.onopen = function () {
+            setPolling(false);
+        };
+        source.onmessage = function (event) {
+            applyDiff(JSON.parse(event.data));
+        };
+        source.onerror = function () {
+            setPolling(true);
+            source.close();
+            if (current === source) {
+                current = null;
+                setTimeout(connect, RETRY_MS);
+            }
+        };
+    }
+
+    function resync() {
+        if (current) {
+            current.close();
+            current = null;
+            connect();
+        }
+    }
+
+    window.dashboardPush = {resync: resync};
+
+    function start() {
+        if (!window.EventSource) {
+            return;
+        }
+        if (!ready()) {
+            setTimeout(start, 100);
+            return;
+        }
+        connect();
+    }
+
+    start();
+})();
@@ -0,0 +1,42 @@
+// Advances the race timers locally from the last race clock sent by the
+// server, so the live timer never needs a server round trip.
+(function () {
+    var lastClock = null;
+    var receivedAt = 0;
+
+    function formatSeconds(seconds) {
+        return seconds.toFixed(3) + " s";
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        race: {
+            updateTimers: function (n, clock) {
+                var noUpdate = window.dash_clientside.no_update;
+                if (!clock) {
+                    return [noUpdate, noUpdate];
+                }
+
+                var serialized = JSON.stringify(clock);
+                var changed = serialized !== lastClock;
+                if (changed) {
+                    lastClock = serialized;
+                    receivedAt = Date.now();
+                } else if (!clock.running) {
+                    return [noUpdate, noUpdate];
+                }
+
+                var local = clock.running ? (Date.now() - receivedAt) / 1000 : 0;
+                var timer = formatSeconds(clock.elapsed + local);
+                var delta;
+                if (clock.since_first_finish !== null) {
+                    delta = formatSeconds(clock.since_first_finish + local);
+                } else if (clock.delta !== null) {
+                    delta = formatSeconds(clock.delta);
+                } else {
+                    delta = "N/A";
+                }
+                return [timer, delta];
+            }
+        }
+    });
+})();
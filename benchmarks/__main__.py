@@ -0,0 +1,124 @@
+"""Run the dashboard microbenchmarks.
+
+    python -m benchmarks --output bench.json
+    python -m benchmarks --baseline bench.json      # exit 1 on regressions
+
+Runs in a temporary directory so the race journal and saved settings of the
+checkout are left alone.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import result_key
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Figures compared against the baseline, and whether higher is worse
+COMPARED_FIGURES = {
+    "p50_us": True,
+    "p99_us": True,
+    "payload_bytes": True,
+    "normal_max_wait_ms": True,
+    "achieved_rate": False,
+}
+
+
+def compare(results, baseline, tolerance, min_delta_us):
+    """Print figures that moved more than `tolerance`; returns the regressions.
+
+    Latency changes smaller than `min_delta_us` are timer noise and ignored.
+    """
+    previous = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        key = result_key(result)
+        if key not in previous:
+            print(f"  new       {key}")
+            continue
+        for figure, higher_is_worse in COMPARED_FIGURES.items():
+            before, after = previous[key].get(figure), result.get(figure)
+            if not before or after is None:
+                continue
+            if figure.endswith("_us") and abs(after - before) < min_delta_us:
+                continue
+            change = (after - before) / before
+            worse = change > tolerance if higher_is_worse else change < -tolerance
+            better = change < -tolerance if higher_is_worse else change > tolerance
+            if worse or better:
+                label = "REGRESSED" if worse else "improved "
+                print(f"  {label} {key} {figure}: {before:.1f} -> {after:.1f} ({change:+.0%})")
+            if worse:
+                regressions.append((key, figure, before, after))
+    return regressions
+
+def print_results(results):
+    for result in results:
+        key = result_key(result)
+        if "p50_us" in result:
+            payload = f" payload {result['payload_bytes']} B" if result["payload_bytes"] is not None else ""
+            print(
+                f"  {key:<48} p50 {result['p50_us']:9.1f} us  p99 {result['p99_us']:9.1f} us"
+                f"  retained {result['retained_bytes_per_call']:8.0f} B{payload}"
+            )
+        else:
+            figures = ", ".join(
+                f"{name} {value:.1f}" if isinstance(value, float) else f"{name} {value}"
+                for name, value in result.items() if name not in ("name", "params")
+            )
+            print(f"  {key:<48} {figures}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --output")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative change reported as a regression (default 0.25)")
+    parser.add_argument("--min-delta-us", type=float, default=10.0, help="ignore latency changes smaller than this (default 10)")
+    parser.add_argument("--only", nargs="+", help="case groups to run: timestamps gates mqtt receiver refresh")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    sys.path.insert(0, REPO_ROOT)
+    # Synthetic traffic would fill the temporary directory with recordings
+    os.environ.setdefault("RACE_RECORDING", "false")
+    os.environ.setdefault("LOG_STORE", "false")
+    workdir = tempfile.mkdtemp(prefix="dashboard-bench-")
+    os.chdir(workdir)
+
+    from app import app
+    from benchmarks.cases import run_all
+
+    results = run_all(app, only=args.only)
+    print_results(results)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {output}")
+
+    if baseline:
+        print(f"Compared to baseline from {baseline['created_at']}:")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_us)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s)")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
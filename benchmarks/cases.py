@@ -0,0 +1,260 @@
+"""Benchmark cases driving the dashboard's hot paths with synthetic inputs."""
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import sys
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from benchmarks.harness import measure, measure_throughput
+
+FRAME_SIZES_KB = [50, 200, 800, 2000]
+ROBOT_COUNTS = [2, 8, 32]
+LOG_VOLUMES = [0, 50, 300]
+MESSAGE_RATES = [100, 1000, 5000]
+
+
+def synthetic_jpeg(target_kb):
+    """Noise JPEG of roughly `target_kb` (noise barely compresses, so size tracks resolution)."""
+    rng = np.random.default_rng(target_kb)
+    side = 64
+    data = b""
+    for _ in range(4):
+        image = rng.integers(0, 256, (side, side * 4 // 3, 3), dtype=np.uint8)
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        data = encoded.tobytes()
+        side = max(16, round(side * (target_kb * 1024 / len(data)) ** 0.5))
+    return data
+
+
+# Timestamps and gate events
+
+def bench_parse_timestamp():
+    from utils.log_utils import parse_timestamp
+
+    return [
+        measure("parse_timestamp", lambda: parse_timestamp("2025-05-12T10:15:30.123456Z"), {"input": "iso"}, iterations=20000),
+        measure("parse_timestamp", lambda: parse_timestamp("object_detected"), {"input": "invalid"}, iterations=20000),
+    ]
+
+def bench_handle_gate_event():
+    from utils.race_utils import handle_gate_event, reset_race
+
+    def race():
+        handle_gate_event("gate1/start", "object_detected")
+        handle_gate_event("gate1/finish", "object_detected")
+        handle_gate_event("gate2/finish", "object_detected")
+
+    return [
+        measure("handle_gate_event", race, {"events": "start+2 finishes"}, iterations=500, setup=reset_race),
+        measure("handle_gate_event", lambda: handle_gate_event("gate/ir", "ping"), {"events": "ignored"}, iterations=5000),
+    ]
+
+
+# MQTT ingest
+
+def _mqtt_message(topic, payload):
+    return SimpleNamespace(topic=topic, payload=payload.encode())
+
+def bench_mqtt():
+    from mqtt.ingest import IngestMessage
+    from mqtt.mqtt_client import on_message, process_message, ingest
+
+    results = [
+        measure("mqtt.on_message", lambda: on_message(None, None, _mqtt_message("gate/ir", "ping")), iterations=20000),
+    ]
+    # Don't let the on_message backlog leak into the next cases
+    ingest.start()
+    while ingest.stats()["normal"]["depth"]:
+        time.sleep(0.01)
+
+    message = IngestMessage("gate/ir", b"ping", None, time.monotonic())
+    results.append(measure("mqtt.process_message", lambda: process_message(message), {"topic": "gate/ir"}, iterations=5000))
+    for rate in MESSAGE_RATES:
+        results.append(measure_throughput("mqtt.ingest_rate", lambda rate=rate: _ingest_at_rate(rate), {"rate": rate}))
+    return results
+
+def _ingest_at_rate(rate, duration=1.0):
+    """Feed a fresh dispatcher at `rate` msg/s (2% gate events) and report how it keeps up."""
+    from mqtt.ingest import IngestDispatcher
+    from mqtt.mqtt_client import process_message
+
+    dispatcher = IngestDispatcher(process_message)
+    dispatcher.start()
+    count = int(rate * duration)
+    started = time.perf_counter()
+    for index in range(count):
+        topic, payload = ("gate1/start", "connected") if index % 50 == 0 else ("gate/ir", "ping")
+        dispatcher.put(topic, payload.encode())
+        # Pace the producer to the target rate
+        delay = started + (index + 1) / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    while any(lane["depth"] for lane in dispatcher.stats().values()):
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+
+    stats = dispatcher.stats()
+    return {
+        "messages": count,
+        "achieved_rate": count / elapsed,
+        "priority_max_wait_ms": stats["priority"]["max_wait_ms"],
+        "normal_avg_wait_ms": stats["normal"]["avg_wait_ms"],
+        "normal_max_wait_ms": stats["normal"]["max_wait_ms"],
+        "dropped": stats["normal"]["dropped"],
+    }
+
+
+# XMPP receiver
+
+def _xmpp_message(msg_type, body, robot_id="gerald"):
+    from spade.message import Message
+
+    msg = Message(to="receiverClient@prosody", sender=f"{robot_id}@prosody", body=body)
+    msg.set_metadata("robot_id", robot_id)
+    msg.set_metadata("type", msg_type)
+    return msg
+
+def _receive_once(behaviour, msg, loop):
+    async def receive(timeout=None):
+        # One message per wake-up: the draining receive (no timeout) finds nothing more
+        return msg if timeout else None
+    behaviour.receive = receive
+    return lambda: loop.run_until_complete(behaviour.run())
+
+def bench_receiver():
+    from agents.receiver_agent import ReceiverAgent
+    from utils.frame_utils import build_renditions
+
+    behaviour = ReceiverAgent.ReceiveMessageBehaviour()
+    loop = asyncio.new_event_loop()
+    results = [
+        measure("receiver.log", _receive_once(behaviour, _xmpp_message("log", "position 1.20 3.40"), loop), iterations=5000),
+    ]
+    for size_kb in FRAME_SIZES_KB:
+        data = synthetic_jpeg(size_kb)
+        body = base64.b64encode(data).decode()
+        params = {"frame_kb": size_kb}
+        results.append(measure("receiver.image", _receive_once(behaviour, _xmpp_message("image", body), loop), params, iterations=200))
+        results.append(measure("frame.renditions", lambda data=data: build_renditions(data), params, iterations=30, warmup=3))
+    loop.close()
+    return results
+
+
+# Dashboard refresh path (what every browser runs every 100 ms)
+
+def _dash_post(client, output, outputs, inputs, state, changed):
+    return client.post("/_dash-update-component", json={
+        "output": output,
+        "outputs": outputs,
+        "inputs": inputs,
+        "state": state,
+        "changedPropIds": changed,
+    })
+
+def _dependency(dependencies, predicate):
+    return next(dep for dep in dependencies if predicate(dep))
+
+def bench_refresh(app):
+    from layout import robot_component, robot_version_store
+    from utils.log_utils import ROBOT_PANEL_KINDS, PANELS, robot_log, add_log
+    from utils.robot_registry import register_robot, get_robot_ids
+
+    client = app.server.test_client()
+    dependencies = client.get("/_dash-dependencies").get_json()
+    interval = [{"id": "update-interval", "property": "n_intervals", "value": 1}]
+    results = []
+
+    # Global panels: nothing changed since the browser's last poll
+    poll = _dependency(dependencies, lambda dep: dep["inputs"][0]["id"] == "update-interval" and "race-version" in dep["output"])
+    poll_outputs = [{"id": f"{panel}-version", "property": "data"} for panel in PANELS]
+    seen = client.post("/_dash-update-component", json={
+        "output": poll["output"], "outputs": poll_outputs, "inputs": interval,
+        "state": [{"id": f"{panel}-version", "property": "data", "value": None} for panel in PANELS],
+        "changedPropIds": ["update-interval.n_intervals"],
+    }).get_json()["response"]
+    seen_state = [
+        {"id": f"{panel}-version", "property": "data", "value": seen.get(f"{panel}-version", {}).get("data")}
+        for panel in PANELS
+    ]
+    results.append(measure(
+        "refresh.poll_global",
+        lambda: _dash_post(client, poll["output"], poll_outputs, interval, seen_state, ["update-interval.n_intervals"]),
+        iterations=500,
+    ))
+
+    robot_poll = _dependency(dependencies, lambda dep: dep["output"].startswith('{"kind"'))
+    race = _dependency(dependencies, lambda dep: "race-clock.data" in dep["output"])
+    log_delta = _dependency(dependencies, lambda dep: '"robot-log-delta"' in dep["output"])
+
+    for robot_count in ROBOT_COUNTS:
+        index = 0
+        while len(get_robot_ids()) < robot_count:
+            register_robot(f"bench{index}", announce=False)
+            index += 1
+        robot_ids = get_robot_ids()[:robot_count]
+        params = {"robots": robot_count}
+
+        stores = [robot_version_store(kind, robot_id) for robot_id in robot_ids for kind in ROBOT_PANEL_KINDS]
+        results.append(measure("refresh.poll_robots", lambda stores=stores: _dash_post(
+            client, robot_poll["output"],
+            [{"id": store, "property": "data"} for store in stores],
+            interval,
+            [
+                [{"id": store, "property": "data", "value": None} for store in stores],
+                [{"id": store, "property": "id", "value": store} for store in stores],
+            ],
+            ["update-interval.n_intervals"],
+        ), params, iterations=300))
+
+        penalties = [robot_component("penalty", robot_id) for robot_id in robot_ids]
+        results.append(measure("refresh.render_race", lambda robot_ids=robot_ids, penalties=penalties: _dash_post(
+            client, race["output"],
+            [
+                [{"id": robot_component("penalty-count", robot_id), "property": "children"} for robot_id in robot_ids],
+                [{"id": penalty, "property": "disabled"} for penalty in penalties],
+                {"id": "race-clock", "property": "data"},
+            ],
+            [{"id": "race-version", "property": "data", "value": 1}],
+            [[{"id": penalty, "property": "id", "value": penalty} for penalty in penalties]],
+            ["race-version.data"],
+        ), params, iterations=300))
+
+    robot_id = "gerald"
+    for volume in LOG_VOLUMES:
+        cursor = robot_log(robot_id).last_seq
+        for index in range(volume):
+            add_log(robot_id, f"[bench] log line {index} with some position data 1.234 5.678")
+        results.append(measure("refresh.robot_log_delta", lambda cursor=cursor: _dash_post(
+            client, log_delta["output"],
+            {"id": robot_component("log-delta", robot_id), "property": "data"},
+            [{"id": robot_version_store("logs", robot_id), "property": "data", "value": 1}],
+            [{"id": robot_component("log-cursor", robot_id), "property": "data", "value": cursor}],
+            [json.dumps(robot_version_store("logs", robot_id)) + ".data"],
+        ), {"new_entries": volume}, iterations=300))
+
+    return results
+
+
+def run_all(app, only=None):
+    cases = {
+        "timestamps": bench_parse_timestamp,
+        "gates": bench_handle_gate_event,
+        "mqtt": bench_mqtt,
+        "receiver": bench_receiver,
+        "refresh": lambda: bench_refresh(app),
+    }
+    results = []
+    for name, case in cases.items():
+        if only and name not in only:
+            continue
+        print(f"⏱️ {name}...", file=sys.stderr, flush=True)
+        # Also silences the dashboard's background threads meanwhile
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.extend(case())
+    return results
@@ -0,0 +1,99 @@
+import contextlib
+import gc
+import io
+import statistics
+import time
+import tracemalloc
+
+# Timing and allocation tracking are done in separate passes: tracemalloc
+# slows every allocation down and would distort the latencies.
+ALLOC_ITERATIONS = 50
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+def _payload_size(result):
+    if result is None:
+        return None
+    if isinstance(result, (bytes, bytearray, str)):
+        return len(result)
+    data = getattr(result, "data", None)
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    return None
+
+def measure(name, func, params=None, iterations=1000, warmup=20, setup=None):
+    """Run `func()` repeatedly and return its latency, allocation and payload figures.
+
+    `setup()` (if any) runs before every call, outside the measurement. When
+    `func` returns bytes, a string or a response object, the size of the
+    last one is reported as the serialized payload size.
+    """
+    # The dashboard prints on most code paths; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()) as sink:
+        for _ in range(warmup):
+            if setup:
+                setup()
+            func()
+
+        samples = []
+        result = None
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(iterations):
+                if setup:
+                    setup()
+                started = time.perf_counter()
+                result = func()
+                samples.append(time.perf_counter() - started)
+                if sink.tell() > 1_000_000:
+                    sink.seek(0)
+                    sink.truncate()
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        tracemalloc.start()
+        try:
+            allocated = 0
+            peak = 0
+            for _ in range(min(iterations, ALLOC_ITERATIONS)):
+                if setup:
+                    setup()
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                func()
+                after, call_peak = tracemalloc.get_traced_memory()
+                allocated += max(0, after - before)
+                peak = max(peak, call_peak - before)
+            alloc_calls = min(iterations, ALLOC_ITERATIONS)
+        finally:
+            tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "name": name,
+        "params": params or {},
+        "iterations": iterations,
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "p50_us": _percentile(samples, 0.50) * 1e6,
+        "p90_us": _percentile(samples, 0.90) * 1e6,
+        "p99_us": _percentile(samples, 0.99) * 1e6,
+        "max_us": samples[-1] * 1e6,
+        "retained_bytes_per_call": allocated / alloc_calls,
+        "peak_alloc_bytes": peak,
+        "payload_bytes": _payload_size(result),
+    }
+
+def measure_throughput(name, run, params=None):
+    """Report a case that measures itself; `run()` returns a dict of figures."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        figures = run()
+    return {"name": name, "params": params or {}, **figures}
+
+def result_key(result):
+    params = ",".join(f"{key}={value}" for key, value in sorted(result["params"].items()))
+    return f"{result['name']}[{params}]" if params else result["name"]
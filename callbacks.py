@@ -1,85 +1,451 @@
-from dash import callback, Output, Input, State, ctx, html
-from utils.log_utils import add_log, add_mqtt_log
-from utils.race_utils import race_state
+from dash import callback, clientside_callback, ClientsideFunction, Output, Input, State, ctx, html, Patch, ALL, MATCH
+from utils.log_utils import add_log, add_mqtt_log, PANELS, RACE_PANEL, get_versions, get_version, add_version_listener
+from utils.log_utils import frame_panel, robot_panel, robot_log, CAMERA_LOGS_PANEL, MQTT_LOGS_PANEL, ARM_LOGS_PANEL
+from utils.log_utils import CONNECTION_PANEL, GATES_PANEL, BROADCAST_PANEL, ROBOTS_PANEL, CUBES_PANEL, ROBOT_PANEL_KINDS
+from utils.robot_registry import get_robot_ids, parse_robot_panel
+from utils.push_utils import register_push_route, start_push_worker, mark_dirty
+from utils.frame_utils import frame_url, cube_frame_url
+from utils.cube_utils import get_cube_summaries
+from utils.log_store import log_store
+from utils.race_utils import get_race_state, reset_race as reset_race_state, apply_penalty, clear_penalty_cooldown
 from agents.sender_agent import send_message_to_robot
+from agents.broadcast import broadcast_command, latest_broadcast, latency_percentiles
 from mqtt.mqtt_client import send_mqtt_command
 from utils.mac_utils import save_mac_addresses
 from utils.xmpp_utils import save_command_body_for_type, load_command_body_for_type
 from utils.connection_status import get_all_gate_statuses
+from utils.gate_timing import get_gate_timing
+from utils.clock import utc_now
+from utils.metrics import collect_all, render_summary
+from layout import robot_component, robot_version_store, robot_column
 
-from config import ROBOT_NAMES, TOP_CAMERA_NAME, PENALTY_TIME_SECONDS
+from config import TOP_CAMERA_NAME, PENALTY_TIME_SECONDS, USE_MJPEG_STREAM, SHOW_DEBUG_PANEL
+from datetime import datetime, timezone
 import dash
 import json
 
+def render_log_delta(ring, seq):
+    """Log entries after `seq`, merged into the list by assets/log_stream.js.
+
+    `base` is the seq the entries follow, so a browser whose cursor is behind
+    it knows it missed entries.
+    """
+    entries, reset, last_seq = ring.since(seq or 0)
+    return {"entries": entries, "reset": reset, "base": 0 if reset else seq or 0, "seq": last_seq, "limit": ring.maxlen}
+
+def log_rings():
+    """Map each global log panel (also the id of its list component) to its LogRing."""
+    from utils.log_utils import mqtt_logs, arm_logs, camera_logs
+
+    return {
+        CAMERA_LOGS_PANEL: camera_logs,
+        MQTT_LOGS_PANEL: mqtt_logs,
+        ARM_LOGS_PANEL: arm_logs,
+    }
+
+
+def render_penalty_count(race, robot_id):
+    count = race["penalties"].get(robot_id, 0)
+    return html.Div(f"Penalties: {count}", style={"color": "red", "fontWeight": "bold"}) if count > 0 else ""
+
+def render_penalty_disabled(race, robot_id):
+    return not race["running"] or race["penalty_cooldown"].get(robot_id, False)
+
+def render_robot_frame(kind, robot_id):
+    return frame_url(robot_id, path=kind == "path-image", size="card")
+
+def render_race_clock():
+    """Race timing snapshot; the browser advances it locally between updates."""
+    race_state = get_race_state()
+    # Race times are UTC, derived from the monotonic clock like this one
+    now = utc_now()
+    elapsed = race_state["elapsed"]
+    if race_state["running"] and race_state["start_time"]:
+        base_elapsed = (now - race_state["start_time"]).total_seconds()
+        penalty_time = sum(race_state.get("penalties", {}).values()) * PENALTY_TIME_SECONDS
+        elapsed = base_elapsed + penalty_time
+
+    finish_times = list(race_state["finish_times"].values())
+    since_first_finish = None
+    if race_state["running"] and len(finish_times) == 1:
+        since_first_finish = abs((now - finish_times[0]).total_seconds())
+
+    return {
+        "running": race_state["running"],
+        "elapsed": elapsed,
+        "since_first_finish": since_first_finish,
+        "delta": race_state["delta"],
+    }
+
+def render_gate_statuses():
+    statuses = get_all_gate_statuses()
+
+    def dot(connected):
+        return "🟢" if connected else "🔴"
+
+    return (
+        dot(statuses["gate1/start"]),
+        dot(statuses["gate1/finish"]),
+        dot(statuses["gate2/start"]),
+        dot(statuses["gate2/finish"]),
+        render_gate_timing(),
+    )
+
+def render_gate_timing():
+    items = []
+    for gate, stats in sorted(get_gate_timing().items()):
+        if not stats["synced"]:
+            text = "clock not synced, events dated on receipt"
+        else:
+            text = f"clock offset {stats['offset_ms']:+.1f} ms ±{stats['uncertainty_ms']:.1f} ms, drift {stats['drift_ppm']:+.0f} ppm"
+            if stats["latency_ms"] is not None:
+                text += f", last delivery {stats['latency_ms']:.1f} ms"
+        if stats["lost"] or stats["duplicates"]:
+            text += f", {stats['lost']} lost, {stats['duplicates']} redelivered"
+        items.append(html.Li(f"{gate}: {text}"))
+    return items
+
+def render_cube_detections():
+    items = []
+    for robot_id, summary in sorted(get_cube_summaries().items()):
+        cubes = [
+            f"{label or 'cube'} at ({x:.0f}, {y:.0f})" + (f" {confidence:.0%}" if confidence is not None else "")
+            for label, x, y, confidence in summary["cubes"]
+        ]
+        items.append(html.Li(f"{robot_id} ({summary['received_at']}): {', '.join(cubes) or 'no cubes'}"))
+    return cube_frame_url(), items
+
+def parse_explorer_time(value):
+    """Seconds since the epoch of a datetime-local input (read as UTC), or None."""
+    if not value:
+        return None
+    try:
+        return (datetime.fromisoformat(value) - datetime(1970, 1, 1)).total_seconds()
+    except ValueError:
+        return None
+
+def render_log_entry(entry):
+    time_text = datetime.fromtimestamp(entry.ts, timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return html.Tr([html.Td(time_text), html.Td(entry.source), html.Td(entry.robot or ""), html.Td(entry.level), html.Td(entry.message)])
+
+def render_connection_status():
+    import utils.connection_status as conn_status
+
+    mqtt_connected = conn_status.is_mqtt_connected()
+    xmpp_connected = conn_status.is_xmpp_connected()
+    mqtt_down = [link for link in conn_status.MQTT_LINKS if not conn_status.is_mqtt_connected(link)]
+    mqtt_text = "" if mqtt_connected else f"❌ MQTT Not Connected ({', '.join(mqtt_down)})"
+    xmpp_text = "" if xmpp_connected else "❌ XMPP Not Connected"
+
+    # if both are connected, hide card
+    if mqtt_connected and xmpp_connected:
+        card_style = {"display": "none"}
+    else:
+        card_style = {"display": "block"}
+
+    return mqtt_text, xmpp_text, card_style
+
+def render_start_acks():
+    """Per-robot acknowledgement of the last "start" and round trip percentiles."""
+    broadcast = latest_broadcast("start")
+    if not broadcast:
+        return ""
+
+    items = []
+    for robot_id in broadcast.robot_ids:
+        status = broadcast.status(robot_id)
+        if status == "acked":
+            text = f"{robot_id}: ack in {broadcast.round_trip(robot_id) * 1000:.0f} ms"
+        else:
+            text = f"{robot_id}: {status}"
+        stats = latency_percentiles(robot_id)
+        if stats:
+            text += f" (p50 {stats['p50'] * 1000:.0f} / p90 {stats['p90'] * 1000:.0f} / p99 {stats['p99'] * 1000:.0f} ms over {stats['count']})"
+        items.append(html.Li(text))
+
+    spread = broadcast.receive_spread()
+    spread_text = f"Start spread between robots: {spread * 1000:.0f} ms" if spread is not None else "Start spread between robots: waiting for acks"
+    return [html.Div(spread_text, style={"fontWeight": "bold"}), html.Ul(items)]
+
+def panel_renderers():
+    """Map each global panel to the component properties it drives and how to render them.
+
+    Per-robot panels and the penalty controls use pattern-matching ids and
+    are rendered by their own MATCH/ALL callbacks (see register_callbacks).
+    """
+    renderers = {}
+    if not USE_MJPEG_STREAM:
+        # Otherwise the images are MJPEG streams set once in the layout
+        renderers[frame_panel(TOP_CAMERA_NAME)] = (
+            [(f"{TOP_CAMERA_NAME}-image", "src")],
+            lambda: (frame_url(TOP_CAMERA_NAME),),
+        )
+    renderers[CONNECTION_PANEL] = (
+        [("mqtt-status", "children"), ("xmpp-status", "children"), ("connection-status-card", "style")],
+        render_connection_status,
+    )
+    renderers[CUBES_PANEL] = (
+        [("cube-detections-image", "src"), ("cube-detections-list", "children")],
+        render_cube_detections,
+    )
+    renderers[BROADCAST_PANEL] = ([("start-ack-display", "children")], lambda: (render_start_acks(),))
+    renderers[GATES_PANEL] = (
+        [
+            ("gate1-start-status", "children"),
+            ("gate1-finish-status", "children"),
+            ("gate2-start-status", "children"),
+            ("gate2-finish-status", "children"),
+            ("gate-timing", "children"),
+        ],
+        render_gate_statuses,
+    )
+    return renderers
+
+def push_id(component_id):
+    """Key of a component in a pushed diff; assets/push_bridge.js parses dict ids back."""
+    if isinstance(component_id, dict):
+        return json.dumps(component_id, sort_keys=True, separators=(",", ":"))
+    return component_id
+
+def register_push(app):
+    """Push panel diffs to browsers over SSE as soon as their version moves.
+
+    The `update-interval` polling path stays registered as the fallback; the
+    browser bridge (assets/push_bridge.js) disables it while the stream is up.
+    """
+    renderers = panel_renderers()
+    rings = log_rings()
+    # Last log entry pushed per panel; browsers that connect later start
+    # from a full snapshot and ignore entries they already have.
+    pushed_seqs = {panel: ring.last_seq for panel, ring in rings.items()}
+
+    def render_log_panel(panel, ring, delta_id, reset=False):
+        delta = render_log_delta(ring, 0 if reset else pushed_seqs.get(panel, 0))
+        if reset:
+            delta["reset"] = True
+        else:
+            pushed_seqs[panel] = delta["seq"]
+        return {push_id(delta_id): {"data": delta}}
+
+    def render_robot_panel(kind, robot_id, reset=False):
+        if kind == "logs":
+            panel = robot_panel(kind, robot_id)
+            return render_log_panel(panel, robot_log(robot_id), robot_component("log-delta", robot_id), reset)
+        if kind == "image" and USE_MJPEG_STREAM:
+            return {}
+        return {push_id(robot_component(kind, robot_id)): {"src": render_robot_frame(kind, robot_id)}}
+
+    def render_race():
+        race = get_race_state()
+        diff = {"race-clock": {"data": render_race_clock()}}
+        for robot_id in get_robot_ids():
+            diff[push_id(robot_component("penalty-count", robot_id))] = {"children": render_penalty_count(race, robot_id)}
+            diff[push_id(robot_component("penalty", robot_id))] = {"disabled": render_penalty_disabled(race, robot_id)}
+        return diff
+
+    def render_panel(panel):
+        if panel in rings:
+            return render_log_panel(panel, rings[panel], f"{panel}-delta")
+        if panel == RACE_PANEL:
+            return render_race()
+        if panel == ROBOTS_PANEL:
+            # The container callback adds the cards of new robots
+            return {f"{ROBOTS_PANEL}-version": {"data": get_version(ROBOTS_PANEL)}}
+        robot = parse_robot_panel(panel)
+        if robot:
+            return render_robot_panel(*robot)
+        if panel not in renderers:
+            return {}
+        outputs, render = renderers[panel]
+        diff = {}
+        for (component_id, prop), value in zip(outputs, render()):
+            diff.setdefault(component_id, {})[prop] = value
+        return diff
+
+    def snapshot():
+        diff = {}
+
+        def merge(panel_diff):
+            for component_id, props in panel_diff.items():
+                diff.setdefault(component_id, {}).update(props)
+
+        for panel in [*renderers, RACE_PANEL, ROBOTS_PANEL]:
+            merge(render_panel(panel))
+        for panel, ring in rings.items():
+            merge(render_log_panel(panel, ring, f"{panel}-delta", reset=True))
+        for robot_id in get_robot_ids():
+            for kind in ROBOT_PANEL_KINDS:
+                merge(render_robot_panel(kind, robot_id, reset=True))
+        return diff
+
+    register_push_route(app.server, snapshot)
+    start_push_worker(render_panel)
+    add_version_listener(mark_dirty)
+
 def register_callbacks(app):
     @callback(
-        *[Output(f"{robot_id}-logs", "children") for robot_id in ROBOT_NAMES],
-        *[Output(f"{robot_id}-image", "src") for robot_id in ROBOT_NAMES],
-        *[Output(f"{robot_id}-path-image", "src") for robot_id in ROBOT_NAMES],
-        *[Output(f"{robot_id}-penalty-count", "children") for robot_id in ROBOT_NAMES],
-        *[Output(f"{robot_id}-penalty", "disabled") for robot_id in ROBOT_NAMES],
-        Output(f"{TOP_CAMERA_NAME}-image", "src"),
-        Output("camera-log-display", "children"),
-        Output('mqtt-log-display', 'children'),
-        Output("live-timer", "children"),
-        Output("delta-timer", "children"),
-        Output("robotic-arm-log-display", "children"),
+        *[Output(f"{panel}-version", "data") for panel in PANELS],
         Input('update-interval', 'n_intervals'),
-        State('live-timer', 'children'),
+        *[State(f"{panel}-version", "data") for panel in PANELS],
     )
-    def update_ui(n, current_timer):
-        from utils.log_utils import robot_logs, mqtt_logs, latest_frames, arm_logs, latest_path_frames, camera_logs
-        from datetime import datetime
-
-        now = datetime.now()
-        if race_state["running"] and race_state["start_time"]:
-            base_elapsed = (now - race_state["start_time"]).total_seconds()
-            penalty_time = sum(race_state.get("penalties", {}).values()) * PENALTY_TIME_SECONDS
-            race_state["elapsed"] = base_elapsed + penalty_time
-
-        finish_times = list(race_state["finish_times"].values())
-        if race_state["running"] and len(finish_times) == 1:
-            delta = abs((now - finish_times[0]).total_seconds())
-            delta_display = f"{delta:.3f} s"
-        else:
-            delta_display = f"{race_state['delta']:.3f} s" if race_state['delta'] is not None else "N/A"
-
-        timer_display = f"{race_state['elapsed']:.3f} s"
-
-        robot_logs_html = [
-            [html.Li(log) for log in list(robot_logs[robot_id])]
-            for robot_id in ROBOT_NAMES
-        ]
+    def poll_panel_versions(n, *seen_versions):
+        # Only panels whose version moved are pushed to their store, which in
+        # turn triggers that panel's own render callback below.
+        versions = get_versions()
+        return tuple(
+            versions.get(panel, 0) if versions.get(panel, 0) != seen else dash.no_update
+            for panel, seen in zip(PANELS, seen_versions)
+        )
 
-        robot_images_src = [
-            f"data:image/jpeg;base64,{latest_frames[robot_id]}" if latest_frames[robot_id] else ""
-            for robot_id in ROBOT_NAMES
-        ]
+    @callback(
+        Output(robot_version_store(ALL, ALL), "data"),
+        Input('update-interval', 'n_intervals'),
+        State(robot_version_store(ALL, ALL), "data"),
+        State(robot_version_store(ALL, ALL), "id"),
+    )
+    def poll_robot_panel_versions(n, seen_versions, store_ids):
+        versions = get_versions()
+        updates = []
+        for store_id, seen in zip(store_ids, seen_versions):
+            version = versions.get(robot_panel(store_id["kind"], store_id["robot"]), 0)
+            updates.append(version if version != seen else dash.no_update)
+        return updates
 
-        robot_penalty_counts = [
-            html.Div(f"Penalties: {race_state['penalties'][robot_id]}", style={"color": "red", "fontWeight": "bold"}) if race_state['penalties'][robot_id] > 0 else ""
-            for robot_id in ROBOT_NAMES
-        ]
+    @callback(
+        Output("robots-container", "children"),
+        Output("robot-ids", "data"),
+        Input(f"{ROBOTS_PANEL}-version", "data"),
+        State("robot-ids", "data"),
+    )
+    def add_robot_cards(version, shown_robot_ids):
+        # Append cards for newly discovered robots; existing cards (and their
+        # log history in the browser) are left untouched.
+        new_robot_ids = [robot_id for robot_id in get_robot_ids() if robot_id not in shown_robot_ids]
+        if not new_robot_ids:
+            return dash.no_update, dash.no_update
+        cards = Patch()
+        for robot_id in new_robot_ids:
+            cards.append(robot_column(robot_id))
+        return cards, shown_robot_ids + new_robot_ids
 
-        robot_path_images_src = [
-            f"data:image/jpeg;base64,{latest_path_frames[robot_id]}" if latest_path_frames[robot_id] else ""
-            for robot_id in ROBOT_NAMES
-        ]
+    @callback(
+        Output("log-explorer-robot", "options"),
+        Input(f"{ROBOTS_PANEL}-version", "data"),
+    )
+    def list_log_explorer_robots(version):
+        return [*get_robot_ids(), TOP_CAMERA_NAME]
 
-        robot_penalty_buttons = [
-            not race_state["running"] or race_state["penalty_cooldown"][robot_id]
-            for robot_id in ROBOT_NAMES
-        ]
+    @callback(
+        Output("log-explorer-rows", "children"),
+        Output("log-explorer-pages", "data"),
+        Output("log-explorer-newer", "disabled"),
+        Output("log-explorer-older", "disabled"),
+        Input("log-explorer-search", "n_clicks"),
+        Input("log-explorer-text", "n_submit"),
+        Input("log-explorer-newer", "n_clicks"),
+        Input("log-explorer-older", "n_clicks"),
+        State("log-explorer-source", "value"),
+        State("log-explorer-robot", "value"),
+        State("log-explorer-level", "value"),
+        State("log-explorer-text", "value"),
+        State("log-explorer-since", "value"),
+        State("log-explorer-until", "value"),
+        State("log-explorer-pages", "data"),
+    )
+    def explore_logs(search, submit, newer, older, source, robot, level, text, since, until, pages):
+        # Keyset pagination: each page starts below the last entry of the
+        # previous one, so paging back only needs the cursors seen so far
+        cursors = pages["cursors"]
+        if ctx.triggered_id == "log-explorer-older" and pages["next"]:
+            cursors = cursors + [pages["next"]]
+        elif ctx.triggered_id == "log-explorer-newer" and len(cursors) > 1:
+            cursors = cursors[:-1]
+        else:
+            cursors = [None]
 
-        top_camera_img = f"data:image/jpeg;base64,{latest_frames[TOP_CAMERA_NAME]}" if latest_frames[TOP_CAMERA_NAME] else ""
+        before = tuple(cursors[-1]) if cursors[-1] else None
+        entries, next_cursor = log_store.query(
+            source=source, robot=robot, level=level, text=text,
+            since=parse_explorer_time(since), until=parse_explorer_time(until), before=before,
+        )
+        rows = [render_log_entry(entry) for entry in entries]
+        if not rows:
+            rows = [html.Tr(html.Td("No matching logs", colSpan=5))]
+        return rows, {"cursors": cursors, "next": next_cursor}, len(cursors) == 1, next_cursor is None
+
+    # One render callback per panel, fired only when its version store changes
+    for panel, (outputs, render) in panel_renderers().items():
+        app.callback(
+            [Output(component_id, prop) for component_id, prop in outputs],
+            Input(f"{panel}-version", "data"),
+        )(lambda version, _render=render: _render())
 
-        camera_logs_html = [html.Li(log) for log in list(camera_logs)]
+    @callback(
+        Output(robot_component("penalty-count", ALL), "children"),
+        Output(robot_component("penalty", ALL), "disabled"),
+        Output("race-clock", "data"),
+        Input(f"{RACE_PANEL}-version", "data"),
+        State(robot_component("penalty", ALL), "id"),
+    )
+    def render_race(version, penalty_ids):
+        race = get_race_state()
+        robot_ids = [component_id["robot"] for component_id in penalty_ids]
+        return (
+            [render_penalty_count(race, robot_id) for robot_id in robot_ids],
+            [render_penalty_disabled(race, robot_id) for robot_id in robot_ids],
+            render_race_clock(),
+        )
 
-        mqtt_display_logs = [html.Li(log) for log in list(mqtt_logs)]
+    # Robot images; with MJPEG streaming the card image is a stream instead
+    frame_kinds = ["path-image"] if USE_MJPEG_STREAM else ["image", "path-image"]
+    for kind in frame_kinds:
+        app.callback(
+            Output(robot_component(kind, MATCH), "src"),
+            Input(robot_version_store(kind, MATCH), "data"),
+        )(lambda version, _kind=kind: render_robot_frame(_kind, ctx.outputs_list["id"]["robot"]))
+
+    # Log panels only ship entries the browser hasn't seen yet
+    for panel, ring in log_rings().items():
+        app.callback(
+            Output(f"{panel}-delta", "data"),
+            Input(f"{panel}-version", "data"),
+            State(f"{panel}-cursor", "data"),
+        )(lambda version, cursor, _ring=ring: render_log_delta(_ring, cursor))
+
+        clientside_callback(
+            ClientsideFunction(namespace="logs", function_name="merge"),
+            Output(panel, "children"),
+            Output(f"{panel}-cursor", "data"),
+            Input(f"{panel}-delta", "data"),
+            State(panel, "children"),
+            State(f"{panel}-cursor", "data"),
+        )
 
-        arm_logs_html = [html.Li(log) for log in list(arm_logs)]
+    @callback(
+        Output(robot_component("log-delta", MATCH), "data"),
+        Input(robot_version_store("logs", MATCH), "data"),
+        State(robot_component("log-cursor", MATCH), "data"),
+    )
+    def render_robot_log_delta(version, cursor):
+        return render_log_delta(robot_log(ctx.outputs_list["id"]["robot"]), cursor)
+
+    clientside_callback(
+        ClientsideFunction(namespace="logs", function_name="merge"),
+        Output(robot_component("logs", MATCH), "children"),
+        Output(robot_component("log-cursor", MATCH), "data"),
+        Input(robot_component("log-delta", MATCH), "data"),
+        State(robot_component("logs", MATCH), "children"),
+        State(robot_component("log-cursor", MATCH), "data"),
+    )
 
-        return *robot_logs_html, *robot_images_src, *robot_path_images_src, *robot_penalty_counts, *robot_penalty_buttons, top_camera_img, camera_logs_html, mqtt_display_logs, timer_display, delta_display, arm_logs_html
+    # Timers tick in the browser from the pushed/polled race clock
+    clientside_callback(
+        ClientsideFunction(namespace="race", function_name="updateTimers"),
+        Output("live-timer", "children"),
+        Output("delta-timer", "children"),
+        Input("timer-interval", "n_intervals"),
+        Input("race-clock", "data"),
+    )
 
     @app.callback(
         Output("reset-status", "children"),
@@ -91,12 +457,7 @@ def register_callbacks(app):
     def reset_race(n_clicks, interval_triggered):
         triggered = ctx.triggered_id
         if triggered == "reset-race":
-            race_state["start_time"] = None
-            race_state["finish_times"] = {}
-            race_state["running"] = False
-            race_state["elapsed"] = 0.0
-            race_state["delta"] = None
-            race_state["penalties"] = {robot: 0 for robot in ROBOT_NAMES}
+            reset_race_state()
             add_mqtt_log("[RACE 🔄] Race has been reset via dashboard")
             return "Race has been reset.", 0
         elif triggered == "reset-race-clear-interval":
@@ -113,49 +474,50 @@ def register_callbacks(app):
     )
     def toggle_robot(start_clicks, is_start_disabled):
         triggered = ctx.triggered_id
-        from utils.log_utils import robot_states
+        from utils.log_utils import set_robot_state
         if triggered == "robots-start":
             print("Start button clicked", flush=True)
-            for robot_id in ROBOT_NAMES:
-                robot_states[robot_id] = True
-                send_message_to_robot(robot_id, "start")
+            robot_ids = get_robot_ids()
+            for robot_id in robot_ids:
+                set_robot_state(robot_id, True)
+            broadcast_command(robot_ids, "start")
             return 0, True
         elif triggered == "robots-start-cooldown":
             return dash.no_update, False
         return dash.no_update, dash.no_update
 
-    # For each robot, create a callback for the penalty button
-    for robot_id in ROBOT_NAMES:
-        @app.callback(
-            Output(f"{robot_id}-penalty-status", "children"),
-            Output(f"{robot_id}-penalty-cooldown", "n_intervals"),
-            Input(f"{robot_id}-penalty", "n_clicks"),
-            Input(f"{robot_id}-calibrate", "n_clicks"),
-            Input(f"{robot_id}-penalty-cooldown", "n_intervals"),
-            prevent_initial_call=True
-        )
-        def handle_penalty(penalty_clicks, validate_clicks, cooldown_interval, _robot_id=robot_id):
-            triggered = ctx.triggered_id
-            if triggered == f"{_robot_id}-penalty":
-                if not race_state["running"]:
-                    log_msg = "⛔ Cannot apply penalty: Race not running."
-                    add_log(_robot_id, log_msg)
-                    return log_msg, 0
-                race_state["penalties"][_robot_id] += 1
-                race_state["elapsed"] += PENALTY_TIME_SECONDS
-                race_state["penalty_cooldown"][_robot_id] = True
-                log_msg = f"[PENALTY] +{PENALTY_TIME_SECONDS}s penalty applied to {_robot_id}. Total penalties: {race_state['penalties'][_robot_id]}"
-                add_log(_robot_id, log_msg)
+    # One callback serves the penalty and calibrate buttons of every robot card
+    @app.callback(
+        Output(robot_component("penalty-status", MATCH), "children"),
+        Output(robot_component("penalty-cooldown", MATCH), "n_intervals"),
+        Input(robot_component("penalty", MATCH), "n_clicks"),
+        Input(robot_component("calibrate", MATCH), "n_clicks"),
+        Input(robot_component("penalty-cooldown", MATCH), "n_intervals"),
+        prevent_initial_call=True
+    )
+    def handle_penalty(penalty_clicks, validate_clicks, cooldown_interval):
+        triggered = ctx.triggered_id
+        if not triggered:
+            return dash.no_update, dash.no_update
+        robot_id = triggered["robot"]
+        if triggered["type"] == "robot-penalty":
+            if not get_race_state()["running"]:
+                log_msg = "⛔ Cannot apply penalty: Race not running."
+                add_log(robot_id, log_msg)
                 return log_msg, 0
-            elif triggered == f"{_robot_id}-penalty-cooldown":
-                race_state["penalty_cooldown"][_robot_id] = False
-                return "", dash.no_update   
-            elif triggered == f"{_robot_id}-calibrate":
-                send_message_to_robot(_robot_id, "calibrate")
-                print(f"Calibration sent to {_robot_id}", flush=True)
-                return "Calibration sent!", dash.no_update
+            total_penalties = apply_penalty(robot_id)
+            log_msg = f"[PENALTY] +{PENALTY_TIME_SECONDS}s penalty applied to {robot_id}. Total penalties: {total_penalties}"
+            add_log(robot_id, log_msg)
+            return log_msg, 0
+        elif triggered["type"] == "robot-penalty-cooldown":
+            clear_penalty_cooldown(robot_id)
+            return "", dash.no_update
+        elif triggered["type"] == "robot-calibrate":
+            send_message_to_robot(robot_id, "calibrate")
+            print(f"Calibration sent to {robot_id}", flush=True)
+            return "Calibration sent!", dash.no_update
 
-            return dash.no_update, dash.no_update
+        return dash.no_update, dash.no_update
 
     @callback(
         Output("capture-status", "children"),
@@ -169,38 +531,16 @@ def register_callbacks(app):
         triggered = ctx.triggered_id
         if triggered == "capture-top-image-btn":
             print("Capture request sent to top camera", flush=True)
-            for robot_id in ROBOT_NAMES:
-                send_message_to_robot(robot_id, "take_picture")
+            broadcast_command(get_robot_ids(), "take_picture")
             return "📸 Capture request sent!", 0
         elif triggered == "capture-status-clear-interval":
             return "", dash.no_update
         elif triggered == "validate-top-image-btn":
             print("Validation request sent to top camera", flush=True)
-            for robot_id in ROBOT_NAMES:
-                send_message_to_robot(robot_id, "validate")
+            broadcast_command(get_robot_ids(), "validate")
             return "✅ Validation request sent!", 0
         return dash.no_update, dash.no_update
     
-    @app.callback(
-        Output("gate1-start-status", "children"),
-        Output("gate1-finish-status", "children"),
-        Output("gate2-start-status", "children"),
-        Output("gate2-finish-status", "children"),
-        Input("update-interval", "n_intervals")
-    )
-    def update_gate_connection_status(n):
-        statuses = get_all_gate_statuses()
-
-        def dot(connected):
-            return "🟢" if connected else "🔴"
-
-        return (
-            dot(statuses["gate1/start"]),
-            dot(statuses["gate1/finish"]),
-            dot(statuses["gate2/start"]),
-            dot(statuses["gate2/finish"]),
-        )
-
     @app.callback(
         Output("gate-mac-status", "children"),
         Output("gate-mac-clear-interval", "n_intervals"),
@@ -246,29 +586,6 @@ def register_callbacks(app):
 
         return gate_status, gate_clear_trigger
     
-    @app.callback(
-        Output("mqtt-status", "children"),
-        Output("xmpp-status", "children"),
-        Output("connection-status-card", "style"),
-        Input('update-interval', 'n_intervals')
-    )
-    def update_connection_status(n):
-        import utils.connection_status as conn_status
-
-        mqtt_connected = conn_status.is_mqtt_connected()
-        xmpp_connected = conn_status.is_xmpp_connected()
-        # print(f"MQTT Connected: {mqtt_connected}, XMPP Connected: {xmpp_connected}", flush=True)
-        mqtt_text = "" if mqtt_connected else "❌ MQTT Not Connected"
-        xmpp_text = "" if xmpp_connected else "❌ XMPP Not Connected"
-        
-        # if both are connected, hide card
-        if mqtt_connected and xmpp_connected:
-            card_style = {"display": "none"}
-        else:
-            card_style = {"display": "block"}
-        
-        return mqtt_text, xmpp_text, card_style
-    
     @app.callback(
         Output("xmpp-command-status", "children"),
         Output("xmpp-command-clear-interval", "n_intervals"),
@@ -330,4 +647,12 @@ def register_callbacks(app):
     def load_stored_body_for_type(cmd_type):
         if cmd_type:
             return load_command_body_for_type(cmd_type)
-        return ""
\ No newline at end of file
+        return ""
+
+    if SHOW_DEBUG_PANEL:
+        @app.callback(
+            Output("debug-metrics", "children"),
+            Input("debug-metrics-interval", "n_intervals"),
+        )
+        def render_debug_metrics(_):
+            return render_summary(collect_all())
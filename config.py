@@ -4,6 +4,19 @@ import os
 XMPP_USERNAME = "receiverClient"
 XMPP_SERVER = "prosody"
 XMPP_PASSWORD = os.getenv("XMPP_PASSWORD", "plsnohack")
+XMPP_RECONNECT_MIN_SECONDS = 1
+XMPP_RECONNECT_MAX_SECONDS = 30
+SENDER_OUTBOX_SIZE = 1000
+# The receiver handles up to this many queued messages per wake-up, frames
+# and cube detections on RECEIVER_WORKERS threads
+RECEIVER_BATCH_SIZE = 50
+RECEIVER_WORKERS = 2
+# The XMPP agents and MQTT share one event loop (utils/runtime.py); its
+# scheduling lag is sampled this often for /metrics
+RUNTIME_LAG_CHECK_SECONDS = 0.5
+# Broadcast commands wait this long for robots to "ack" them
+ACK_TIMEOUT_SECONDS = 10
+ACK_LATENCY_HISTORY = 200
 
 # Configuration for MQTT
 MQTT_BROKER = "192.168.88.253"
@@ -14,16 +27,115 @@ MQTT_TOPICS = [
     ("gate2/start", 0),
     ("gate1/finish", 0),
     ("gate2/finish", 0),
-    ("gate/mac_config/ack", 0)
+    ("gate/mac_config/ack", 0),
+    ("+/+/pong", 0),
 ]
+# Max queued non-gate MQTT messages before the oldest are dropped
+MQTT_INGEST_QUEUE_SIZE = 1000
+MQTT_KEEPALIVE_SECONDS = 60
+# Reconnect delays grow from MIN to MAX (randomised) while the broker is down
+MQTT_RECONNECT_MIN_SECONDS = 0.5
+MQTT_RECONNECT_MAX_SECONDS = 30
+# Messages published while disconnected, sent once reconnected
+MQTT_OUTBOUND_BUFFER_SIZE = 100
+# Gate clock sync: pings every N seconds, offset and drift fitted over the
+# last GATE_CLOCK_SAMPLES echoes (see utils/gate_timing.py)
+GATE_PING_INTERVAL_SECONDS = 2
+GATE_PING_TIMEOUT_SECONDS = 10
+GATE_CLOCK_SAMPLES = 30
+# The gates panel shows clock estimates refreshed at most this often (sync
+# status, deliveries and lost events show right away)
+GATE_TIMING_REFRESH_SECONDS = 10
+
+# Configuration for the shared state store. Only used when the web app runs as
+# several worker processes (wsgi.py) next to the ingest process (ingest.py).
+STATE_STORE_HOST = os.getenv("STATE_STORE_HOST", "127.0.0.1")
+STATE_STORE_PORT = int(os.getenv("STATE_STORE_PORT", "50555"))
+STATE_STORE_AUTHKEY = os.getenv("STATE_STORE_AUTHKEY", "plsnohack").encode()
+STATE_STORE_CONNECT_TIMEOUT_SECONDS = 60
+# How often web workers check the store for panels that changed
+STATE_STORE_POLL_INTERVAL_SECONDS = 0.05
 
 # Configuration save paths
 MAC_FILE = "mac_addresses.json"
 XMPP_MEMORY_FILE = "xmpp_command_memory.json"
+# Settings file writes arriving within this delay are flushed together
+JSON_STORE_FLUSH_DELAY_SECONDS = 0.2
+RACE_JOURNAL_FILE = "race_journal.log"
+RACE_SNAPSHOT_FILE = "race_snapshot.json"
+
+# Race journal: entries are fsynced in batches, state snapshotted every N entries
+RACE_JOURNAL_FSYNC_INTERVAL_SECONDS = 0.05
+RACE_JOURNAL_SNAPSHOT_EVERY = 50
+
+# Race recording (opt-in): every frame, MQTT message and log line appended to
+# segment files, kept up to RACE_RECORDING_MAX_SEGMENTS (oldest deleted
+# first), so up to 2 GB of disk with the defaults
+RACE_RECORDING = os.getenv("RACE_RECORDING", "false").lower() == "true"
+RACE_RECORDING_DIR = "recordings"
+RACE_RECORDING_SEGMENT_BYTES = 64 * 1024 * 1024
+RACE_RECORDING_MAX_SEGMENTS = 32
+# Entries waiting for the writer before new ones are dropped. Past half of
+# either limit, large entries (frames) are dropped first, so log lines and
+# gate messages still get through while the disk is slow.
+RACE_RECORDING_QUEUE_SIZE = 2000
+RACE_RECORDING_QUEUE_BYTES = 64 * 1024 * 1024
+# Capture raw MQTT and XMPP traffic for replay.py (same segment format)
+TRAFFIC_CAPTURE = os.getenv("TRAFFIC_CAPTURE", "false").lower() == "true"
+TRAFFIC_CAPTURE_DIR = "captures"
+# Every log line is also kept in a SQLite database for the log explorer
+LOG_STORE = os.getenv("LOG_STORE", "true").lower() == "true"
+LOG_STORE_PATH = "logs.sqlite3"
+# Lines waiting for the writer before new ones are dropped; lines per insert
+LOG_STORE_QUEUE_SIZE = 10000
+LOG_STORE_BATCH_SIZE = 500
+LOG_EXPLORER_PAGE_SIZE = 50
 
 # Configuration for robot names and camera
 ROBOT_NAMES = ["gerald", "mael"]
 TOP_CAMERA_NAME = "top_camera"
 
+# Configuration for log history kept per panel (sent to browsers incrementally)
+ROBOT_LOG_HISTORY = 300
+CAMERA_LOG_HISTORY = 200
+MQTT_LOG_HISTORY = 500
+ARM_LOG_HISTORY = 100
+
 # Configuration for delay and penalty
-PENALTY_TIME_SECONDS = 5
\ No newline at end of file
+PENALTY_TIME_SECONDS = 5
+
+# Configuration for camera frames
+# Show robot and top camera images as MJPEG streams instead of polled frames
+USE_MJPEG_STREAM = os.getenv("USE_MJPEG_STREAM", "false").lower() == "true"
+FRAME_STREAM_QUEUE_SIZE = 2
+# Downscaled renditions (name -> max height in px) served next to the original
+FRAME_RENDITIONS = {"thumb": 120, "card": 400}
+FRAME_JPEG_QUALITY = int(os.getenv("FRAME_JPEG_QUALITY", "75"))
+FRAME_INGEST_WORKERS = 2
+
+# 3x3 matrix mapping robot coordinates (path samples, cube positions) to top
+# camera pixels (None: the robots already send pixel coordinates)
+CAMERA_HOMOGRAPHY = None
+
+# Paths streamed as "path_points" samples, drawn over the top camera frame
+# Canvas (width, height) used until the top camera sends a frame
+PATH_CANVAS_SIZE = (640, 480)
+# Beyond this many samples per robot, the oldest half is dropped
+PATH_MAX_POINTS = 20000
+PATH_LINE_THICKNESS = 2
+
+# Cube detections drawn over the top camera frame: box size for detections
+# that only give a position
+CUBE_DEFAULT_SIZE = 24
+
+# Metrics summary at the bottom of the page (the raw figures are always served on /metrics)
+SHOW_DEBUG_PANEL = os.getenv("SHOW_DEBUG_PANEL", "false").lower() == "true"
+
+# Dash callback profiling: "off", "timing", "stack" or "cprofile" (see utils/profiling.py)
+CALLBACK_PROFILING = os.getenv("CALLBACK_PROFILING", "off").lower()
+# Calls at least this slow get their stack or profile dumped
+CALLBACK_PROFILE_SLOW_SECONDS = float(os.getenv("CALLBACK_PROFILE_SLOW_SECONDS", "0.2"))
+# Share of calls run under cProfile in "cprofile" mode
+CALLBACK_PROFILE_SAMPLE_RATE = float(os.getenv("CALLBACK_PROFILE_SAMPLE_RATE", "0.05"))
+CALLBACK_PROFILE_DIR = "callback_profiles"
+CALLBACK_PROFILE_KEEP = 50
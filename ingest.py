@@ -0,0 +1,21 @@
+"""Ingest process for running the dashboard with several web workers.
+
+Owns the MQTT and XMPP connections, the race journal and all live state,
+and serves that state to the web workers started from wsgi.py.
+"""
+from agents.receiver_agent import start_agent
+from agents.sender_agent import start_sender
+from mqtt.mqtt_client import start_mqtt_client, init_mqtt_pub_client
+from utils.race_utils import restore_race_state
+from utils.state_store import serve_state_store
+
+# Actions forwarded by the web workers must be registered here too
+import agents.broadcast
+
+if __name__ == "__main__":
+    restore_race_state()
+    start_agent()
+    start_sender()
+    start_mqtt_client()
+    init_mqtt_pub_client()
+    serve_state_store()
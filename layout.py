@@ -2,15 +2,29 @@ from dash import html, dcc
 import dash_bootstrap_components as dbc
 
 from utils.mac_utils import load_mac_addresses
+from utils.log_utils import PANELS, LOG_PANELS, ROBOT_PANEL_KINDS
+from utils.frame_utils import stream_url
+from utils.log_store import SOURCES, LEVELS
 
-from config import ROBOT_NAMES, TOP_CAMERA_NAME
+from config import TOP_CAMERA_NAME, USE_MJPEG_STREAM, SHOW_DEBUG_PANEL
+
+def live_image_src(source, size="full"):
+    """MJPEG stream URL when streaming is enabled; otherwise set by callbacks."""
+    return stream_url(source, size) if USE_MJPEG_STREAM else None
+
+def robot_component(kind, robot_id):
+    """Pattern-matching id of a robot card component; callbacks use MATCH/ALL for `robot`."""
+    return {"type": f"robot-{kind}", "robot": robot_id}
+
+def robot_version_store(kind, robot_id):
+    return {"type": "robot-version", "kind": kind, "robot": robot_id}
 
 def robot_card(robot_id):
     return dbc.Card([
         dbc.CardHeader(html.H4(f"{robot_id.upper()}")),
         dbc.CardBody([
             dbc.Row([
-                dbc.Col(html.Img(id=f"{robot_id}-image", style={
+                dbc.Col(html.Img(id=robot_component("image", robot_id), src=live_image_src(robot_id, "card"), style={
                     "maxWidth": "100%",
                     "height": "auto",
                     "maxHeight": "400px",
@@ -19,20 +33,20 @@ def robot_card(robot_id):
                 }), md=6),
                 dbc.Col([
                     html.H5("Logs"),
-                    html.Ul(id=f"{robot_id}-logs", className="log-list")
+                    html.Ul(id=robot_component("logs", robot_id), className="log-list", style={"maxHeight": "300px", "overflowY": "scroll"})
                 ], md=6),
             ]),
             html.Br(),
             dbc.Row([
-                dbc.Col(dbc.Button("Calibrate", id=f"{robot_id}-calibrate", color="primary", className="me-2")),
+                dbc.Col(dbc.Button("Calibrate", id=robot_component("calibrate", robot_id), color="primary", className="me-2")),
                 dbc.Col([
-                    dbc.Button("Penalty", id=f"{robot_id}-penalty", color="warning", n_clicks=0),
-                    html.Div(id=f"{robot_id}-penalty-status", className="mt-2", style={"color": "green", "fontWeight": "bold"})
+                    dbc.Button("Penalty", id=robot_component("penalty", robot_id), color="warning", n_clicks=0),
+                    html.Div(id=robot_component("penalty-status", robot_id), className="mt-2", style={"color": "green", "fontWeight": "bold"})
                 ]),
-                html.Div(id=f"{robot_id}-penalty-count", className="mt-2", style={"fontWeight": "bold", "color": "red"}),
+                html.Div(id=robot_component("penalty-count", robot_id), className="mt-2", style={"fontWeight": "bold", "color": "red"}),
             ]),
             html.Br(),
-            dbc.Col(html.Img(id=f"{robot_id}-path-image", style={
+            dbc.Col(html.Img(id=robot_component("path-image", robot_id), style={
                 "maxWidth": "100%",
                 "height": "auto",
                 "maxHeight": "300px",
@@ -40,9 +54,16 @@ def robot_card(robot_id):
                 "border": "1px solid #ccc",
                 "marginTop": "10px"
             })),
+            *[dcc.Store(id=robot_version_store(kind, robot_id), data=None) for kind in ROBOT_PANEL_KINDS],
+            dcc.Store(id=robot_component("log-delta", robot_id)),
+            dcc.Store(id=robot_component("log-cursor", robot_id), data=0),
+            dcc.Interval(id=robot_component("penalty-cooldown", robot_id), interval=1500, n_intervals=0, max_intervals=1),
         ])
     ], className="mb-4")
 
+def robot_column(robot_id):
+    return dbc.Col(robot_card(robot_id), md=6)
+
 def create_gates_settings():
     mac_addresses = load_mac_addresses()
     return dbc.Accordion([
@@ -75,6 +96,7 @@ def create_gates_settings():
                     html.Span(" | Gate 2 Start: "), html.Span(id="gate2-start-status"),
                     html.Span(" | Gate 2 Finish: "), html.Span(id="gate2-finish-status"),
                 ], className="mt-3", style={"fontWeight": "bold", "fontSize": "1.2em"}),
+                html.Ul(id="gate-timing", className="mt-2 small"),
                 html.Hr(),
             ])
         ], title="Gates Settings")
@@ -148,6 +170,7 @@ def top_camera_layout():
             dbc.Col(
                 html.Img(
                     id=f"{TOP_CAMERA_NAME}-image",
+                    src=live_image_src(TOP_CAMERA_NAME),
                     style={
                         "height": "100%",
                         "width": "auto",
@@ -173,6 +196,18 @@ def top_camera_layout():
         ]),
     ]
 
+def cube_detections_card():
+    return dbc.Card([
+        dbc.CardHeader("Cube Detections"),
+        dbc.CardBody([
+            html.Img(
+                id="cube-detections-image",
+                style={"maxHeight": "40vh", "width": "auto", "maxWidth": "100%", "display": "block", "margin": "0 auto"}
+            ),
+            html.Ul(id="cube-detections-list", className="mt-2 small"),
+        ])
+    ], className="mb-4")
+
 def camera_log_card():
     return dbc.Card([
         dbc.CardHeader("Top Camera Logs"),
@@ -186,9 +221,58 @@ def start_stop_buttons():
         dbc.Col(
             dbc.Button("Start", id="robots-start", color="success", disabled=False),
             width="auto", className="text-center"
-        )
+        ),
+        html.Div(id="start-ack-display", className="mt-2"),
     ], className="text-center mb-4")
 
+def log_explorer_card():
+    return dbc.Card([
+        dbc.CardHeader("Log Explorer"),
+        dbc.CardBody([
+            dbc.Row([
+                dbc.Col(dcc.Dropdown(id="log-explorer-source", options=SOURCES, placeholder="Source"), md=2),
+                dbc.Col(dcc.Dropdown(id="log-explorer-robot", options=[], placeholder="Robot"), md=2),
+                dbc.Col(dcc.Dropdown(id="log-explorer-level", options=LEVELS, placeholder="Level"), md=2),
+                dbc.Col(dbc.Input(id="log-explorer-text", type="text", placeholder="Message contains..."), md=6),
+            ], className="g-2 mb-2"),
+            dbc.Row([
+                dbc.Col([dbc.Label("From (UTC)"), dbc.Input(id="log-explorer-since", type="datetime-local")], md=3),
+                dbc.Col([dbc.Label("To (UTC)"), dbc.Input(id="log-explorer-until", type="datetime-local")], md=3),
+                dbc.Col(
+                    dbc.ButtonGroup([
+                        dbc.Button("Search", id="log-explorer-search", color="primary"),
+                        dbc.Button("Newer", id="log-explorer-newer", color="secondary", disabled=True),
+                        dbc.Button("Older", id="log-explorer-older", color="secondary", disabled=True),
+                    ]),
+                    width="auto", className="d-flex align-items-end"
+                ),
+            ], className="g-2 mb-2"),
+            html.Div(
+                dbc.Table([
+                    html.Thead(html.Tr([html.Th("Time (UTC)"), html.Th("Source"), html.Th("Robot"), html.Th("Level"), html.Th("Message")])),
+                    html.Tbody(id="log-explorer-rows"),
+                ], size="sm", striped=True, className="small"),
+                style={"maxHeight": "400px", "overflowY": "scroll"}
+            ),
+            # Cursors of the pages shown so far (None: the newest) and of the next one
+            dcc.Store(id="log-explorer-pages", data={"cursors": [None], "next": None}),
+        ])
+    ])
+
+def debug_panel():
+    if not SHOW_DEBUG_PANEL:
+        return []
+    return [
+        html.Hr(),
+        dbc.Accordion([
+            dbc.AccordionItem(
+                html.Pre(id="debug-metrics", style={"maxHeight": "400px", "overflowY": "scroll"}),
+                title="Debug metrics",
+            ),
+        ], start_collapsed=True),
+        dcc.Interval(id="debug-metrics-interval", interval=2000, n_intervals=0),
+    ]
+
 connection_status_card = dbc.Card([
     dbc.CardHeader("Connection Status"),
     dbc.CardBody([
@@ -203,11 +287,12 @@ layout = dbc.Container([
     connection_status_card,
 
     *top_camera_layout(),
+    cube_detections_card(),
     camera_log_card(),
 
-    dbc.Row([
-    dbc.Col(robot_card(robot_id), md=6) for robot_id in ROBOT_NAMES
-    ]),
+    # Robot cards are added by a callback as robots get discovered
+    dbc.Row(id="robots-container", children=[]),
+    dcc.Store(id="robot-ids", data=[]),
     start_stop_buttons(),
     html.Hr(),
     *race_timer(),
@@ -217,10 +302,17 @@ layout = dbc.Container([
     create_gates_settings(),
     html.Hr(),
     robotic_arm_card(),
-    
+    html.Hr(),
+    log_explorer_card(),
+    *debug_panel(),
+
     html.Div(id="mqtt-command-status"),
     dcc.Interval(id='update-interval', interval=100, n_intervals=0),
-    *[dcc.Interval(id=f'{robot_id}-penalty-cooldown', interval=1500, n_intervals=0, max_intervals=1) for robot_id in ROBOT_NAMES],
+    dcc.Interval(id="timer-interval", interval=100, n_intervals=0),
+    dcc.Store(id="race-clock"),
+    *[dcc.Store(id=f"{panel}-version", data=None) for panel in PANELS],
+    *[dcc.Store(id=f"{panel}-delta") for panel in LOG_PANELS],
+    *[dcc.Store(id=f"{panel}-cursor", data=0) for panel in LOG_PANELS],
     dcc.Interval(id="robots-start-cooldown", interval=3000, n_intervals=0, max_intervals=1),
     dcc.Interval(id="reset-race-clear-interval", interval=3000, n_intervals=0, max_intervals=1),
     dcc.Interval(id="capture-status-clear-interval", interval=3000, n_intervals=0, max_intervals=1),
@@ -0,0 +1,118 @@
+from collections import deque, namedtuple
+import re
+import threading
+import time
+
+from utils.metrics import histogram
+from utils.clock import utc_from_monotonic
+
+from config import MQTT_INGEST_QUEUE_SIZE
+
+# Gate start/finish events skip ahead of logging and status chatter
+PRIORITY_TOPIC = re.compile(r"gate\d*/(start|finish)")
+
+PRIORITY_LANE = "priority"
+NORMAL_LANE = "normal"
+
+# `received_at` is wall-clock (UTC, like the gate timestamps), `received_mono`
+# is used to measure how long the message waited in the queue.
+INGEST_WAIT = histogram("dashboard_mqtt_ingest_wait_seconds", "Time MQTT messages waited in the ingest queue", ["lane"])
+INGEST_PROCESSING = histogram("dashboard_mqtt_processing_seconds", "Time spent processing one MQTT message", ["lane"])
+
+IngestMessage = namedtuple("IngestMessage", ["topic", "payload", "received_at", "received_mono"])
+
+
+class LaneStats:
+    def __init__(self):
+        self.processed = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_processing = 0.0
+        self.max_processing = 0.0
+
+    def as_dict(self, depth):
+        processed = self.processed or 1
+        return {
+            "depth": depth,
+            "max_depth": self.max_depth,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "avg_wait_ms": self.total_wait / processed * 1000,
+            "max_wait_ms": self.max_wait * 1000,
+            "avg_processing_ms": self.total_processing / processed * 1000,
+            "max_processing_ms": self.max_processing * 1000,
+        }
+
+
+class IngestDispatcher:
+    """Takes MQTT messages off paho's network thread and processes them in order.
+
+    `put` is all that runs in `on_message`: it timestamps the raw message and
+    queues it. A single dispatcher thread always drains the priority lane
+    (gate start/finish) before touching the normal lane.
+    """
+
+    def __init__(self, handler, maxsize=MQTT_INGEST_QUEUE_SIZE):
+        self._handler = handler
+        self._maxsize = maxsize
+        self._lanes = {PRIORITY_LANE: deque(), NORMAL_LANE: deque()}
+        self._stats = {PRIORITY_LANE: LaneStats(), NORMAL_LANE: LaneStats()}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mqtt-ingest", daemon=True)
+                self._thread.start()
+
+    def put(self, topic, payload, received_at=None):
+        received_mono = time.monotonic()
+        message = IngestMessage(topic, payload, received_at or utc_from_monotonic(received_mono), received_mono)
+        lane = PRIORITY_LANE if PRIORITY_TOPIC.fullmatch(topic) else NORMAL_LANE
+        with self._condition:
+            queue = self._lanes[lane]
+            stats = self._stats[lane]
+            if lane == NORMAL_LANE and len(queue) >= self._maxsize:
+                # Shed the oldest chatter; gate events are never dropped
+                queue.popleft()
+                stats.dropped += 1
+            queue.append(message)
+            stats.max_depth = max(stats.max_depth, len(queue))
+            self._condition.notify()
+
+    def _next(self):
+        with self._condition:
+            while not any(self._lanes.values()):
+                self._condition.wait()
+            for lane in (PRIORITY_LANE, NORMAL_LANE):
+                if self._lanes[lane]:
+                    return lane, self._lanes[lane].popleft()
+
+    def _run(self):
+        while True:
+            lane, message = self._next()
+            started = time.monotonic()
+            try:
+                self._handler(message)
+            except Exception as e:
+                print(f"⚠️ Failed to process MQTT message on {message.topic}: {e}", flush=True)
+            finished = time.monotonic()
+
+            with self._condition:
+                stats = self._stats[lane]
+                stats.processed += 1
+                wait = started - message.received_mono
+                processing = finished - started
+                stats.total_wait += wait
+                stats.max_wait = max(stats.max_wait, wait)
+                stats.total_processing += processing
+                stats.max_processing = max(stats.max_processing, processing)
+            INGEST_WAIT.observe(wait, lane=lane)
+            INGEST_PROCESSING.observe(processing, lane=lane)
+
+    def stats(self):
+        with self._condition:
+            return {lane: self._stats[lane].as_dict(len(self._lanes[lane])) for lane in self._lanes}
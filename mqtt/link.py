@@ -0,0 +1,200 @@
+from collections import deque, namedtuple
+import asyncio
+import random
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from utils.runtime import runtime
+
+from config import MQTT_BROKER, MQTT_PORT, MQTT_KEEPALIVE_SECONDS
+from config import MQTT_RECONNECT_MIN_SECONDS, MQTT_RECONNECT_MAX_SECONDS
+from config import MQTT_OUTBOUND_BUFFER_SIZE
+
+# `on_sent(monotonic time)` (if any) is called once the message is written out
+OutboundMessage = namedtuple("OutboundMessage", ["topic", "payload", "qos", "on_sent"])
+
+# Keepalive pings and timeouts are checked this often
+MISC_INTERVAL_SECONDS = 1
+
+
+def backoff_delay(attempt):
+    """Full jitter: anywhere up to the exponential delay, so clients don't retry in lockstep."""
+    return random.uniform(0, min(MQTT_RECONNECT_MAX_SECONDS, MQTT_RECONNECT_MIN_SECONDS * 2 ** attempt))
+
+
+class MqttLink:
+    """One paho client kept connected on the shared event loop (utils.runtime).
+
+    paho does no I/O of its own: its socket is registered with the loop,
+    which calls paho when there is something to read or write. A lost
+    connection is noticed as soon as paho reports it and reconnected right
+    away, backing off exponentially (with jitter) while the broker stays
+    unreachable. `topics` are subscribed again on every connect. `publish`
+    may be called from any thread: it only queues, and the queue is written
+    out on the loop while connected, so messages published during an outage
+    go out once reconnected. The queue is bounded; when full, the oldest
+    message is dropped.
+    """
+
+    def __init__(self, name, topics=(), on_message=None, on_status=None):
+        self.name = name
+        self.topics = list(topics)
+        self._on_status = on_status
+        self._client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+        self._client.on_connect = self._handle_connect
+        self._client.on_disconnect = self._handle_disconnect
+        self._client.on_publish = self._handle_publish
+        self._client.on_socket_open = self._handle_socket_open
+        self._client.on_socket_close = self._handle_socket_close
+        self._client.on_socket_register_write = self._handle_register_write
+        self._client.on_socket_unregister_write = self._handle_unregister_write
+        if on_message:
+            self._client.on_message = on_message
+        self._outbox = deque()
+        self._lock = threading.Lock()
+        self._task = None
+        self._lost = None
+        # `on_sent` callbacks of messages handed to paho, by message id
+        self._in_flight = {}
+        self.connected = False
+        self._ever_connected = False
+        # Whether the current socket got as far as an accepted CONNACK
+        self._session_up = False
+        self._down_since = time.monotonic()
+        self._stats = {"reconnects": 0, "last_outage_seconds": None, "dropped": 0, "sent": 0}
+
+    def start(self):
+        with self._lock:
+            if self._task is None:
+                self._task = runtime.submit(self._serve())
+
+    def publish(self, topic, payload, qos=0, on_sent=None, queue_if_down=True):
+        """Queue a message; returns False if it was not queued (link down and `queue_if_down` off)."""
+        if not self.connected and not queue_if_down:
+            return False
+        with self._lock:
+            if len(self._outbox) >= MQTT_OUTBOUND_BUFFER_SIZE:
+                dropped = self._outbox.popleft()
+                self._stats["dropped"] += 1
+                print(f"⚠️ MQTT {self.name} buffer full, dropping message to {dropped.topic}", flush=True)
+            self._outbox.append(OutboundMessage(topic, payload, qos, on_sent))
+        if self.connected:
+            runtime.call_soon(self._flush)
+        return True
+
+    def stats(self):
+        with self._lock:
+            down_for = None if self.connected else time.monotonic() - self._down_since
+            return {**self._stats, "connected": self.connected, "down_for_seconds": down_for, "buffered": len(self._outbox)}
+
+    def _set_connected(self, connected):
+        self.connected = connected
+        if self._on_status:
+            self._on_status(connected)
+
+    async def _serve(self):
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        first = True
+        while True:
+            self._lost = asyncio.Event()
+            self._session_up = False
+            try:
+                # Resolving and opening the socket block: keep them off the loop
+                if first:
+                    await loop.run_in_executor(None, self._client.connect, MQTT_BROKER, MQTT_PORT, MQTT_KEEPALIVE_SECONDS)
+                else:
+                    await loop.run_in_executor(None, self._client.reconnect)
+                first = False
+            except Exception as e:
+                delay = backoff_delay(attempt)
+                attempt += 1
+                print(f"⚠️ MQTT {self.name} connect failed ({e}), retrying in {delay:.1f} s", flush=True)
+                await asyncio.sleep(delay)
+                continue
+
+            misc = loop.create_task(self._misc())
+            await self._lost.wait()
+            misc.cancel()
+            if self._session_up:
+                # A working connection dropped: try again right away
+                attempt = 0
+            else:
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+
+    async def _misc(self):
+        while self._client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(MISC_INTERVAL_SECONDS)
+
+    # paho calls these while connecting (on an executor thread) and from
+    # the loop afterwards; the loop's reader/writer only change on the loop
+    def _on_loop(self, callback, *args):
+        if runtime.in_loop():
+            callback(*args)
+        else:
+            runtime.call_soon(callback, *args)
+
+    def _handle_socket_open(self, client, userdata, sock):
+        self._on_loop(runtime.loop.add_reader, sock.fileno(), client.loop_read)
+
+    def _handle_socket_close(self, client, userdata, sock):
+        self._on_loop(runtime.loop.remove_reader, sock.fileno())
+        self._on_loop(runtime.loop.remove_writer, sock.fileno())
+        # Also covers sockets closed before the broker answered
+        self._on_loop(self._lost.set)
+
+    def _handle_register_write(self, client, userdata, sock):
+        self._on_loop(runtime.loop.add_writer, sock.fileno(), client.loop_write)
+
+    def _handle_unregister_write(self, client, userdata, sock):
+        self._on_loop(runtime.loop.remove_writer, sock.fileno())
+
+    def _handle_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code.is_failure:
+            print(f"⚠️ MQTT {self.name} connection refused: {reason_code}", flush=True)
+            client.disconnect()
+            return
+        for topic, qos in self.topics:
+            client.subscribe(topic, qos)
+        with self._lock:
+            outage = time.monotonic() - self._down_since
+            self._stats["last_outage_seconds"] = outage
+            if self._ever_connected:
+                self._stats["reconnects"] += 1
+            self._ever_connected = True
+            self._session_up = True
+        print(f"✅ MQTT {self.name} connected after {outage:.1f} s, {len(self.topics)} subscriptions", flush=True)
+        self._set_connected(True)
+        self._flush()
+
+    def _handle_disconnect(self, client, userdata, disconnect_flags, reason_code, properties):
+        if self.connected:
+            with self._lock:
+                self._down_since = time.monotonic()
+            print(f"⚠️ MQTT {self.name} disconnected: {reason_code}", flush=True)
+        self._set_connected(False)
+
+    def _handle_publish(self, client, userdata, mid, reason_code, properties):
+        # QoS 0 messages: called once paho has written them to the socket
+        on_sent = self._in_flight.pop(mid, None)
+        if on_sent:
+            on_sent(time.monotonic())
+
+    def _flush(self):
+        while self.connected:
+            with self._lock:
+                if not self._outbox:
+                    return
+                message = self._outbox[0]
+            info = self._client.publish(message.topic, message.payload, message.qos)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                # Kept for after the reconnect
+                return
+            if message.on_sent:
+                self._in_flight[info.mid] = message.on_sent
+            with self._lock:
+                self._outbox.popleft()
+                self._stats["sent"] += 1
@@ -1,41 +1,45 @@
-import paho.mqtt.client as mqtt
-from config import MQTT_BROKER, MQTT_PORT, MQTT_TOPICS
+from config import MQTT_TOPICS
 from utils.log_utils import add_mqtt_log
 from utils.race_utils import handle_gate_event
 import utils.connection_status as conn_status
-from utils.connection_status import set_gate_status
-
-import threading
-import time
-
-mqtt_pub_client = None  # publisher client
-
-def create_mqtt_client(client_name="MQTT Client"):
-    """Helper to create and connect a new MQTT client."""
-    try:
-        client = mqtt.Client()
-        client.connect(MQTT_BROKER, MQTT_PORT, 60)
-        conn_status.set_mqtt_connected(True)
-        print(f"✅ {client_name} connected to MQTT broker.", flush=True)
-        return client
-    except Exception as e:
-        conn_status.set_mqtt_connected(False)
-        print(f"⚠️ Failed to connect {client_name}: {e}", flush=True)
-        return None
-
-def on_connect(client, userdata, flags, rc):
-    print(f"✅ Connected to MQTT broker with result code {rc}", flush=True)
-    for topic, qos in MQTT_TOPICS:
-        client.subscribe(topic)
-        print(f"📥 Subscribed to {topic}", flush=True)
-
-def on_disconnect(client, userdata, rc):
-    conn_status.set_mqtt_connected(False)
-    print(f"⚠️ Disconnected from MQTT broker with result code {rc}", flush=True)
+from utils.connection_status import set_gate_status, GATE_TOPICS
+from utils.gate_timing import GateTiming, start_gate_pinger, PONG_SUFFIX
+from utils.state_store import ingest_action
+from utils.metrics import counter, gauge
+from utils.race_recorder import race_recorder, traffic_capture, MQTT
+from mqtt.ingest import IngestDispatcher
+from mqtt.link import MqttLink
+
+MQTT_MESSAGES = counter("dashboard_mqtt_messages_total", "MQTT messages received", ["topic"])
+MQTT_PUBLISHED = counter("dashboard_mqtt_published_total", "MQTT commands published", ["topic", "result"])
 
 def on_message(client, userdata, msg):
-    topic = msg.topic
-    payload = msg.payload.decode()
+    # Runs on paho's network thread: only queue the raw message
+    MQTT_MESSAGES.inc(topic=msg.topic)
+    race_recorder.record(MQTT, msg.topic, msg.payload)
+    traffic_capture.record(MQTT, msg.topic, msg.payload)
+    # Replayed messages keep the time they were originally received at
+    ingest.put(msg.topic, msg.payload, received_at=getattr(msg, "received_at", None))
+
+gate_timing = GateTiming(GATE_TOPICS)
+
+def process_message(message):
+    """Handle one queued MQTT message on the ingest dispatcher thread."""
+    topic = message.topic
+    payload = message.payload.decode()
+
+    if topic.endswith(PONG_SUFFIX):
+        # Clock sync chatter: too frequent for the MQTT log
+        gate_timing.handle_pong(topic, payload, message.received_mono)
+        return
+
+    reading = None
+    if "start" in topic or "finish" in topic:
+        reading = gate_timing.read_event(topic, payload, message.received_mono, message.received_at)
+        if reading.duplicate:
+            print(f"Ignoring redelivered gate event on {topic}: {payload}", flush=True)
+            return
+        payload = reading.event
 
     log_entry = f"[MQTT:{topic}] {payload}"
     if not payload == "clear":
@@ -49,80 +53,68 @@ def on_message(client, userdata, msg):
         conn_status.set_gate_status(topic, False)
         print(f"⚠️ {topic} disconnected", flush=True)
 
-    if "start" in topic or "finish" in topic:
-        handle_gate_event(topic, payload)
+    if reading:
+        handle_gate_event(topic, payload, received_at=reading.timestamp)
+
+ingest = IngestDispatcher(process_message)
+
+def get_ingest_stats():
+    """Queue depth, wait and processing time per ingest lane."""
+    return ingest.stats()
+
+def _register_ingest_metrics():
+    def lane_figure(figure):
+        return lambda: {(lane,): stats[figure] for lane, stats in ingest.stats().items()}
+
+    gauge("dashboard_mqtt_ingest_queue_depth", "MQTT messages waiting in the ingest queue", ["lane"], collect=lane_figure("depth"))
+    counter("dashboard_mqtt_ingest_dropped_total", "MQTT messages dropped because the ingest queue was full", ["lane"], collect=lane_figure("dropped"))
+
+def _register_link_metrics():
+    def link_figure(figure):
+        def collect():
+            values = {(link.name,): link.stats()[figure] for link in (subscriber, publisher)}
+            # No value yet, e.g. no outage so far
+            return {labels: value for labels, value in values.items() if value is not None}
+        return collect
+
+    gauge("dashboard_mqtt_link_up", "Whether an MQTT link is connected", ["link"], collect=link_figure("connected"))
+    counter("dashboard_mqtt_reconnects_total", "MQTT reconnections", ["link"], collect=link_figure("reconnects"))
+    gauge("dashboard_mqtt_last_outage_seconds", "How long the last MQTT outage lasted until reconnected", ["link"], collect=link_figure("last_outage_seconds"))
+    gauge("dashboard_mqtt_outbound_buffered", "MQTT messages waiting to be published", ["link"], collect=link_figure("buffered"))
+    counter("dashboard_mqtt_outbound_dropped_total", "MQTT messages dropped from a full outbound buffer", ["link"], collect=link_figure("dropped"))
+
+subscriber = MqttLink("subscriber", MQTT_TOPICS, on_message=on_message,
+                      on_status=lambda connected: conn_status.set_mqtt_connected("subscriber", connected))
+publisher = MqttLink("publisher", on_status=lambda connected: conn_status.set_mqtt_connected("publisher", connected))
 
 def start_mqtt_client():
-    """Start the subscriber client (with automatic reconnection)."""
-    client = None
-
-    while True:
-        if not client:
-            client = create_mqtt_client("Subscriber Client")
-            if client:
-                client.on_connect = on_connect
-                client.on_message = on_message
-                client.on_disconnect = on_disconnect
-                try:
-                    client.loop_start()
-                    print("🔄 MQTT client loop started.", flush=True)
-                except Exception as e:
-                    print(f"⚠️ Failed to start MQTT loop: {e}", flush=True)
-                    conn_status.set_mqtt_connected(False)
-                    client = None
-        else:
-            if not conn_status.is_mqtt_connected():
-                print("⚠️ MQTT client disconnected. Reconnecting...", flush=True)
-                try:
-                    client.reconnect()
-                    conn_status.set_mqtt_connected(True)
-                    print("✅ MQTT client reconnected successfully.", flush=True)
-                except Exception as e:
-                    conn_status.set_mqtt_connected(False)
-                    print(f"⚠️ MQTT reconnect failed: {e}", flush=True)
-                    client = None
-
-        time.sleep(5)
+    """Start the subscriber link (reconnects and resubscribes by itself)."""
+    ingest.start()
+    _register_ingest_metrics()
+    _register_link_metrics()
+    subscriber.start()
+    start_gate_pinger(gate_timing, publish_quietly)
 
 def init_mqtt_pub_client():
-    """Initialize the publisher client with auto-reconnect in background."""
-    def mqtt_pub_loop():
-        global mqtt_pub_client
-
-        while True:
-            if not mqtt_pub_client:
-                mqtt_pub_client = create_mqtt_client("Publisher Client")
-                if mqtt_pub_client:
-                    mqtt_pub_client.loop_start()
-            else:
-                if not conn_status.is_mqtt_connected():
-                    print("⚠️ Publisher client disconnected. Reconnecting...", flush=True)
-                    try:
-                        mqtt_pub_client.reconnect()
-                        conn_status.set_mqtt_connected(True)
-                        print("✅ Publisher client reconnected successfully.", flush=True)
-                    except Exception as e:
-                        conn_status.set_mqtt_connected(False)
-                        print(f"⚠️ Publisher reconnect failed: {e}", flush=True)
-                        mqtt_pub_client = None
-
-            time.sleep(5)  # Check every 5 seconds
-
-    # Run the publisher reconnection loop in a separate thread
-    threading.Thread(target=mqtt_pub_loop, daemon=True).start()
+    """Start the publisher link (reconnects by itself, buffers while down)."""
+    publisher.start()
+
+def get_mqtt_link_stats():
+    """Connection state, reconnects, last outage and buffered messages per link."""
+    return {link.name: link.stats() for link in (subscriber, publisher)}
+
+def publish_quietly(topic, payload, on_sent=None):
+    """Publish without logging (for periodic traffic), only while connected."""
+    return publisher.publish(topic, payload, on_sent=on_sent, queue_if_down=False)
 
+@ingest_action
 def send_mqtt_command(topic, command):
-    """Send a command using the persistent publisher client."""
-    global mqtt_pub_client
-
-    if mqtt_pub_client:
-        try:
-            mqtt_pub_client.publish(topic, command)
-            print(f"✅ Published to {topic}: {command}", flush=True)
-        except Exception as e:
-            conn_status.set_mqtt_connected(False)
-            mqtt_pub_client = None
-            print(f"⚠️ Failed to publish MQTT command: {e}", flush=True)
+    """Send a command through the publisher link; buffered while it is down."""
+    connected = publisher.connected
+    publisher.publish(topic, command)
+    if connected:
+        MQTT_PUBLISHED.inc(topic=topic, result="ok")
+        print(f"✅ Published to {topic}: {command}", flush=True)
     else:
-        print(f"⚠️ MQTT publisher client not available to send '{command}' to '{topic}'", flush=True)
-        conn_status.set_mqtt_connected(False)
+        MQTT_PUBLISHED.inc(topic=topic, result="buffered")
+        print(f"⚠️ MQTT publisher down, '{command}' to '{topic}' will be sent once reconnected", flush=True)
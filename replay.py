@@ -0,0 +1,144 @@
+"""Replay captured MQTT and XMPP traffic through the dashboard's ingest path.
+
+    python replay.py captures                     # original timing
+    python replay.py captures --speed 10          # 10 times faster
+    python replay.py captures --speed max         # as fast as possible
+    python replay.py recordings --only mqtt       # gate traffic of a race recording
+
+Capture live traffic by running the dashboard with TRAFFIC_CAPTURE=true; race
+recordings (recordings/) hold the MQTT traffic too. MQTT messages go through
+`on_message` with the time they were originally received, so race times come
+out identical at any speed; XMPP messages go through the ReceiverAgent
+handlers. The dashboard is served on port 8050 meanwhile (unless --no-server).
+
+Runs in a temporary directory so the race journal, recordings and saved
+settings of the checkout are left alone.
+"""
+import argparse
+from datetime import datetime, timezone
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+# Replayed traffic must not end up in (and rotate out) the real recordings
+os.environ.setdefault("RACE_RECORDING", "false")
+os.environ.setdefault("TRAFFIC_CAPTURE", "false")
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_speed(value):
+    if value == "max":
+        return None
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+def parse_time(value):
+    """ISO time to ns since the epoch; times without a zone are UTC, like the gates."""
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1e9)
+
+def replay(records, speed, inject):
+    """Inject `records` in order, spaced like they were captured (divided by `speed`).
+
+    Returns (messages replayed, seconds taken, worst lag behind schedule).
+    """
+    started = time.perf_counter()
+    first = None
+    count = 0
+    max_lag = 0.0
+    for record in records:
+        if first is None:
+            first = record.timestamp_ns
+        if speed:
+            due = started + (record.timestamp_ns - first) / 1e9 / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+        inject(record)
+        count += 1
+    return count, time.perf_counter() - started, max_lag
+
+def wait_for_ingest():
+    from mqtt.mqtt_client import ingest
+
+    while any(lane["depth"] for lane in ingest.stats().values()):
+        time.sleep(0.01)
+
+def make_injector():
+    from agents.receiver_agent import ReceiverAgent, deserialize_message
+    from mqtt.mqtt_client import on_message, ingest
+    from utils.race_recorder import MQTT, XMPP
+
+    ingest.start()
+    receiver = ReceiverAgent.ReceiveMessageBehaviour()
+
+    def inject(record):
+        if record.kind == MQTT:
+            received_at = datetime.utcfromtimestamp(record.timestamp_ns / 1e9)
+            on_message(None, None, SimpleNamespace(topic=record.source, payload=bytes(record.payload), received_at=received_at))
+        elif record.kind == XMPP:
+            try:
+                receiver.handle_message(deserialize_message(record.payload))
+            except Exception as e:
+                print(f"⚠️ Failed to replay XMPP message from {record.source}: {e}", flush=True)
+
+    return inject
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="capture or recording directory")
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help="replay speed factor, or 'max' (default 1)")
+    parser.add_argument("--start", type=parse_time, help="replay from this time (ISO, UTC)")
+    parser.add_argument("--end", type=parse_time, help="replay up to this time (ISO, UTC)")
+    parser.add_argument("--only", choices=["mqtt", "xmpp"], help="replay one kind of traffic")
+    parser.add_argument("--no-server", action="store_true", help="don't serve the dashboard, exit when done")
+    args = parser.parse_args()
+
+    directory = os.path.abspath(args.directory)
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(tempfile.mkdtemp(prefix="dashboard-replay-"))
+
+    from utils.race_recorder import read_recording, MQTT, XMPP
+
+    kinds = {"mqtt": {MQTT}, "xmpp": {XMPP}}.get(args.only, {MQTT, XMPP})
+    records = read_recording(directory, start_ns=args.start, end_ns=args.end, kinds=kinds)
+    inject = make_injector()
+
+    def run():
+        speed = f"{args.speed:g}×" if args.speed else "max speed"
+        print(f"▶️ Replaying {directory} at {speed}", flush=True)
+        count, elapsed, max_lag = replay(records, args.speed, inject)
+        wait_for_ingest()
+        print(f"⏹️ Replayed {count} messages in {elapsed:.1f} s (worst lag behind schedule {max_lag * 1000:.1f} ms)", flush=True)
+
+        from utils.race_utils import get_race_state
+
+        race = get_race_state()
+        if race["delta"] is not None:
+            print(f"🏁 Race: {race['elapsed']:.3f} s, Δ finish {race['delta']:.3f} s, finishes {sorted(race['finish_times'])}", flush=True)
+        elif race["finish_times"]:
+            # The recording ends before the second finish
+            print(f"🏁 Race not finished, finishes so far {sorted(race['finish_times'])}", flush=True)
+
+    if args.no_server:
+        run()
+        return
+
+    from app import app
+
+    threading.Thread(target=run, daemon=True).start()
+    app.run(host="0.0.0.0", port=8050, debug=False)
+
+
+if __name__ == "__main__":
+    main()
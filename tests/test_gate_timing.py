@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+from utils import gate_timing
+from utils.gate_timing import ClockEstimator, GateTiming
+
+
+def sample(clock, local, offset, drift=0.0, one_way=0.005, extra_return=0.0):
+    """Feed a ping sent at `local` to a gate whose clock reads local * (1 + drift) + offset."""
+    sent = local
+    gate_time = (local + one_way) * (1 + drift) + offset
+    clock.add(sent, gate_time, local + 2 * one_way + extra_return)
+
+
+def test_offset_of_symmetric_round_trips():
+    clock = ClockEstimator()
+    for i in range(10):
+        sample(clock, 100 + 2 * i, offset=12.5)
+
+    assert clock.offset == pytest.approx(12.5)
+    assert clock.drift == 0.0
+    assert clock.round_trip == pytest.approx(0.01)
+
+def test_slow_round_trips_are_left_out():
+    clock = ClockEstimator()
+    for i in range(10):
+        # Every other echo queued 200 ms on the way back
+        sample(clock, 100 + 2 * i, offset=-3.0, extra_return=0.2 if i % 2 else 0.0)
+
+    assert clock.offset == pytest.approx(-3.0)
+
+def test_drift_needs_a_long_enough_span():
+    short, long = ClockEstimator(), ClockEstimator()
+    for i in range(10):
+        sample(short, 100 + i, offset=1.0, drift=50e-6)
+        sample(long, 100 + 10 * i, offset=1.0, drift=50e-6)
+
+    assert short.drift == 0.0
+    assert long.drift == pytest.approx(50e-6, rel=1e-3)
+
+def test_to_local_inverts_the_gate_clock():
+    clock = ClockEstimator()
+    for i in range(10):
+        sample(clock, 1000 + 10 * i, offset=42.0, drift=-20e-6)
+
+    local = 1234.5
+    assert clock.to_local(local * (1 - 20e-6) + 42.0) == pytest.approx(local, abs=1e-6)
+
+def test_reset_forgets_the_estimate():
+    clock = ClockEstimator()
+    sample(clock, 100, offset=5.0)
+    clock.reset()
+
+    assert clock.offset is None
+
+
+class FakeStore:
+    def __init__(self):
+        self.values = {}
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+@pytest.fixture
+def published(monkeypatch):
+    store = FakeStore()
+    bumps = []
+    monkeypatch.setattr(gate_timing, "get_state_store", lambda: store)
+    monkeypatch.setattr(gate_timing, "bump_version", bumps.append)
+    return bumps
+
+def pong(timing, gate, sent, gate_ms, received):
+    timing._pings[(gate, 1)] = sent
+    timing.handle_pong(f"{gate}/pong", json.dumps({"id": 1, "t": gate_ms}), received)
+
+def test_pongs_publish_only_visible_changes(published, monkeypatch):
+    timing = GateTiming(["gate1/start"])
+    now = [0.0]
+    monkeypatch.setattr(gate_timing.time, "monotonic", lambda: now[0])
+
+    pong(timing, "gate1/start", 100.0, 105_005, 100.01)
+    assert len(published) == 1  # synced
+
+    for i in range(1, 5):
+        now[0] = i
+        pong(timing, "gate1/start", 100.0 + 2 * i, 105_005 + 2000 * i, 100.01 + 2 * i)
+    assert len(published) == 1  # same offset
+
+    now[0] = 5
+    pong(timing, "gate1/start", 120.0, 125_105, 120.01)
+    assert len(published) == 1  # offset moved, but refreshed too recently
+
+    now[0] = 5 + gate_timing.GATE_TIMING_REFRESH_SECONDS
+    pong(timing, "gate1/start", 130.0, 135_105, 130.01)
+    assert len(published) == 2
+
+def test_events_publish_right_away(published):
+    timing = GateTiming(["gate1/start"])
+
+    timing.read_event("gate1/start", json.dumps({"event": "object_detected", "seq": 1}), 10.0, None)
+    timing.read_event("gate1/start", json.dumps({"event": "object_detected", "seq": 3}), 11.0, None)
+
+    assert len(published) == 2
+    assert timing.stats()["gate1/start"]["lost"] == 1
+
+def test_gate_without_clock_recovers_from_a_reboot(published):
+    timing = GateTiming(["gate1/start"])
+
+    def read(seq):
+        payload = json.dumps({"event": "object_detected", "seq": seq})
+        return timing.read_event("gate1/start", payload, 10.0, None).duplicate
+
+    assert [read(seq) for seq in (10, 11, 11, 0, 1, 1, 2)] == [False, False, True, False, False, True, False]
+    assert timing.stats()["gate1/start"]["duplicates"] == 2
+
+def test_gate_with_clock_drops_late_redeliveries(published):
+    timing = GateTiming(["gate1/start"])
+
+    def read(seq, gate_ms):
+        payload = json.dumps({"event": "object_detected", "seq": seq, "t": gate_ms})
+        return timing.read_event("gate1/start", payload, 10.0, None).duplicate
+
+    assert [read(seq, 1000 * seq) for seq in (20, 21, 19)] == [False, False, True]
+    assert read(1, 50) is False  # restarted
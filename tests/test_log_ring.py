@@ -0,0 +1,49 @@
+from utils.state_store import LogRing
+
+
+def filled(count, maxlen=5):
+    ring = LogRing(maxlen)
+    for i in range(1, count + 1):
+        ring.append(f"line {i}")
+    return ring
+
+
+def test_since_returns_only_newer_entries_newest_first():
+    entries, reset, last_seq = filled(4).since(2)
+
+    assert entries == [(4, "line 4"), (3, "line 3")]
+    assert not reset
+    assert last_seq == 4
+
+def test_up_to_date_reader_gets_nothing():
+    assert filled(4).since(4) == ([], False, 4)
+
+def test_reader_behind_evicted_entries_resets():
+    ring = filled(8)  # keeps 4..8
+
+    entries, reset, _ = ring.since(2)
+
+    assert reset
+    assert [seq for seq, _ in entries] == [8, 7, 6, 5, 4]
+
+def test_reader_just_before_oldest_entry_does_not_reset():
+    entries, reset, _ = filled(8).since(3)
+
+    assert not reset
+    assert len(entries) == 5
+
+def test_cursor_from_another_run_resets():
+    entries, reset, last_seq = filled(2).since(40)
+
+    assert reset
+    assert [seq for seq, _ in entries] == [2, 1]
+    assert last_seq == 2
+
+def test_empty_ring():
+    ring = LogRing(5)
+
+    assert ring.since(0) == ([], False, 0)
+    assert ring.since(3)[1]
+
+def test_iterates_newest_first():
+    assert list(filled(3)) == ["line 3", "line 2", "line 1"]
@@ -0,0 +1,76 @@
+import itertools
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils import log_store as log_store_module
+from utils.log_store import LogStore, log_level
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Three lines per timestamp, so pages split ties
+    times = (1000.0 + i // 3 for i in itertools.count())
+    clock = SimpleNamespace(time=lambda: next(times), perf_counter=time.perf_counter, monotonic=time.monotonic, sleep=time.sleep)
+    monkeypatch.setattr(log_store_module, "time", clock)
+    store = LogStore(str(tmp_path / "logs.sqlite3"))
+    for i in range(20):
+        store.add("robot", "gerald" if i % 2 else "bob", f"line {i}")
+    store.add("mqtt", None, "❌ gate offline")
+    store.add("arm", None, "100% done_ok")
+    store.flush()
+    return store
+
+def messages(entries):
+    return [entry.message for entry in entries]
+
+
+def test_pages_cover_every_line_once_newest_first(store):
+    pages, cursor = [], None
+    while True:
+        entries, cursor = store.query(source="robot", before=cursor, limit=6)
+        pages.append(messages(entries))
+        if cursor is None:
+            break
+
+    assert [len(page) for page in pages] == [6, 6, 6, 2]
+    assert sum(pages, []) == [f"line {i}" for i in reversed(range(20))]
+
+def test_exact_last_page_ends_with_an_empty_one(store):
+    entries, cursor = store.query(source="robot", limit=20)
+    assert len(entries) == 20
+
+    entries, cursor = store.query(source="robot", before=cursor, limit=20)
+    assert (entries, cursor) == ([], None)
+
+def test_filters(store):
+    assert messages(store.query(robot="gerald", limit=3)[0]) == ["line 19", "line 17", "line 15"]
+    assert messages(store.query(level="error")[0]) == ["❌ gate offline"]
+    assert messages(store.query(text="100%")[0]) == ["100% done_ok"]
+    assert messages(store.query(text="e_o")[0]) == ["100% done_ok"]
+    assert store.query(text="0%d")[0] == []
+
+def test_time_range(store):
+    # Lines 3, 4 and 5 share the second timestamp
+    entries, _ = store.query(source="robot", since=1001.0, until=1002.0)
+
+    assert messages(entries) == ["line 5", "line 4", "line 3"]
+
+def test_query_before_anything_was_written(tmp_path):
+    assert LogStore(str(tmp_path / "missing.sqlite3")).query() == ([], None)
+
+def test_disabled_store_writes_nothing(tmp_path):
+    store = LogStore(str(tmp_path / "logs.sqlite3"), enabled=False)
+    store.add("robot", "gerald", "line")
+
+    assert store.query() == ([], None)
+
+@pytest.mark.parametrize("message, level", [
+    ("❌ Failed to send", "error"),
+    ("Connection error on gate1", "error"),
+    ("⚠️ gripper stalled", "warning"),
+    ("position 12", "info"),
+])
+def test_log_level(message, level):
+    assert log_level(message) == level
@@ -0,0 +1,40 @@
+import pytest
+
+from mqtt import link
+from mqtt.link import MqttLink, backoff_delay
+
+
+@pytest.fixture
+def upper_bound(monkeypatch):
+    """Make the jittered delay return the top of its range."""
+    monkeypatch.setattr(link.random, "uniform", lambda low, high: high)
+
+
+def test_backoff_doubles_up_to_the_maximum(upper_bound, monkeypatch):
+    monkeypatch.setattr(link, "MQTT_RECONNECT_MIN_SECONDS", 0.5)
+    monkeypatch.setattr(link, "MQTT_RECONNECT_MAX_SECONDS", 30)
+
+    assert [backoff_delay(attempt) for attempt in range(8)] == [0.5, 1, 2, 4, 8, 16, 30, 30]
+
+def test_backoff_is_jittered_from_zero():
+    delays = [backoff_delay(3) for _ in range(200)]
+
+    assert all(0 <= delay <= link.MQTT_RECONNECT_MIN_SECONDS * 8 for delay in delays)
+    assert len(set(delays)) > 1
+
+def test_publish_while_down_is_buffered():
+    mqtt_link = MqttLink("test")
+
+    assert mqtt_link.publish("robot/cmd", "start")
+    assert not mqtt_link.publish("gate1/start/ping", "{}", queue_if_down=False)
+    assert mqtt_link.stats()["buffered"] == 1
+
+def test_full_buffer_drops_the_oldest(monkeypatch):
+    monkeypatch.setattr(link, "MQTT_OUTBOUND_BUFFER_SIZE", 3)
+    mqtt_link = MqttLink("test")
+
+    for i in range(5):
+        mqtt_link.publish("robot/cmd", f"c{i}")
+
+    assert [message.payload for message in mqtt_link._outbox] == ["c2", "c3", "c4"]
+    assert mqtt_link.stats()["dropped"] == 2
@@ -0,0 +1,112 @@
+import json
+import time
+
+import pytest
+
+from utils import race_journal
+from utils.race_journal import RaceJournal, JournalLockedError
+
+
+def make_journal(tmp_path, state=None):
+    return RaceJournal(str(tmp_path / "race_journal.log"), str(tmp_path / "race_snapshot.json"), lambda: state or {})
+
+def write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines))
+
+def wait_for_entries(tmp_path, count):
+    """Reload the journal once the writer has put `count` lines on disk."""
+    path = tmp_path / "race_journal.log"
+    deadline = time.monotonic() + 2
+    while path.read_text().count("\n") < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    reloaded = make_journal(tmp_path)
+    reloaded.claim = lambda: None
+    return reloaded.load()[1]
+
+
+def test_load_without_files(tmp_path):
+    assert make_journal(tmp_path).load() == (None, [])
+
+def test_load_keeps_entries_newer_than_snapshot(tmp_path):
+    (tmp_path / "race_snapshot.json").write_text(json.dumps({"seq": 5, "state": {"running": True}}))
+    write_lines(tmp_path / "race_journal.log", [json.dumps({"seq": seq, "op": "penalty", "robot_id": "r1"}) for seq in range(3, 9)])
+
+    snapshot, entries = make_journal(tmp_path).load()
+
+    assert snapshot == {"running": True}
+    assert [entry["seq"] for entry in entries] == [6, 7, 8]
+
+def test_load_stops_at_torn_entry(tmp_path):
+    (tmp_path / "race_journal.log").write_text('{"seq": 1, "op": "reset"}\n{"seq": 2, "op": "res')
+
+    _, entries = make_journal(tmp_path).load()
+
+    assert entries == [{"seq": 1, "op": "reset"}]
+
+def test_entries_appended_after_torn_tail_survive_a_restart(tmp_path):
+    (tmp_path / "race_journal.log").write_text('{"seq": 1, "op": "reset"}\n{"seq": 2, "op": "fin')
+    journal = make_journal(tmp_path)
+    journal.load()
+
+    journal.append("finish", {"topic": "gate1/finish"})
+    journal.append("penalty", {"robot_id": "r1"})
+
+    entries = wait_for_entries(tmp_path, 3)
+    assert [(entry["seq"], entry["op"]) for entry in entries] == [(1, "reset"), (2, "finish"), (3, "penalty")]
+
+def test_whole_entry_missing_its_newline_is_kept(tmp_path):
+    (tmp_path / "race_journal.log").write_text('{"seq": 1, "op": "reset"}')
+    journal = make_journal(tmp_path)
+    journal.load()
+
+    journal.append("penalty", {"robot_id": "r1"})
+
+    assert [entry["seq"] for entry in wait_for_entries(tmp_path, 2)] == [1, 2]
+
+def test_unreadable_snapshot_replays_whole_journal(tmp_path):
+    (tmp_path / "race_snapshot.json").write_text("{")
+    write_lines(tmp_path / "race_journal.log", ['{"seq": 1, "op": "reset"}'])
+
+    snapshot, entries = make_journal(tmp_path).load()
+
+    assert snapshot is None
+    assert len(entries) == 1
+
+def test_append_continues_numbering_after_load(tmp_path):
+    (tmp_path / "race_snapshot.json").write_text(json.dumps({"seq": 7, "state": {}}))
+    journal = make_journal(tmp_path)
+    journal.load()
+
+    journal.append("penalty", {"robot_id": "r1"})
+
+    path = tmp_path / "race_journal.log"
+    deadline = time.monotonic() + 2
+    while not (path.exists() and path.read_text()) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert json.loads(path.read_text()) == {"seq": 8, "op": "penalty", "robot_id": "r1"}
+
+def test_snapshot_truncates_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(race_journal, "RACE_JOURNAL_SNAPSHOT_EVERY", 2)
+    journal = make_journal(tmp_path, state={"elapsed": 1.5})
+    journal.load()
+
+    for robot_id in ("r1", "r2", "r3"):
+        journal.append("penalty", {"robot_id": robot_id})
+
+    snapshot_path, path = tmp_path / "race_snapshot.json", tmp_path / "race_journal.log"
+    deadline = time.monotonic() + 2
+    while not (snapshot_path.exists() and "r3" in path.read_text()) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    reloaded = make_journal(tmp_path)
+    reloaded.claim = lambda: None
+    snapshot, entries = reloaded.load()
+    assert snapshot == {"elapsed": 1.5}
+    assert [entry["robot_id"] for entry in entries] == ["r3"]
+
+@pytest.mark.skipif(race_journal.fcntl is None, reason="no advisory locks on this platform")
+def test_second_owner_fails_fast(tmp_path):
+    owner = make_journal(tmp_path)
+    owner.load()
+
+    with pytest.raises(JournalLockedError):
+        make_journal(tmp_path).load()
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from utils import race_recorder
+from utils.race_recorder import RaceRecorder, read_recording, segment_bases, LOG, MQTT, FRAME, LARGE_ENTRY_BYTES
+
+
+def stalled_recorder(tmp_path, **limits):
+    """A recorder whose writer never runs, so its queue only fills."""
+    recorder = RaceRecorder(str(tmp_path), **limits)
+    recorder._writer = object()
+    return recorder
+
+def queued_kinds(recorder):
+    return [entry[1] for entry in list(recorder._queue.queue)]
+
+
+def test_round_trip(tmp_path):
+    recorder = RaceRecorder(str(tmp_path), segment_bytes=200)
+    for i in range(20):
+        recorder.record(MQTT, "gate1/start", f"p{i}".encode())
+        recorder.record(LOG, "mqtt-log-display", f"log {i}")
+
+    deadline = time.monotonic() + 2
+    records = []
+    while len(records) < 40 and time.monotonic() < deadline:
+        time.sleep(0.01)
+        records = list(read_recording(str(tmp_path)))
+
+    assert len(segment_bases(str(tmp_path))) > 1
+    assert [record.payload for record in records if record.kind == MQTT] == [f"p{i}".encode() for i in range(20)]
+    middle = records[20].timestamp_ns
+    assert all(record.timestamp_ns >= middle for record in read_recording(str(tmp_path), start_ns=middle))
+
+def test_large_entries_are_dropped_first_by_bytes(tmp_path):
+    recorder = stalled_recorder(tmp_path, queue_bytes=4 * LARGE_ENTRY_BYTES)
+    frame = b"x" * LARGE_ENTRY_BYTES
+
+    for _ in range(4):
+        recorder.record(FRAME, "gerald", frame)
+    recorder.record(LOG, "mqtt-log-display", "still recorded")
+
+    assert queued_kinds(recorder) == [FRAME, FRAME, LOG]
+
+def test_large_entries_are_dropped_first_by_count(tmp_path):
+    recorder = stalled_recorder(tmp_path, queue_size=4)
+
+    for _ in range(3):
+        recorder.record(FRAME, "gerald", b"x" * LARGE_ENTRY_BYTES)
+    for i in range(3):
+        recorder.record(MQTT, "gate1/start", b"object_detected")
+
+    assert queued_kinds(recorder) == [FRAME, FRAME, MQTT, MQTT]
+
+def test_queued_bytes_are_bounded(tmp_path):
+    recorder = stalled_recorder(tmp_path, queue_bytes=1000)
+
+    for _ in range(20):
+        recorder.record(LOG, "mqtt-log-display", "x" * 100)
+
+    assert len(queued_kinds(recorder)) == 10
+
+@pytest.mark.skipif(race_recorder.fcntl is None, reason="no advisory locks on this platform")
+def test_second_recorder_of_a_directory_stops(tmp_path):
+    first = RaceRecorder(str(tmp_path))
+    second = RaceRecorder(str(tmp_path))
+
+    first.record(LOG, "mqtt-log-display", "first")
+    second.record(LOG, "mqtt-log-display", "second")
+
+    assert first.enabled
+    assert not second.enabled
@@ -0,0 +1,19 @@
+from datetime import datetime, timedelta
+import time
+
+# Timestamps are naive UTC datetimes, like the gate timestamps and the race
+# journal. They are derived from the monotonic clock anchored once at start,
+# so intervals between them are not affected by NTP steps or time zones.
+# Each process has its own anchor; they agree to well under a millisecond.
+_EPOCH = datetime(1970, 1, 1)
+_MONOTONIC_TO_EPOCH = time.time() - time.monotonic()
+
+
+def utc_from_monotonic(monotonic):
+    return _EPOCH + timedelta(seconds=monotonic + _MONOTONIC_TO_EPOCH)
+
+def monotonic_from_utc(timestamp):
+    return (timestamp - _EPOCH).total_seconds() - _MONOTONIC_TO_EPOCH
+
+def utc_now():
+    return utc_from_monotonic(time.monotonic())
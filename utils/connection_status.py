@@ -1,36 +1,62 @@
-# Variables
-_xmpp_connected = False
-_mqtt_connected = False
-
-_gate_connection_status = {
-    "gate1/start": False,
-    "gate1/finish": False,
-    "gate2/start": False,
-    "gate2/finish": False,
-}
+from utils.log_utils import bump_version, CONNECTION_PANEL, GATES_PANEL
+from utils.state_store import get_state_store, is_shared_client
+from utils.metrics import gauge
+
+# Flags live in the state store so every web worker sees the ingest process's
+# connections
+CONNECTIONS_KEY = "connections"
+GATES_KEY = "gate_status"
+
+# The MQTT subscriber and publisher are separate connections
+MQTT_LINKS = ["subscriber", "publisher"]
+
+GATE_TOPICS = [
+    "gate1/start",
+    "gate1/finish",
+    "gate2/start",
+    "gate2/finish",
+]
+
+def _connections():
+    return get_state_store().get(CONNECTIONS_KEY) or {}
+
+def _connection_samples():
+    # Reported by the ingest process only, it owns the connections
+    if is_shared_client():
+        return {}
+    samples = {(link,): connected for link, connected in _connections().items()}
+    samples.update({(topic,): connected for topic, connected in get_all_gate_statuses().items()})
+    return samples
+
+gauge("dashboard_connected", "Whether a link (xmpp, an mqtt link or a gate topic) is up", ["link"], collect=_connection_samples)
 
 # Getter functions
 def is_xmpp_connected():
-    return _xmpp_connected
+    return _connections().get("xmpp", False)
 
-def is_mqtt_connected():
-    return _mqtt_connected
+def is_mqtt_connected(link=None):
+    """Whether an MQTT link is up; both of them when `link` is None."""
+    connections = _connections()
+    links = [link] if link else MQTT_LINKS
+    return all(connections.get(f"mqtt_{name}", False) for name in links)
 
 # Setter functions
 def set_xmpp_connected(status: bool):
-    global _xmpp_connected
-    _xmpp_connected = status
+    if get_state_store().set_field(CONNECTIONS_KEY, "xmpp", status):
+        bump_version(CONNECTION_PANEL)
 
-def set_mqtt_connected(status: bool):
-    global _mqtt_connected
-    _mqtt_connected = status
+def set_mqtt_connected(link, status: bool):
+    if get_state_store().set_field(CONNECTIONS_KEY, f"mqtt_{link}", status):
+        bump_version(CONNECTION_PANEL)
 
 def set_gate_status(topic, status: bool):
-    if topic in _gate_connection_status:
-        _gate_connection_status[topic] = status
+    if topic in GATE_TOPICS and get_state_store().set_field(GATES_KEY, topic, status):
+        bump_version(GATES_PANEL)
 
 def get_gate_status(topic):
-    return _gate_connection_status.get(topic, False)
+    return get_all_gate_statuses().get(topic, False)
 
 def get_all_gate_statuses():
-    return _gate_connection_status.copy()
\ No newline at end of file
+    statuses = {topic: False for topic in GATE_TOPICS}
+    statuses.update(get_state_store().get(GATES_KEY) or {})
+    return statuses
@@ -0,0 +1,143 @@
+from collections import namedtuple
+import json
+import math
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from utils.clock import utc_now
+from utils.frame_utils import latest_frames, latest_cube_frames, schedule_frame, encode_renditions, to_camera_pixels
+from utils.metrics import counter, histogram
+from utils.path_utils import robot_color, top_camera_background
+from utils.state_store import get_state_store
+
+from config import TOP_CAMERA_NAME, CUBE_DEFAULT_SIZE
+
+# "cube_detection" bodies are JSON, a list of cubes or {"cubes": [...]}:
+#   {"x": 412, "y": 230, "w": 30, "h": 28, "label": "red", "confidence": 0.93}
+# (x, y) is the centre of the cube, mapped through CAMERA_HOMOGRAPHY like path
+# samples; the box size (top camera pixels), label and confidence are
+# optional. Each message replaces the robot's previous detections.
+CUBES_KEY = "cube_detections"
+
+# Centres and sizes are N x 2 arrays, confidences N (NaN when not given)
+CubeDetections = namedtuple("CubeDetections", ["centres", "sizes", "confidences", "labels", "received_at"])
+
+CUBE_OVERLAYS = counter("dashboard_cube_overlay_total", "Cube overlay refreshes by outcome", ["result"])
+CUBE_RENDER = histogram("dashboard_cube_render_seconds", "Time spent drawing cube detections over the top camera frame")
+
+
+def parse_cubes(body):
+    data = json.loads(body)
+    cubes = data.get("cubes", []) if isinstance(data, dict) else data
+    if not isinstance(cubes, list):
+        raise ValueError("expected a list of cubes")
+    try:
+        centres = np.array([(cube["x"], cube["y"]) for cube in cubes], dtype=np.float32).reshape(-1, 2)
+        sizes = np.array([
+            (cube.get("w", CUBE_DEFAULT_SIZE), cube.get("h", CUBE_DEFAULT_SIZE)) for cube in cubes
+        ], dtype=np.float32).reshape(-1, 2)
+        confidences = np.array([cube.get("confidence", math.nan) for cube in cubes], dtype=np.float32)
+        labels = [str(cube.get("label", "")) for cube in cubes]
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"malformed cube: {e!r}")
+    return CubeDetections(centres, sizes, confidences, labels, utc_now())
+
+def summarize(detections):
+    """Plain form of detections for the state store (read by the web workers)."""
+    return {
+        "received_at": detections.received_at.strftime("%H:%M:%S.%f")[:-3],
+        "cubes": [
+            (label, float(x), float(y), None if math.isnan(confidence) else float(confidence))
+            for label, (x, y), confidence in zip(detections.labels, detections.centres, detections.confidences)
+        ],
+    }
+
+
+class CubeStore:
+    """Latest cube detections per robot; `version` moves with every update."""
+
+    def __init__(self):
+        self._detections = {}
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def update(self, robot_id, detections):
+        with self._lock:
+            self._detections[robot_id] = detections
+            self.version += 1
+        get_state_store().set_field(CUBES_KEY, robot_id, summarize(detections))
+
+    def snapshot(self):
+        with self._lock:
+            return self.version, dict(self._detections)
+
+
+def draw_cubes(image, detections_by_robot):
+    """Draw boxes (one polylines call per robot) and labels onto `image`."""
+    for robot_id, detections in detections_by_robot.items():
+        if not detections.labels:
+            continue
+        color = robot_color(robot_id)
+        centres = to_camera_pixels(detections.centres)
+        half = np.round(detections.sizes / 2).astype(np.int32)
+        top_left, bottom_right = centres - half, centres + half
+        top_right = np.stack([bottom_right[:, 0], top_left[:, 1]], axis=1)
+        bottom_left = np.stack([top_left[:, 0], bottom_right[:, 1]], axis=1)
+        boxes = np.stack([top_left, top_right, bottom_right, bottom_left], axis=1)
+        cv2.polylines(image, list(boxes), True, color, 2)
+        for (x, y), label, confidence in zip(top_left, detections.labels, detections.confidences):
+            text = label if math.isnan(confidence) else f"{label} {confidence:.0%}".strip()
+            if text:
+                cv2.putText(image, text, (int(x), int(y) - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.45, color, 1, cv2.LINE_AA)
+    return image
+
+
+class CubeCompositor:
+    """The top camera frame with every robot's cube detections drawn on it.
+
+    Stored as its own frame (`latest_cube_frames`), so viewers only fetch
+    the cached JPEG. A refresh renders on the frame pool, and only when the
+    camera frame or the detections changed since the last composite; without
+    detections the camera's own JPEGs are reused as they are.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._rendered = None
+
+    def refresh(self, on_stored):
+        schedule_frame(latest_cube_frames, TOP_CAMERA_NAME, self._build, on_stored)
+
+    def _build(self):
+        frame_version = latest_frames.version(TOP_CAMERA_NAME)
+        if frame_version is None:
+            return None
+        version, detections = self.store.snapshot()
+        if (frame_version, version) == self._rendered:
+            CUBE_OVERLAYS.inc(result="unchanged")
+            return None
+        frame = latest_frames.get(TOP_CAMERA_NAME)
+        key = (frame.version, version)
+
+        if not any(found.labels for found in detections.values()):
+            CUBE_OVERLAYS.inc(result="reused")
+            renditions = frame.renditions
+        else:
+            started = time.perf_counter()
+            image = draw_cubes(top_camera_background().copy(), detections)
+            renditions = encode_renditions(image)
+            CUBE_RENDER.observe(time.perf_counter() - started)
+            CUBE_OVERLAYS.inc(result="rendered")
+        self._rendered = key
+        return renditions
+
+
+cube_store = CubeStore()
+cube_compositor = CubeCompositor(cube_store)
+
+def get_cube_summaries():
+    """Latest detections per robot as stored by `summarize` (any process)."""
+    return get_state_store().get(CUBES_KEY) or {}
@@ -0,0 +1,316 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import hashlib
+import queue
+import threading
+
+import cv2
+import numpy as np
+from flask import Response, request, redirect, abort, stream_with_context
+
+from utils.state_store import get_state_store
+
+from config import TOP_CAMERA_NAME, FRAME_STREAM_QUEUE_SIZE
+from config import FRAME_RENDITIONS, FRAME_JPEG_QUALITY, FRAME_INGEST_WORKERS
+from config import CAMERA_HOMOGRAPHY
+
+FRAME_ROUTE = "/frames"
+STREAM_ROUTE = "/stream"
+STREAM_BOUNDARY = "frame"
+STREAM_KEEPALIVE_SECONDS = 5
+
+# The original JPEG as sent by the robot; other renditions are downscaled
+FULL = "full"
+
+# One encoded size of a frame, with a hash of its bytes as strong ETag
+Rendition = namedtuple("Rendition", ["etag", "data"])
+
+
+class Frame(namedtuple("Frame", ["version", "renditions"])):
+    """A frame and its renditions; `version` increases with every new frame of a source."""
+
+    def rendition(self, size=FULL):
+        return self.renditions.get(size) or self.renditions[FULL]
+
+
+class FrameStore:
+    """Latest encoded frame per source, stored once and served as-is over HTTP.
+
+    Frames live in the state store under this store's `name`; MJPEG
+    subscribers are local to the process serving them.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def put(self, source, renditions):
+        version = get_state_store().put_frame(self.name, source, renditions)
+        self.refresh(source)
+        return version
+
+    def refresh(self, source):
+        """Hand the latest frame of `source` to its subscribers in this process."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(source, ()))
+        if not subscribers:
+            return
+        frame = self.get(source)
+        if frame:
+            for subscriber in subscribers:
+                _offer_latest(subscriber, frame)
+
+    def subscribe(self, source):
+        """Bounded queue receiving every new frame of `source` (stale ones dropped)."""
+        subscriber = queue.Queue(maxsize=FRAME_STREAM_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(source, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, source, subscriber):
+        with self._lock:
+            self._subscribers.get(source, set()).discard(subscriber)
+
+    def get(self, source):
+        stored = get_state_store().get_frame(self.name, source)
+        return Frame(*stored) if stored else None
+
+    def version(self, source):
+        """Version of the latest frame of `source` (None without one), without fetching it."""
+        return get_state_store().get_frame_version(self.name, source)
+
+
+def _offer_latest(subscriber, frame):
+    # A slow viewer only ever falls behind by the queue size: drop its oldest
+    # frame rather than blocking ingest or buffering without bound.
+    while True:
+        try:
+            subscriber.put_nowait(frame)
+            return
+        except queue.Full:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                pass
+
+
+latest_frames = FrameStore("frames")
+latest_path_frames = FrameStore("path_frames")
+# Top camera frames with the cube detections drawn on them (utils.cube_utils)
+latest_cube_frames = FrameStore("cube_frames")
+
+
+# Frames are decoded (or rendered) and resized off the XMPP event loop. Only
+# the newest pending frame of a source is processed: if a robot sends faster
+# than the pool keeps up, intermediate frames are skipped instead of queueing.
+# A source is processed by one job at a time, so its frames are stored in
+# order: `_pending` holds the next build of every source with a job running
+# (None once the job has taken it).
+_executor = ThreadPoolExecutor(max_workers=FRAME_INGEST_WORKERS, thread_name_prefix="frame-ingest")
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def decode_frame(body):
+    """Decode a base64 JPEG payload received over XMPP into raw bytes."""
+    return base64.b64decode(body)
+
+def _rendition(data):
+    return Rendition(hashlib.blake2b(data, digest_size=16).hexdigest(), data)
+
+def build_renditions(data):
+    """Downscale a JPEG once into every configured rendition.
+
+    `FRAME_RENDITIONS` maps a rendition name to its maximum height; frames
+    already small enough (or that OpenCV can't decode) reuse the original.
+    """
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return _add_downscaled({FULL: _rendition(data)}, image)
+
+def encode_renditions(image):
+    """Encode an image rendered by the dashboard (BGR array) into every rendition."""
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, FRAME_JPEG_QUALITY])
+    if not ok:
+        raise ValueError("could not encode frame")
+    return _add_downscaled({FULL: _rendition(encoded.tobytes())}, image)
+
+def _add_downscaled(renditions, image):
+    full = renditions[FULL]
+    for name, max_height in FRAME_RENDITIONS.items():
+        if image is None or image.shape[0] <= max_height:
+            renditions[name] = full
+            continue
+        height, width = image.shape[:2]
+        scale = max_height / height
+        resized = cv2.resize(image, (max(1, round(width * scale)), max_height), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, FRAME_JPEG_QUALITY])
+        renditions[name] = _rendition(encoded.tobytes()) if ok else full
+    return renditions
+
+def to_camera_pixels(points):
+    """Map N x 2 robot coordinates to integer top camera pixels (CAMERA_HOMOGRAPHY)."""
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    if CAMERA_HOMOGRAPHY is not None:
+        homography = np.asarray(CAMERA_HOMOGRAPHY, dtype=np.float32)
+        points = cv2.perspectiveTransform(points.reshape(-1, 1, 2), homography).reshape(-1, 2)
+    return np.round(points).astype(np.int32)
+
+def ingest_frame(store, source, body, on_stored):
+    """Queue a base64 frame for decoding; `on_stored()` runs once it is servable."""
+    schedule_frame(store, source, lambda: build_renditions(decode_frame(body)), on_stored)
+
+def render_frame(store, source, render, on_stored):
+    """Queue `render()` (returning a BGR image) to produce the frame of `source`.
+
+    Like received frames, renders are coalesced: `render` runs once for any
+    number of requests made while the previous one was still pending.
+    """
+    schedule_frame(store, source, lambda: encode_renditions(render()), on_stored)
+
+def schedule_frame(store, source, build, on_stored):
+    """Queue `build()` on the frame pool; it returns the renditions to store, or None to keep the current frame."""
+    key = (store.name, source)
+    with _pending_lock:
+        running = key in _pending
+        _pending[key] = (build, on_stored)
+    if not running:
+        _executor.submit(_process_pending, store, source, key)
+
+def _process_pending(store, source, key):
+    # Keep building whatever was queued for the source meanwhile
+    while True:
+        with _pending_lock:
+            job = _pending[key]
+            if job is None:
+                del _pending[key]
+                return
+            _pending[key] = None
+        _process_frame(store, source, *job)
+
+def _process_frame(store, source, build, on_stored):
+    try:
+        renditions = build()
+        if renditions is None:
+            return
+    except ValueError as e:
+        print(f"⚠️ Invalid frame from {source}: {e}", flush=True)
+        return
+    except Exception as e:
+        print(f"⚠️ Failed to process frame from {source}: {e}", flush=True)
+        return
+    try:
+        store.put(source, renditions)
+        on_stored()
+    except Exception as e:
+        # Must not end the job: the source would never be scheduled again
+        print(f"⚠️ Failed to store frame from {source}: {e}", flush=True)
+
+def frame_url(source, path=False, size=FULL):
+    """Versioned URL of the latest frame, or "" if the source has none yet."""
+    if path:
+        return _frame_url(latest_path_frames, "path/", source, size)
+    return _frame_url(latest_frames, "", source, size)
+
+def cube_frame_url(size=FULL):
+    """Versioned URL of the top camera frame with the cube detections drawn on it."""
+    return _frame_url(latest_cube_frames, "cubes/", TOP_CAMERA_NAME, size)
+
+def _frame_url(store, kind, source, size):
+    version = store.version(source)
+    if version is None:
+        return ""
+    query = f"?size={size}" if size != FULL else ""
+    return f"{FRAME_ROUTE}/{source}/{kind}{version}.jpg{query}"
+
+def stream_url(source, size=FULL):
+    query = f"?size={size}" if size != FULL else ""
+    return f"{STREAM_ROUTE}/{source}.mjpg{query}"
+
+def _mjpeg_part(rendition):
+    return (
+        f"--{STREAM_BOUNDARY}\r\n"
+        f"Content-Type: image/jpeg\r\n"
+        f"Content-Length: {len(rendition.data)}\r\n\r\n"
+    ).encode() + rendition.data + b"\r\n"
+
+def _requested_size():
+    size = request.args.get("size", FULL)
+    if size != FULL and size not in FRAME_RENDITIONS:
+        abort(404)
+    return size
+
+def _serve_frame(store, kind, source, version):
+    latest = store.version(source)
+    if latest is None:
+        abort(404)
+    size = _requested_size()
+
+    # The frame itself is only fetched for the current version
+    frame = store.get(source) if version == latest else None
+    if not frame or frame.version != version:
+        # Only the latest frame is kept; point stale URLs at it without caching
+        response = redirect(_frame_url(store, kind, source, size))
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    rendition = frame.rendition(size)
+    etag = rendition.etag
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(rendition.data, mimetype="image/jpeg")
+    response.set_etag(etag)
+    # The URL carries the version, so a given URL never changes content
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+def register_frame_routes(server):
+    @server.route(f"{FRAME_ROUTE}/<source>/<int:version>.jpg")
+    def serve_frame(source, version):
+        return _serve_frame(latest_frames, "", source, version)
+
+    @server.route(f"{FRAME_ROUTE}/<source>/path/<int:version>.jpg")
+    def serve_path_frame(source, version):
+        return _serve_frame(latest_path_frames, "path/", source, version)
+
+    @server.route(f"{FRAME_ROUTE}/<source>/cubes/<int:version>.jpg")
+    def serve_cube_frame(source, version):
+        return _serve_frame(latest_cube_frames, "cubes/", source, version)
+
+    @server.route(f"{STREAM_ROUTE}/<source>.mjpg")
+    def stream_frames(source):
+        from utils.robot_registry import is_robot
+
+        if source != TOP_CAMERA_NAME and not is_robot(source):
+            abort(404)
+
+        size = _requested_size()
+        subscriber = latest_frames.subscribe(source)
+
+        def stream():
+            try:
+                # Send headers right away, even before the first frame exists
+                frame = latest_frames.get(source)
+                yield _mjpeg_part(frame.rendition(size)) if frame else b""
+                while True:
+                    try:
+                        frame = subscriber.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                    except queue.Empty:
+                        # Re-send the current frame so dead viewers get detected;
+                        # it is only fetched again if it changed
+                        version = latest_frames.version(source)
+                        if version is None:
+                            continue
+                        if not frame or frame.version != version:
+                            frame = latest_frames.get(source)
+                    yield _mjpeg_part(frame.rendition(size))
+            finally:
+                latest_frames.unsubscribe(source, subscriber)
+
+        return Response(
+            stream_with_context(stream()),
+            mimetype=f"multipart/x-mixed-replace; boundary={STREAM_BOUNDARY}",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
@@ -0,0 +1,263 @@
+from collections import deque, namedtuple
+from datetime import timedelta
+import asyncio
+import itertools
+import json
+import threading
+import time
+
+from utils.log_utils import bump_version, GATES_PANEL
+from utils.state_store import get_state_store
+from utils.metrics import gauge, histogram
+from utils.runtime import runtime
+
+from config import GATE_PING_INTERVAL_SECONDS, GATE_CLOCK_SAMPLES, GATE_PING_TIMEOUT_SECONDS
+from config import GATE_TIMING_REFRESH_SECONDS
+
+# Gate timing protocol, next to the plain "object_detected" payloads:
+#   gate event   {"event": "object_detected", "t": <gate ms>, "seq": <n>}
+#   ping         dashboard -> "<gate topic>/ping"  {"id": <n>}
+#   echo         gate -> "<gate topic>/pong"       {"id": <n>, "t": <gate ms>}
+# where <gate ms> is the gate's own millisecond clock (e.g. millis()).
+PING_SUFFIX = "/ping"
+PONG_SUFFIX = "/pong"
+GATE_TIMING_KEY = "gate_timing"
+# Drift fitted over a shorter span is mostly round trip noise
+DRIFT_MIN_SPAN_SECONDS = 30
+# Clock estimates moving less than this are not worth a panel update
+OFFSET_CHANGE_MS = 1.0
+DRIFT_CHANGE_PPM = 5.0
+# Sequence numbers this far behind the last one are taken as redeliveries;
+# anything further back means the gate restarted its count
+REDELIVERY_WINDOW = 5
+# Figures that are shown as soon as they change
+EVENT_FIELDS = ("synced", "latency_ms", "lost", "duplicates")
+
+GateReading = namedtuple("GateReading", ["event", "timestamp", "duplicate"])
+
+GATE_DELIVERY = histogram("dashboard_gate_delivery_seconds", "Delay between a gate detecting an object and the dashboard receiving it", ["gate"])
+GATE_ROUND_TRIP = histogram("dashboard_gate_ping_seconds", "Round trip of gate clock pings", ["gate"])
+
+
+class ClockEstimator:
+    """Offset and drift of a gate clock against our monotonic clock.
+
+    Each ping/echo sample brackets the gate's timestamp between sending the
+    ping and receiving the echo; assuming symmetric paths, the gate stamped it
+    half way. Only the samples with the shortest round trips (the least
+    queueing) are fitted, as gate - local = offset + drift * (local - origin).
+    """
+
+    def __init__(self, size=GATE_CLOCK_SAMPLES):
+        self._samples = deque(maxlen=size)
+        self.offset = None
+        self.drift = 0.0
+        self.origin = 0.0
+        self.round_trip = None
+
+    def add(self, sent, gate_time, received):
+        self._samples.append(((sent + received) / 2, gate_time, received - sent))
+        self._fit()
+
+    def _fit(self):
+        best = sorted(self._samples, key=lambda sample: sample[2])[:max(1, len(self._samples) // 2)]
+        self.round_trip = best[0][2]
+        locals_ = [local for local, _, _ in best]
+        offsets = [gate - local for local, gate, _ in best]
+        self.origin = sum(locals_) / len(locals_)
+        mean_offset = sum(offsets) / len(offsets)
+        spread = sum((local - self.origin) ** 2 for local in locals_)
+        if len(best) >= 3 and max(locals_) - min(locals_) >= DRIFT_MIN_SPAN_SECONDS:
+            self.drift = sum((local - self.origin) * (offset - mean_offset) for local, offset in zip(locals_, offsets)) / spread
+        else:
+            self.drift = 0.0
+        self.offset = mean_offset
+
+    def reset(self):
+        self._samples.clear()
+        self.offset = None
+        self.drift = 0.0
+        self.round_trip = None
+
+    def to_local(self, gate_time):
+        """Our monotonic time for a gate timestamp (both in seconds)."""
+        return (gate_time - self.offset + self.drift * self.origin) / (1 + self.drift)
+
+
+class GateTiming:
+    """Clock sync, sequence tracking and delivery latency for every gate."""
+
+    def __init__(self, gates):
+        self.gates = list(gates)
+        self._clocks = {gate: ClockEstimator() for gate in self.gates}
+        self._pings = {}
+        self._ping_ids = itertools.count(1)
+        self._last = {}
+        self._lost = {gate: 0 for gate in self.gates}
+        self._duplicates = {gate: 0 for gate in self.gates}
+        self._latency = {}
+        self._published = {}
+        self._published_at = None
+        self._lock = threading.Lock()
+
+    def ping_all(self, publish):
+        """Send a ping to every gate.
+
+        `publish(topic, payload, on_sent)` calls `on_sent(monotonic time)` once
+        the ping is actually written out, so time spent queued before sending
+        does not count as round trip.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._pings = {key: sent for key, sent in self._pings.items() if now - sent < GATE_PING_TIMEOUT_SECONDS}
+        for gate in self.gates:
+            ping_id = next(self._ping_ids)
+            publish(gate + PING_SUFFIX, json.dumps({"id": ping_id}), self._ping_sent(gate, ping_id))
+
+    def _ping_sent(self, gate, ping_id):
+        def on_sent(sent):
+            with self._lock:
+                self._pings[(gate, ping_id)] = sent
+        return on_sent
+
+    def handle_pong(self, topic, payload, received_mono):
+        gate = topic[:-len(PONG_SUFFIX)]
+        try:
+            data = json.loads(payload)
+            ping_id, gate_ms = data["id"], data["t"]
+        except (ValueError, KeyError, TypeError):
+            print(f"⚠️ Malformed gate echo on {topic}: {payload}", flush=True)
+            return
+        with self._lock:
+            sent = self._pings.pop((gate, ping_id), None)
+            clock = self._clocks.get(gate)
+            if sent is None or clock is None:
+                return
+            clock.add(sent, gate_ms / 1000, received_mono)
+        GATE_ROUND_TRIP.observe(received_mono - sent, gate=gate)
+        self._publish()
+
+    def read_event(self, topic, payload, received_mono, received_at):
+        """Decode a gate message and date it as precisely as possible.
+
+        Events carrying a gate timestamp are dated with the gate's clock once
+        it is synced; otherwise with the time the message was received.
+        """
+        if not payload.startswith("{"):
+            return GateReading(payload, received_at, False)
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return GateReading(payload, received_at, False)
+
+        event, gate_ms, seq = data.get("event", ""), data.get("t"), data.get("seq")
+        timestamp = received_at
+        with self._lock:
+            if seq is not None and self._check_duplicate(topic, seq, gate_ms):
+                return GateReading(event, received_at, True)
+            clock = self._clocks.get(topic)
+            latency = None
+            if gate_ms is not None and clock is not None and clock.offset is not None:
+                latency = received_mono - clock.to_local(gate_ms / 1000)
+                self._latency[topic] = latency
+        if latency is not None:
+            GATE_DELIVERY.observe(max(0.0, latency), gate=topic)
+            timestamp = received_at - timedelta(seconds=latency)
+        self._publish()
+        return GateReading(event, timestamp, False)
+
+    def _check_duplicate(self, gate, seq, gate_ms):
+        """Track sequence numbers (lock held): count gaps, spot redeliveries and reboots."""
+        last = self._last.get(gate)
+        self._last[gate] = (seq, gate_ms)
+        if last is None:
+            return False
+        last_seq, _ = last
+        if seq > last_seq:
+            self._lost[gate] = self._lost.get(gate, 0) + seq - last_seq - 1
+            return False
+        # Without a gate clock only an exact repeat is known to be a redelivery
+        if seq == last_seq or (gate_ms is not None and last_seq - seq <= REDELIVERY_WINDOW):
+            self._last[gate] = last
+            self._duplicates[gate] = self._duplicates.get(gate, 0) + 1
+            return True
+        # The gate restarted: its sequence and clock started over
+        if gate in self._clocks:
+            self._clocks[gate].reset()
+        return False
+
+    def stats(self):
+        with self._lock:
+            stats = {}
+            for gate in self.gates:
+                clock = self._clocks[gate]
+                latency = self._latency.get(gate)
+                stats[gate] = {
+                    "synced": clock.offset is not None,
+                    "offset_ms": clock.offset * 1000 if clock.offset is not None else None,
+                    "drift_ppm": clock.drift * 1e6,
+                    "uncertainty_ms": clock.round_trip / 2 * 1000 if clock.round_trip is not None else None,
+                    "latency_ms": latency * 1000 if latency is not None else None,
+                    "lost": self._lost[gate],
+                    "duplicates": self._duplicates[gate],
+                }
+            return stats
+
+    def _publish(self):
+        """Update the gates panel if something visible changed.
+
+        Pongs arrive every GATE_PING_INTERVAL_SECONDS per gate and nudge the
+        clock estimates by fractions of a millisecond, so those are only
+        published when they moved noticeably, at most every
+        GATE_TIMING_REFRESH_SECONDS.
+        """
+        stats = self.stats()
+        now = time.monotonic()
+        with self._lock:
+            refresh_due = self._published_at is None or now - self._published_at >= GATE_TIMING_REFRESH_SECONDS
+            change = _change(self._published, stats)
+            if not change or (change == "clock" and not refresh_due):
+                return
+            self._published = stats
+            self._published_at = now
+        get_state_store().set(GATE_TIMING_KEY, stats)
+        bump_version(GATES_PANEL)
+
+
+def _change(previous, current):
+    """What changed: "event" (sync status or event figures), "clock" (only the clock estimates, noticeably) or None."""
+    clock_moved = False
+    for gate, stats in current.items():
+        before = previous.get(gate)
+        if before is None or any(stats[field] != before[field] for field in EVENT_FIELDS):
+            return "event"
+        if stats["synced"]:
+            clock_moved = clock_moved or (
+                abs(stats["offset_ms"] - before["offset_ms"]) >= OFFSET_CHANGE_MS
+                or abs(stats["uncertainty_ms"] - before["uncertainty_ms"]) >= OFFSET_CHANGE_MS
+                or abs(stats["drift_ppm"] - before["drift_ppm"]) >= DRIFT_CHANGE_PPM
+            )
+    return "clock" if clock_moved else None
+
+
+def get_gate_timing():
+    """Latest timing figures per gate (any process)."""
+    return get_state_store().get(GATE_TIMING_KEY) or {}
+
+def start_gate_pinger(timing, publish):
+    """Ping the gates periodically from the shared event loop."""
+    async def ping_loop():
+        while True:
+            await asyncio.sleep(GATE_PING_INTERVAL_SECONDS)
+            try:
+                timing.ping_all(publish)
+            except Exception as e:
+                print(f"⚠️ Failed to ping gates: {e}", flush=True)
+
+    gauge("dashboard_gate_clock_offset_seconds", "Estimated gate clock offset", ["gate"], collect=lambda: {
+        (gate,): stats["offset_ms"] / 1000 for gate, stats in timing.stats().items() if stats["synced"]
+    })
+    gauge("dashboard_gate_clock_drift_ppm", "Estimated gate clock drift", ["gate"], collect=lambda: {
+        (gate,): stats["drift_ppm"] for gate, stats in timing.stats().items() if stats["synced"]
+    })
+    runtime.submit(ping_loop())
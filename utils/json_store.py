@@ -0,0 +1,118 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+from config import JSON_STORE_FLUSH_DELAY_SECONDS
+
+
+class JsonStore:
+    """Small key-value store backed by a JSON object file.
+
+    Reads are served from memory; the file is only re-read when its mtime or
+    size changed (edited by hand, or written by another web worker). Writes
+    update memory right away and are flushed by a background writer, which
+    coalesces bursts of writes into one atomic replace of the file. Keys
+    written but not flushed yet survive a reload of the file.
+    """
+
+    def __init__(self, path, defaults=None):
+        self.path = path
+        self._defaults = dict(defaults or {})
+        self._data = None
+        self._file_stamp = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_needed = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._writer = None
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self):
+        """Reload the file if it changed since it was last read or written (lock held)."""
+        stamp = self._stamp()
+        if self._data is not None and stamp == self._file_stamp:
+            return
+        data = {}
+        if stamp is not None:
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable {self.path}: {e}", flush=True)
+        self._data = {**self._defaults, **data, **self._pending}
+        self._file_stamp = stamp
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._refresh()
+            return self._data.get(key, default)
+
+    def as_dict(self):
+        with self._lock:
+            self._refresh()
+            return dict(self._data)
+
+    def set(self, key, value):
+        self.update({key: value})
+
+    def update(self, values):
+        with self._lock:
+            self._refresh()
+            self._data.update(values)
+            self._pending.update(values)
+            self._start_writer()
+            self._flush_needed.notify()
+
+    def _start_writer(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="json-store", daemon=True)
+            self._writer.start()
+            atexit.register(self.flush)
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._flush_needed.wait()
+            # Let a burst of writes (e.g. typing in a field) land in one file write
+            time.sleep(JSON_STORE_FLUSH_DELAY_SECONDS)
+            self.flush()
+
+    def flush(self):
+        """Write pending changes now."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                # Pick up changes made by other processes since the last read
+                self._refresh()
+                data = dict(self._data)
+                flushed = dict(self._pending)
+
+            # Readers are not held up by the disk; per process temp file, as
+            # several web workers may flush the same file
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(data, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"⚠️ Failed to write {self.path}: {e}", flush=True)
+                return
+
+            with self._lock:
+                for key, value in flushed.items():
+                    # Keys written again meanwhile stay pending
+                    if self._pending.get(key) is value:
+                        del self._pending[key]
+                self._file_stamp = self._stamp()
@@ -0,0 +1,184 @@
+from collections import namedtuple
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from utils.metrics import counter, histogram
+
+from config import LOG_STORE, LOG_STORE_PATH, LOG_STORE_QUEUE_SIZE, LOG_STORE_BATCH_SIZE
+from config import LOG_EXPLORER_PAGE_SIZE
+
+# Where a log line comes from (the panel it was shown in)
+SOURCES = ["robot", "camera", "mqtt", "arm"]
+LEVELS = ["info", "warning", "error"]
+
+# `ts` is seconds since the epoch; `id` breaks ties between equal times
+LogEntry = namedtuple("LogEntry", ["id", "ts", "source", "robot", "level", "message"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    source TEXT NOT NULL,
+    robot TEXT,
+    level TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS logs_source_ts ON logs (source, ts);
+CREATE INDEX IF NOT EXISTS logs_robot_ts ON logs (robot, ts);
+CREATE INDEX IF NOT EXISTS logs_ts ON logs (ts);
+"""
+
+LOG_STORE_WRITTEN = counter("dashboard_log_store_entries_total", "Log lines written to the log database")
+LOG_STORE_DROPPED = counter("dashboard_log_store_dropped_total", "Log lines dropped because the log database writer fell behind")
+LOG_STORE_WRITE = histogram("dashboard_log_store_write_seconds", "Time spent writing a batch of log lines")
+LOG_STORE_QUERY = histogram("dashboard_log_store_query_seconds", "Time spent on a log explorer query")
+
+
+def log_level(message):
+    """Level of a log line, from the markers the dashboard and robots use."""
+    lowered = message.lower()
+    if message.startswith("❌") or "error" in lowered:
+        return "error"
+    if message.startswith("⚠️") or "warning" in lowered:
+        return "warning"
+    return "info"
+
+
+class LogStore:
+    """Every log line in a SQLite database, beyond the short in-memory logs.
+
+    `add` only queues the line, so it is safe on the ingest threads; a
+    background writer inserts everything queued so far in one transaction.
+    The database is in WAL mode, so the log explorer reads (from any process)
+    while lines are being written. Queries page with a (ts, id) cursor
+    instead of an offset and walk the (source, ts), (robot, ts) or (ts)
+    index, so every page costs the same however deep it is.
+    """
+
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self._queue = queue.Queue(maxsize=LOG_STORE_QUEUE_SIZE)
+        self._writer = None
+        self._lock = threading.Lock()
+        self._readers = threading.local()
+
+    def add(self, source, robot, message, level=None):
+        if not self.enabled:
+            return
+        self._start_writer()
+        try:
+            self._queue.put_nowait((time.time(), source, robot, level or log_level(message), message))
+        except queue.Full:
+            LOG_STORE_DROPPED.inc()
+
+    def flush(self, timeout=2.0):
+        """Wait (up to `timeout`) for the queued lines to be written."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _start_writer(self):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="log-store", daemon=True)
+                    self._writer.start()
+                    atexit.register(self.flush)
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only risks the last transactions on power loss
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _write_loop(self):
+        connection = None
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < LOG_STORE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            started = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = self._connect()
+                with connection:
+                    connection.executemany("INSERT INTO logs (ts, source, robot, level, message) VALUES (?, ?, ?, ?, ?)", batch)
+                LOG_STORE_WRITTEN.inc(len(batch))
+                LOG_STORE_WRITE.observe(time.perf_counter() - started)
+            except Exception as e:
+                print(f"⚠️ Failed to write {len(batch)} log lines: {e}", flush=True)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _reader(self):
+        # sqlite3 connections belong to the thread that opened them
+        connection = getattr(self._readers, "connection", None)
+        if connection is None:
+            if not os.path.exists(self.path):
+                return None
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=10)
+            self._readers.connection = connection
+        return connection
+
+    def query(self, source=None, robot=None, level=None, text=None, since=None, until=None, before=None, limit=LOG_EXPLORER_PAGE_SIZE):
+        """Newest lines first matching every given filter, and the cursor of the next page.
+
+        `before` is the cursor returned with the previous page; the next
+        cursor is None on the last page. `text` matches anywhere in the
+        message; `since`/`until` are seconds since the epoch.
+        """
+        connection = self._reader()
+        if connection is None:
+            return [], None
+
+        conditions, params = [], []
+        for column, value in (("source", source), ("robot", robot), ("level", level)):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if text:
+            conditions.append("message LIKE ? ESCAPE '\\'")
+            escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        if since is not None:
+            conditions.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("ts < ?")
+            params.append(until)
+        if before is not None:
+            conditions.append("(ts, id) < (?, ?)")
+            params.extend(before)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"SELECT id, ts, source, robot, level, message FROM logs {where} ORDER BY ts DESC, id DESC LIMIT ?"
+        started = time.perf_counter()
+        try:
+            rows = connection.execute(sql, [*params, limit]).fetchall()
+        except sqlite3.OperationalError as e:
+            # e.g. the writer has not created the table yet
+            print(f"⚠️ Log query failed: {e}", flush=True)
+            return [], None
+        LOG_STORE_QUERY.observe(time.perf_counter() - started)
+
+        entries = [LogEntry(*row) for row in rows]
+        cursor = (entries[-1].ts, entries[-1].id) if len(entries) == limit else None
+        return entries, cursor
+
+
+log_store = LogStore(LOG_STORE_PATH, enabled=LOG_STORE)
@@ -1,37 +1,234 @@
-from collections import deque
-from datetime import datetime
+from datetime import datetime, timezone
+import threading
+import time
 
-from config import ROBOT_NAMES, TOP_CAMERA_NAME
+from config import TOP_CAMERA_NAME, STATE_STORE_POLL_INTERVAL_SECONDS
+from config import ROBOT_LOG_HISTORY, CAMERA_LOG_HISTORY, MQTT_LOG_HISTORY, ARM_LOG_HISTORY
+from utils.frame_utils import latest_frames, latest_path_frames, ingest_frame, decode_frame
+from utils.path_utils import ingest_path_points
+from utils.cube_utils import cube_store, cube_compositor, parse_cubes
+from utils.race_recorder import race_recorder, FRAME, PATH_FRAME, PATH_POINTS, LOG
+from utils.log_store import log_store
+from utils.clock import utc_now
+from utils.state_store import get_state_store, is_shared_client, ingest_action
 
-robot_logs = {robot: deque(maxlen=10) for robot in ROBOT_NAMES}
+class StoredLog:
+    """A LogRing kept in the state store under `name` (see utils.state_store)."""
 
-camera_logs = deque(maxlen=10)
+    def __init__(self, name, maxlen):
+        self.name = name
+        self.maxlen = maxlen
 
-mqtt_logs = deque(maxlen=20)
+    def append(self, message):
+        return get_state_store().append_log(self.name, message, self.maxlen)
 
-arm_logs = deque(maxlen=5)
+    def since(self, seq):
+        return get_state_store().log_since(self.name, seq)
 
-robot_states = {robot: False for robot in ROBOT_NAMES}
+    @property
+    def last_seq(self):
+        return get_state_store().log_last_seq(self.name)
 
-latest_frames = {robot: None for robot in ROBOT_NAMES}
-latest_path_frames = {robot: None for robot in ROBOT_NAMES}
-latest_frames[TOP_CAMERA_NAME] = None
+    def __iter__(self):
+        return iter(get_state_store().log_messages(self.name))
 
 
+# Panel versions: every mutation bumps the counter of the panel it affects,
+# so the UI only re-renders (and re-sends) panels whose version moved.
+# Panel keys are the ids of the components they drive.
+CAMERA_LOGS_PANEL = "camera-log-display"
+MQTT_LOGS_PANEL = "mqtt-log-display"
+ARM_LOGS_PANEL = "robotic-arm-log-display"
+RACE_PANEL = "race"
+CONNECTION_PANEL = "connection-status"
+GATES_PANEL = "gate-status"
+BROADCAST_PANEL = "start-ack-display"
+ROBOTS_PANEL = "robots"
+CUBES_PANEL = "cube-detections"
+
+# Every robot has one panel of each kind, keyed "<robot_id>-<kind>"
+ROBOT_PANEL_KINDS = ["logs", "image", "path-image"]
+
+def robot_panel(kind, robot_id):
+    return f"{robot_id}-{kind}"
+
+def robot_logs_panel(robot_id):
+    return robot_panel("logs", robot_id)
+
+def frame_panel(robot_id):
+    return robot_panel("image", robot_id)
+
+def path_frame_panel(robot_id):
+    return robot_panel("path-image", robot_id)
+
+# Panels that exist once, whatever the number of robots
+PANELS = [
+    frame_panel(TOP_CAMERA_NAME),
+    CAMERA_LOGS_PANEL,
+    MQTT_LOGS_PANEL,
+    ARM_LOGS_PANEL,
+    RACE_PANEL,
+    CONNECTION_PANEL,
+    GATES_PANEL,
+    BROADCAST_PANEL,
+    ROBOTS_PANEL,
+    CUBES_PANEL,
+]
+
+# Log panels are sent to browsers as deltas (see LogRing.since)
+LOG_PANELS = [
+    CAMERA_LOGS_PANEL,
+    MQTT_LOGS_PANEL,
+    ARM_LOGS_PANEL,
+]
+
+# Logs are stored under the key of the panel showing them
+camera_logs = StoredLog(CAMERA_LOGS_PANEL, CAMERA_LOG_HISTORY)
+
+mqtt_logs = StoredLog(MQTT_LOGS_PANEL, MQTT_LOG_HISTORY)
+
+arm_logs = StoredLog(ARM_LOGS_PANEL, ARM_LOG_HISTORY)
+
+def robot_log(robot_id):
+    return StoredLog(robot_logs_panel(robot_id), ROBOT_LOG_HISTORY)
+
+def set_robot_state(robot_id, running):
+    get_state_store().set_field("robot_states", robot_id, running)
+
+
+_version_listeners = []
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def add_version_listener(listener):
+    """Call `listener(panel)` after every version bump (e.g. to push the change).
+
+    In a web worker the bumps happen in other processes, so a watcher thread
+    polls the shared store and calls the listeners for panels that moved.
+    """
+    _version_listeners.append(listener)
+    if is_shared_client():
+        _start_version_watcher()
+
+def bump_version(panel):
+    version = get_state_store().bump_version(panel)
+    if not is_shared_client():
+        for listener in _version_listeners:
+            listener(panel)
+    return version
+
+def get_version(panel):
+    return get_versions().get(panel, 0)
+
+def get_versions():
+    return get_state_store().get_versions()
+
+def _start_version_watcher():
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = threading.Thread(target=_watch_versions, name="version-watcher", daemon=True)
+            _watcher.start()
+
+def _watch_versions():
+    seen = get_versions()
+    while True:
+        time.sleep(STATE_STORE_POLL_INTERVAL_SECONDS)
+        try:
+            versions = get_versions()
+        except Exception as e:
+            print(f"⚠️ Lost the state store: {e}", flush=True)
+            continue
+        for panel, version in versions.items():
+            if seen.get(panel) != version:
+                _refresh_frame_subscribers(panel)
+                for listener in _version_listeners:
+                    listener(panel)
+        seen = versions
+
+def _refresh_frame_subscribers(panel):
+    # Frames stored by the ingest process reach this worker's MJPEG viewers
+    # through the version bump of their panel
+    if panel.endswith("-image") and not panel.endswith("-path-image"):
+        latest_frames.refresh(panel[:-len("-image")])
+
+
+def record_log(panel, message):
+    """Record a log line; from a web worker, the ingest process records it."""
+    if race_recorder.enabled:
+        _record_log(panel, message)
+
+@ingest_action
+def _record_log(panel, message):
+    # Only the ingest process writes recordings/
+    race_recorder.record(LOG, panel, message)
+
 def add_log(robot_id, message):
-    if robot_id in robot_logs:
-        robot_logs[robot_id].appendleft(message)
+    from utils.robot_registry import is_robot
+
+    if is_robot(robot_id):
+        robot_log(robot_id).append(message)
+        record_log(robot_logs_panel(robot_id), message)
+        log_store.add("robot", robot_id, message)
+        bump_version(robot_logs_panel(robot_id))
     elif robot_id == TOP_CAMERA_NAME:
-        camera_logs.appendleft(message)
+        camera_logs.append(message)
+        record_log(CAMERA_LOGS_PANEL, message)
+        log_store.add("camera", robot_id, message)
+        bump_version(CAMERA_LOGS_PANEL)
 
 def add_mqtt_log(msg):
-    mqtt_logs.appendleft(msg)
+    mqtt_logs.append(msg)
+    record_log(MQTT_LOGS_PANEL, msg)
+    log_store.add("mqtt", None, msg)
+    bump_version(MQTT_LOGS_PANEL)
 
 def add_arm_log(msg):
-    arm_logs.appendleft(msg)
+    arm_logs.append(msg)
+    record_log(ARM_LOGS_PANEL, msg)
+    log_store.add("arm", None, msg)
+    bump_version(ARM_LOGS_PANEL)
+
+def set_frame(robot_id, body):
+    """Store a base64 JPEG received over XMPP; decoded once in the ingest pool."""
+    # Recorded in full, even when the pool skips it for a newer frame
+    race_recorder.record(FRAME, robot_id, body, convert=decode_frame)
+
+    def on_stored():
+        bump_version(frame_panel(robot_id))
+        if robot_id == TOP_CAMERA_NAME:
+            # The cube detections are drawn on the top camera frame
+            refresh_cube_overlay()
+
+    ingest_frame(latest_frames, robot_id, body, on_stored)
+
+def set_path_frame(robot_id, body):
+    race_recorder.record(PATH_FRAME, robot_id, body, convert=decode_frame)
+    ingest_frame(latest_path_frames, robot_id, body, lambda: bump_version(path_frame_panel(robot_id)))
+
+def set_cube_detections(robot_id, body):
+    """Replace a robot's cube detections with those of a message; returns them."""
+    detections = parse_cubes(body)
+    cube_store.update(robot_id, detections)
+    bump_version(CUBES_PANEL)
+    refresh_cube_overlay()
+    return detections
+
+def refresh_cube_overlay():
+    cube_compositor.refresh(lambda: bump_version(CUBES_PANEL))
+
+def add_path_points(robot_id, body):
+    """Extend a robot's path with streamed samples; drawn into its path image."""
+    race_recorder.record(PATH_POINTS, robot_id, body)
+    ingest_path_points(robot_id, body, lambda: bump_version(path_frame_panel(robot_id)))
 
-def parse_timestamp(ts_str):
+def parse_timestamp(ts_str, default=None):
     try:
-        return datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
+        timestamp = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
+        # Race times are naive UTC
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        return timestamp
     except Exception:
-        return datetime.utcnow()
\ No newline at end of file
+        return default or utc_now()
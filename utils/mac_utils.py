@@ -1,13 +1,10 @@
-import json
-import os
+from utils.json_store import JsonStore
 from config import MAC_FILE
 
+_macs = JsonStore(MAC_FILE, defaults={"gate1_start": "", "gate1_finish": "", "gate2_start": "", "gate2_finish": ""})
+
 def save_mac_addresses(mac_data):
-    with open(MAC_FILE, "w") as f:
-        json.dump(mac_data, f)
+    _macs.update(mac_data)
 
 def load_mac_addresses():
-    if os.path.exists(MAC_FILE):
-        with open(MAC_FILE, "r") as f:
-            return json.load(f)
-    return {"gate1_start": "", "gate1_finish": "", "gate2_start": "", "gate2_finish": ""}
+    return _macs.as_dict()
@@ -0,0 +1,262 @@
+import bisect
+import json
+import re
+import threading
+import time
+
+from flask import Response, g, request
+
+from utils.state_store import ingest_action, is_shared_client
+
+METRICS_ROUTE = "/metrics"
+DASH_UPDATE_ROUTE = "/_dash-update-component"
+
+# Latency buckets in seconds, from sub-millisecond handlers to slow callbacks
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Frame size buckets in bytes, 10 KB to 4 MB
+SIZE_BUCKETS = (10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_000_000, 4_000_000)
+
+_metrics = {}
+_registry_lock = threading.Lock()
+
+
+class Metric:
+    """A metric family; samples are keyed by their label values.
+
+    A `collect` function makes the metric read its samples on scrape instead
+    of being updated in place. It returns a value, or {label values: value}.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        if self._collect:
+            collected = self._collect()
+            return collected if isinstance(collected, dict) else {(): collected}
+        with self._lock:
+            return dict(self._values)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def samples(self):
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+
+
+def _register(metric):
+    with _registry_lock:
+        return _metrics.setdefault(metric.name, metric)
+
+def counter(name, documentation, labelnames=(), collect=None):
+    return _register(Counter(name, documentation, labelnames, collect))
+
+def gauge(name, documentation, labelnames=(), collect=None):
+    return _register(Gauge(name, documentation, labelnames, collect))
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+
+def collect():
+    """Picklable snapshot of every metric of this process that has samples."""
+    families = []
+    with _registry_lock:
+        metrics = list(_metrics.values())
+    for metric in metrics:
+        try:
+            samples = metric.samples()
+        except Exception as e:
+            print(f"⚠️ Failed to collect metric {metric.name}: {e}", flush=True)
+            continue
+        if samples:
+            families.append({
+                "name": metric.name,
+                "kind": metric.kind,
+                "documentation": metric.documentation,
+                "labelnames": metric.labelnames,
+                "buckets": getattr(metric, "buckets", None),
+                "samples": samples,
+            })
+    return families
+
+def _thread_counts():
+    counts = {}
+    for thread in threading.enumerate():
+        # "frame-ingest_1" and "Thread-7 (process_request_thread)" count as one name each
+        name = re.sub(r"[-_]\d+.*$", "", thread.name)
+        counts[(name,)] = counts.get((name,), 0) + 1
+    return counts
+
+gauge("dashboard_threads", "Live threads by name", ["name"], collect=_thread_counts)
+
+@ingest_action
+def collect_ingest_metrics():
+    return collect()
+
+def _merge(families, others):
+    """Add the families of another process; each process reports its own share, so samples are summed."""
+    merged = {family["name"]: family for family in families}
+    for family in others:
+        mine = merged.get(family["name"])
+        if not mine:
+            merged[family["name"]] = family
+            continue
+        samples = dict(mine["samples"])
+        for key, value in family["samples"].items():
+            if key not in samples:
+                samples[key] = value
+            elif family["kind"] != "histogram":
+                samples[key] += value
+            else:
+                counts, total, count = samples[key]
+                samples[key] = ([a + b for a, b in zip(counts, value[0])], total + value[1], count + value[2])
+        merged[family["name"]] = {**mine, "samples": samples}
+    return list(merged.values())
+
+def collect_all():
+    """This process's metrics, plus the ingest process's ones in a web worker."""
+    families = collect()
+    if is_shared_client():
+        families = _merge(families, collect_ingest_metrics())
+    return sorted(families, key=lambda family: family["name"])
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    escaped = [
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    ]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+def _format_value(value):
+    if value is True or value is False:
+        return "1" if value else "0"
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render_prometheus(families):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for family in families:
+        name, names = family["name"], family["labelnames"]
+        lines.append(f"# HELP {name} {family['documentation']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        for key, value in sorted(family["samples"].items()):
+            if family["kind"] != "histogram":
+                lines.append(f"{name}{_format_labels(names, key)} {_format_value(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip([*family["buckets"], float("inf")], counts):
+                cumulative += bucket_count
+                labels = _format_labels(names, key, [("le", _format_value(bound))])
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(names, key)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(names, key)} {count}")
+    return "\n".join(lines) + "\n"
+
+def render_summary(families):
+    """Short human readable digest for the debug panel."""
+    lines = []
+    for family in families:
+        for key, value in sorted(family["samples"].items()):
+            labels = ",".join(key)
+            name = f"{family['name']}{{{labels}}}" if labels else family["name"]
+            if family["kind"] == "histogram":
+                counts, total, count = value
+                mean = total / count if count else 0
+                mean = f"{mean * 1000:.2f} ms" if family["buckets"] == LATENCY_BUCKETS else f"{mean:.0f}"
+                lines.append(f"{name}: {count} × mean {mean}")
+            else:
+                lines.append(f"{name}: {_format_value(value)}")
+    return "\n".join(lines)
+
+
+CALLBACK_DURATION = histogram("dashboard_callback_duration_seconds", "Dash callback request duration", ["callback"])
+CALLBACK_RESPONSE_BYTES = histogram("dashboard_callback_response_bytes", "Dash callback response size", ["callback"], buckets=SIZE_BUCKETS)
+
+def callback_label(output):
+    """First output of a callback: "race-version.data", or the type of a pattern-matching id."""
+    first = output.strip(".").split("...")[0]
+    component, _, prop = first.rpartition(".")
+    if component.startswith("{"):
+        try:
+            component = json.loads(component).get("type", component)
+        except ValueError:
+            pass
+    return f"{component}.{prop}"
+
+def register_metrics_route(server):
+    """Serve /metrics and time every Dash callback request."""
+    @server.route(METRICS_ROUTE)
+    def metrics():
+        return Response(render_prometheus(collect_all()), mimetype="text/plain; version=0.0.4")
+
+    @server.before_request
+    def start_callback_timer():
+        if request.path.endswith(DASH_UPDATE_ROUTE):
+            g.callback_started = time.perf_counter()
+
+    @server.after_request
+    def observe_callback(response):
+        started = g.pop("callback_started", None)
+        if started is not None:
+            body = request.get_json(silent=True) or {}
+            label = callback_label(body.get("output", "unknown"))
+            CALLBACK_DURATION.observe(time.perf_counter() - started, callback=label)
+            CALLBACK_RESPONSE_BYTES.observe(response.calculate_content_length() or 0, callback=label)
+        return response
@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+import zlib
+
+import cv2
+import numpy as np
+
+from utils.frame_utils import latest_frames, latest_path_frames, render_frame, to_camera_pixels
+from utils.metrics import counter, histogram
+
+from config import TOP_CAMERA_NAME, PATH_CANVAS_SIZE
+from config import PATH_MAX_POINTS, PATH_LINE_THICKNESS
+
+# "path_points" messages carry the samples taken since the previous message:
+#   {"points": [[x, y], ...]}           or [x, y, heading] samples
+#   {"reset": true, "points": [...]}    starts a new path
+# Coordinates are top camera pixels unless CAMERA_HOMOGRAPHY maps them.
+
+# BGR, picked per robot from its name
+PATH_COLORS = [(0, 200, 255), (255, 120, 0), (80, 220, 80), (200, 80, 255), (0, 80, 255), (255, 220, 0)]
+BLANK_SHADE = 40
+MARKER_RADIUS = 6
+
+PATH_POINTS_RECEIVED = counter("dashboard_path_points_total", "Path samples received from robots")
+PATH_RENDER = histogram("dashboard_path_render_seconds", "Time spent drawing a path over the top camera frame")
+
+
+def parse_points(body):
+    """(reset, samples as an N x 2 float array) from a "path_points" body."""
+    data = json.loads(body)
+    points = np.asarray(data.get("points") or [], dtype=np.float32)
+    if points.size == 0:
+        points = np.empty((0, 2), dtype=np.float32)
+    elif points.ndim != 2 or points.shape[1] < 2:
+        raise ValueError(f"expected [x, y] samples, got shape {points.shape}")
+    return bool(data.get("reset")), points[:, :2]
+
+
+class PathTrack:
+    """The samples of one robot's path and the overlay they are drawn on.
+
+    Samples are appended to a NumPy array that grows by doubling. Rendering
+    only draws the segments added since the previous render onto a cached
+    overlay, then lays the overlay over the background; the overlay is
+    redrawn in full only when the canvas size changes or old samples are
+    dropped.
+    """
+
+    def __init__(self, color):
+        self.color = color
+        self._points = np.empty((256, 2), dtype=np.float32)
+        self._count = 0
+        self._drawn = 0
+        self._overlay = None
+        self._mask = None
+        self._lock = threading.Lock()
+
+    def extend(self, points):
+        with self._lock:
+            needed = self._count + len(points)
+            if needed > PATH_MAX_POINTS:
+                kept = np.concatenate([self._points[:self._count], points])[-(PATH_MAX_POINTS // 2):]
+                self._points = np.empty((PATH_MAX_POINTS, 2), dtype=np.float32)
+                self._points[:len(kept)] = kept
+                self._count = len(kept)
+                self._overlay = None
+                return
+            if needed > len(self._points):
+                grown = np.empty((max(needed, 2 * len(self._points)), 2), dtype=np.float32)
+                grown[:self._count] = self._points[:self._count]
+                self._points = grown
+            self._points[self._count:needed] = points
+            self._count = needed
+
+    def reset(self):
+        with self._lock:
+            self._count = 0
+            self._overlay = None
+
+    def __len__(self):
+        return self._count
+
+    def render(self, background):
+        """Draw the new segments and return the path over `background` (BGR)."""
+        with self._lock:
+            if self._overlay is None or self._overlay.shape != background.shape:
+                self._overlay = np.zeros_like(background)
+                self._mask = np.zeros(background.shape[:2], dtype=np.uint8)
+                self._drawn = 0
+            # Continue from the last drawn sample so segments join up
+            new = to_camera_pixels(self._points[max(0, self._drawn - 1):self._count])
+            if len(new) > 1:
+                cv2.polylines(self._overlay, [new], False, self.color, PATH_LINE_THICKNESS)
+                cv2.polylines(self._mask, [new], False, 255, PATH_LINE_THICKNESS)
+            self._drawn = self._count
+
+            image = background.copy()
+            cv2.copyTo(self._overlay, self._mask, image)
+            position = new[-1] if len(new) else None
+        if position is not None:
+            cv2.circle(image, (int(position[0]), int(position[1])), MARKER_RADIUS, self.color, -1)
+        return image
+
+
+_tracks = {}
+_tracks_lock = threading.Lock()
+_background = {"version": None, "image": None}
+_background_lock = threading.Lock()
+
+
+def robot_color(robot_id):
+    """BGR color of a robot's path and cube detections."""
+    return PATH_COLORS[zlib.crc32(robot_id.encode()) % len(PATH_COLORS)]
+
+def get_track(robot_id):
+    with _tracks_lock:
+        track = _tracks.get(robot_id)
+        if track is None:
+            track = _tracks[robot_id] = PathTrack(robot_color(robot_id))
+        return track
+
+def top_camera_background():
+    """The latest top camera frame, decoded once per frame; a blank canvas without one."""
+    version = latest_frames.version(TOP_CAMERA_NAME)
+    with _background_lock:
+        if _background["image"] is None or version != _background["version"]:
+            image = None
+            frame = latest_frames.get(TOP_CAMERA_NAME) if version is not None else None
+            if frame is not None:
+                version = frame.version
+                data = frame.rendition().data
+                image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                width, height = PATH_CANVAS_SIZE
+                image = np.full((height, width, 3), BLANK_SHADE, dtype=np.uint8)
+            _background["version"] = version
+            _background["image"] = image
+        return _background["image"]
+
+def ingest_path_points(robot_id, body, on_stored):
+    """Add the samples of a "path_points" message and queue a render of the path.
+
+    Renders go through the frame pool and are coalesced, so samples arriving
+    faster than the path can be drawn are drawn together.
+    """
+    reset, points = parse_points(body)
+    track = get_track(robot_id)
+    if reset:
+        track.reset()
+    track.extend(points)
+    PATH_POINTS_RECEIVED.inc(len(points))
+    render_frame(latest_path_frames, robot_id, lambda: _render(track), on_stored)
+
+def _render(track):
+    started = time.perf_counter()
+    image = track.render(top_camera_background())
+    PATH_RENDER.observe(time.perf_counter() - started)
+    return image
@@ -0,0 +1,147 @@
+import cProfile
+import functools
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from dash import _callback
+
+from utils.metrics import histogram, callback_label
+
+from config import (
+    CALLBACK_PROFILING, CALLBACK_PROFILE_DIR, CALLBACK_PROFILE_KEEP,
+    CALLBACK_PROFILE_SAMPLE_RATE, CALLBACK_PROFILE_SLOW_SECONDS,
+)
+
+# Opt-in instrumentation of the Dash callbacks. When CALLBACK_PROFILING is
+# off the callbacks are not wrapped at all, so it costs nothing in production.
+# Callbacks are named like in utils.metrics, after their first output, since
+# many are lambdas; their duration and response size are always recorded
+# there (dashboard_callback_duration_seconds, _response_bytes).
+#   "timing":   CPU time per callback
+#   "stack":    timing, plus a stack snapshot of calls still running after
+#               CALLBACK_PROFILE_SLOW_SECONDS
+#   "cprofile": timing, plus a cProfile of a sample of the calls, kept when
+#               the call turned out slow
+PROFILING_MODES = ("off", "timing", "stack", "cprofile")
+WATCHDOG_INTERVAL_SECONDS = 0.05
+
+CALLBACK_CPU = histogram("dashboard_callback_cpu_seconds", "CPU time spent in a Dash callback", ["callback"])
+
+# Calls in flight for the stack watchdog: id -> (callback name, thread id, started)
+_running = {}
+_snapshotted = set()
+_running_lock = threading.Lock()
+# One cProfile at a time keeps the sampled overhead bounded
+_profiler_lock = threading.Lock()
+_dump_lock = threading.Lock()
+
+
+def _dump(callback_name, wall, suffix, write):
+    """Write a profile or stack file and keep only the newest CALLBACK_PROFILE_KEEP."""
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S.%f")
+    name = re.sub(r"[^\w.-]", "_", callback_name)
+    path = os.path.join(CALLBACK_PROFILE_DIR, f"{stamp}_{name}_{wall * 1000:.0f}ms.{suffix}")
+    with _dump_lock:
+        try:
+            os.makedirs(CALLBACK_PROFILE_DIR, exist_ok=True)
+            write(path)
+            dumps = sorted(name for name in os.listdir(CALLBACK_PROFILE_DIR) if re.match(r"\d{8}T", name))
+            for name in dumps[:-CALLBACK_PROFILE_KEEP]:
+                os.remove(os.path.join(CALLBACK_PROFILE_DIR, name))
+        except OSError as e:
+            print(f"⚠️ Failed to write callback profile {path}: {e}", flush=True)
+
+def _dump_profile(callback_name, wall, profiler):
+    _dump(callback_name, wall, "prof", lambda path: pstats.Stats(profiler).dump_stats(path))
+
+def _dump_stack(callback_name, elapsed, frame):
+    def write(path):
+        with open(path, "w") as f:
+            f.write(f"{callback_name} still running after {elapsed * 1000:.0f} ms\n\n")
+            f.writelines(traceback.format_stack(frame))
+    _dump(callback_name, elapsed, "txt", write)
+
+def _watch_slow_calls():
+    """Snapshot the stack of calls running longer than CALLBACK_PROFILE_SLOW_SECONDS, once each."""
+    while True:
+        time.sleep(WATCHDOG_INTERVAL_SECONDS)
+        now = time.perf_counter()
+        with _running_lock:
+            slow = [
+                (call_id, call) for call_id, call in _running.items()
+                if call_id not in _snapshotted and now - call[2] >= CALLBACK_PROFILE_SLOW_SECONDS
+            ]
+            _snapshotted.update(call_id for call_id, _ in slow)
+        if not slow:
+            continue
+        frames = sys._current_frames()
+        for _, (callback_name, thread_id, started) in slow:
+            frame = frames.get(thread_id)
+            if frame is not None:
+                _dump_stack(callback_name, now - started, frame)
+
+
+def _profiled(callback_name, func, mode):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = None
+        if mode == "cprofile" and random.random() < CALLBACK_PROFILE_SAMPLE_RATE and _profiler_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+        call_id = object()
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        if mode == "stack":
+            with _running_lock:
+                _running[call_id] = (callback_name, threading.get_ident(), started)
+        try:
+            if profiler:
+                profiler.enable()
+            return func(*args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+            wall = time.perf_counter() - started
+            cpu = time.thread_time() - cpu_started
+            if mode == "stack":
+                with _running_lock:
+                    _running.pop(call_id, None)
+                    _snapshotted.discard(call_id)
+            CALLBACK_CPU.observe(cpu, callback=callback_name)
+            if profiler:
+                _profiler_lock.release()
+                if wall >= CALLBACK_PROFILE_SLOW_SECONDS:
+                    _dump_profile(callback_name, wall, profiler)
+    return wrapper
+
+def instrument_callbacks(app, mode=CALLBACK_PROFILING):
+    """Wrap every server-side callback registered so far (app.callback and dash.callback alike).
+
+    Call it once all callbacks are registered. Does nothing when `mode` is "off".
+    """
+    if mode == "off":
+        return 0
+    if mode not in PROFILING_MODES:
+        raise ValueError(f"Unknown callback profiling mode {mode!r}, expected one of {PROFILING_MODES}")
+
+    count = 0
+    for callback_map in (app.callback_map, _callback.GLOBAL_CALLBACK_MAP):
+        for output, spec in callback_map.items():
+            func = spec.get("callback")
+            # Clientside callbacks have no Python function
+            if func is None or getattr(func, "__profiled__", False):
+                continue
+            spec["callback"] = _profiled(callback_label(output), func, mode)
+            spec["callback"].__profiled__ = True
+            count += 1
+
+    if mode == "stack":
+        threading.Thread(target=_watch_slow_calls, name="callback-watchdog", daemon=True).start()
+    print(f"🔬 Profiling {count} callbacks ({mode})", flush=True)
+    return count
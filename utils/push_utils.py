@@ -0,0 +1,123 @@
+import json
+import queue
+import threading
+
+from flask import Response, stream_with_context
+from plotly.utils import PlotlyJSONEncoder
+
+from utils.metrics import gauge
+
+# Server push channel (Server-Sent Events). Each connected browser gets its
+# own bounded queue of diffs; a diff maps component ids to the properties
+# that changed, e.g. {"mqtt-log-display": {"children": [...]}}.
+PUSH_ROUTE = "/events"
+HEARTBEAT_SECONDS = 15
+CLIENT_QUEUE_SIZE = 100
+
+_clients = set()
+_clients_lock = threading.Lock()
+
+_dirty_panels = set()
+_dirty_condition = threading.Condition()
+
+
+def client_count():
+    with _clients_lock:
+        return len(_clients)
+
+def publish(diff):
+    """Send a diff to every connected browser."""
+    if not diff:
+        return
+    data = json.dumps(diff, cls=PlotlyJSONEncoder)
+    with _clients_lock:
+        clients = list(_clients)
+    for client in clients:
+        try:
+            client.put_nowait(data)
+        except queue.Full:
+            # Slow viewer: drop its backlog and let it resync from a snapshot
+            _drop_client(client)
+
+def _drop_client(client):
+    with _clients_lock:
+        _clients.discard(client)
+    try:
+        client.put_nowait(None)
+    except queue.Full:
+        pass
+
+def mark_dirty(panel):
+    """Version listener: schedule a panel to be rendered and pushed."""
+    with _dirty_condition:
+        _dirty_panels.add(panel)
+        _dirty_condition.notify()
+
+def start_push_worker(render_panel):
+    """Render dirty panels off the ingest threads and publish them.
+
+    Bursts of updates to the same panel are coalesced into a single diff.
+    """
+    def worker():
+        while True:
+            with _dirty_condition:
+                while not _dirty_panels:
+                    _dirty_condition.wait()
+                panels = list(_dirty_panels)
+                _dirty_panels.clear()
+
+            if not client_count():
+                continue
+
+            diff = {}
+            for panel in panels:
+                try:
+                    diff.update(render_panel(panel))
+                except Exception as e:
+                    print(f"⚠️ Failed to render panel {panel} for push: {e}", flush=True)
+            publish(diff)
+
+    threading.Thread(target=worker, daemon=True).start()
+
+def register_push_route(server, snapshot):
+    """Mount the SSE endpoint on the Flask server.
+
+    `snapshot` returns the full diff sent to a browser when it (re)connects.
+    """
+    gauge("dashboard_push_clients", "Browsers connected to the push channel", collect=client_count)
+
+    @server.route(PUSH_ROUTE)
+    def push_events():
+        client = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        # Registered first, so diffs published while the snapshot renders are
+        # queued behind it instead of lost
+        with _clients_lock:
+            _clients.add(client)
+        try:
+            initial = json.dumps(snapshot(), cls=PlotlyJSONEncoder)
+        except Exception:
+            _drop_client(client)
+            raise
+
+        def stream():
+            try:
+                yield "retry: 2000\n\n"
+                yield f"data: {initial}\n\n"
+                while True:
+                    try:
+                        data = client.get(timeout=HEARTBEAT_SECONDS)
+                    except queue.Empty:
+                        yield ": heartbeat\n\n"
+                        continue
+                    if data is None:
+                        break
+                    yield f"data: {data}\n\n"
+            finally:
+                with _clients_lock:
+                    _clients.discard(client)
+
+        return Response(
+            stream_with_context(stream()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
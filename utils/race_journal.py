@@ -0,0 +1,151 @@
+import json
+import os
+import queue
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): a second writer is not detected
+    fcntl = None
+
+from config import RACE_JOURNAL_FSYNC_INTERVAL_SECONDS, RACE_JOURNAL_SNAPSHOT_EVERY
+
+
+class JournalLockedError(RuntimeError):
+    pass
+
+
+class RaceJournal:
+    """Append-only journal of race state transitions with periodic snapshots.
+
+    `append` only numbers the entry and hands it to a background writer, so it
+    is cheap enough to call inline on the MQTT thread. The writer batches
+    entries and fsyncs once per batch. Every `RACE_JOURNAL_SNAPSHOT_EVERY`
+    entries the state (captured inline, in order with the entries) is written
+    atomically to the snapshot file and the journal is truncated, so replay
+    on startup only covers recent events.
+
+    Only one process may own the journal: `load` (and the first `append`)
+    take an exclusive lock on the journal file and fail with
+    JournalLockedError while another process holds it.
+    """
+
+    def __init__(self, journal_path, snapshot_path, snapshot_state):
+        self.journal_path = journal_path
+        self.snapshot_path = snapshot_path
+        self._snapshot_state = snapshot_state
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._since_snapshot = 0
+        self._writer = None
+        self._lock_file = None
+
+    def claim(self):
+        """Take the journal for this process; raises JournalLockedError if another has it."""
+        if self._lock_file is not None or fcntl is None:
+            return
+        f = open(self.journal_path, "a")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            raise JournalLockedError(f"{self.journal_path} is in use by another process")
+        self._lock_file = f
+
+    def load(self):
+        """Return (snapshot state or None, journal entries newer than it)."""
+        self.claim()
+        snapshot = None
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, "r") as f:
+                    data = json.load(f)
+                snapshot, snapshot_seq = data["state"], data["seq"]
+            except (ValueError, KeyError) as e:
+                print(f"⚠️ Ignoring unreadable race snapshot: {e}", flush=True)
+
+        entries = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r+b") as f:
+                # End of the last whole entry: a torn tail is cut off there,
+                # or the next entry would be appended onto it
+                valid_end = 0
+                last_line = b""
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash: only the tail can be affected
+                        print("⚠️ Dropping truncated race journal entry", flush=True)
+                        break
+                    valid_end += len(line)
+                    last_line = line
+                    if entry["seq"] > snapshot_seq:
+                        entries.append(entry)
+                if f.seek(0, os.SEEK_END) > valid_end:
+                    f.truncate(valid_end)
+                if last_line and not last_line.endswith(b"\n"):
+                    # A whole entry whose newline was not written yet
+                    f.seek(valid_end)
+                    f.write(b"\n")
+
+        with self._lock:
+            self._seq = max([snapshot_seq, *[entry["seq"] for entry in entries]])
+            self._since_snapshot = len(entries)
+        return snapshot, entries
+
+    def append(self, op, data):
+        with self._lock:
+            self._seq += 1
+            entry = {"seq": self._seq, "op": op, **data}
+            self._since_snapshot += 1
+            snapshot = None
+            if self._since_snapshot >= RACE_JOURNAL_SNAPSHOT_EVERY:
+                snapshot = {"seq": self._seq, "state": self._snapshot_state()}
+                self._since_snapshot = 0
+            self._start_writer()
+        self._queue.put((entry, snapshot))
+
+    def _start_writer(self):
+        if self._writer is None:
+            self.claim()
+            self._writer = threading.Thread(target=self._write_loop, name="race-journal", daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        f = open(self.journal_path, "a")
+        while True:
+            batch = [self._queue.get()]
+            # Group everything that arrived meanwhile into one fsync
+            time.sleep(RACE_JOURNAL_FSYNC_INTERVAL_SECONDS)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                for entry, snapshot in batch:
+                    f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                    if snapshot:
+                        f.flush()
+                        os.fsync(f.fileno())
+                        self._write_snapshot(snapshot)
+                        f.close()
+                        f = open(self.journal_path, "w")
+                f.flush()
+                os.fsync(f.fileno())
+            except OSError as e:
+                print(f"⚠️ Failed to write race journal: {e}", flush=True)
+
+    def _write_snapshot(self, snapshot):
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
@@ -0,0 +1,278 @@
+from collections import namedtuple
+import bisect
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): a second writer is not detected
+    fcntl = None
+
+from utils.metrics import counter
+
+from config import RACE_RECORDING, RACE_RECORDING_DIR, RACE_RECORDING_SEGMENT_BYTES
+from config import RACE_RECORDING_MAX_SEGMENTS, RACE_RECORDING_QUEUE_SIZE, RACE_RECORDING_QUEUE_BYTES
+from config import TRAFFIC_CAPTURE, TRAFFIC_CAPTURE_DIR
+
+# Recorded entry kinds
+FRAME = 1
+PATH_FRAME = 2
+MQTT = 3
+LOG = 4
+# Raw XMPP message as received, only in traffic captures
+XMPP = 5
+PATH_POINTS = 6
+KIND_NAMES = {FRAME: "frame", PATH_FRAME: "path_frame", MQTT: "mqtt", LOG: "log", XMPP: "xmpp", PATH_POINTS: "path_points"}
+
+# A segment is a pair of files named after the time of its first entry:
+#   <ns>.seg  magic, then entries: header (time ns, kind, source length,
+#             payload length), source (utf-8), payload
+#   <ns>.idx  one (time ns, offset in .seg) pair per entry, times never
+#             decreasing, so a time can be found by bisection
+SEGMENT_MAGIC = b"RACEREC1"
+ENTRY_HEADER = struct.Struct("<qBHI")
+INDEX_ENTRY = struct.Struct("<qQ")
+
+# Entries at least this large (frames) are the first dropped under pressure
+LARGE_ENTRY_BYTES = 16 * 1024
+
+Record = namedtuple("Record", ["timestamp_ns", "kind", "source", "payload"])
+
+RECORDED = counter("dashboard_recorder_entries_total", "Entries written to the race recording", ["kind"])
+RECORDED_BYTES = counter("dashboard_recorder_bytes_total", "Bytes written to the race recording")
+RECORDER_DROPPED = counter("dashboard_recorder_dropped_total", "Entries dropped because the recorder fell behind", ["kind"])
+
+
+class RaceRecorder:
+    """Appends everything the dashboard receives to size-bounded segment files.
+
+    `record` only timestamps the entry and queues it, so it is safe on the
+    MQTT and XMPP threads; a background writer appends batches to the current
+    segment and starts a new one past `segment_bytes`. Payloads that need
+    work before being stored (base64 frames) are converted by the writer.
+
+    The queue is bounded by entries and by bytes. Once it is half full by
+    either measure, large entries are dropped so that a slow disk costs
+    frames before it costs log lines or gate messages.
+
+    A directory has a single writer: segments are assumed to be in time
+    order and old ones are pruned. The first recorder to start its writer
+    takes an exclusive lock on `<directory>/.lock`; a recorder in another
+    process that finds it taken stops recording. Only the ingest process
+    records (web workers hand their log lines over with
+    `log_utils.record_log`).
+    """
+
+    def __init__(self, directory, enabled=True, segment_bytes=RACE_RECORDING_SEGMENT_BYTES, max_segments=RACE_RECORDING_MAX_SEGMENTS,
+                 queue_size=RACE_RECORDING_QUEUE_SIZE, queue_bytes=RACE_RECORDING_QUEUE_BYTES):
+        self.directory = directory
+        self.enabled = enabled
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.queue_size = queue_size
+        self.queue_bytes = queue_bytes
+        self._queue = queue.Queue()
+        self._queued_bytes = 0
+        self._writer = None
+        self._lock_file = None
+        self._lock = threading.Lock()
+
+    def record(self, kind, source, payload, convert=None, size=None):
+        """Queue an entry; `payload` is bytes or str, or whatever `convert` turns into bytes.
+
+        `size` is the payload's size in bytes, needed when it is neither.
+        """
+        if not self.enabled:
+            return
+        self._start_writer()
+        if not self.enabled:
+            return
+        if size is None:
+            size = len(payload)
+        with self._lock:
+            entries = self._queue.qsize()
+            if size >= LARGE_ENTRY_BYTES:
+                full = 2 * entries >= self.queue_size or 2 * (self._queued_bytes + size) > self.queue_bytes
+            else:
+                full = entries >= self.queue_size or self._queued_bytes + size > self.queue_bytes
+            if not full:
+                self._queued_bytes += size
+                self._queue.put_nowait((time.time_ns(), kind, source, payload, convert, size))
+        if full:
+            RECORDER_DROPPED.inc(kind=KIND_NAMES.get(kind, kind))
+
+    def _start_writer(self):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    if not self._claim():
+                        print(f"⚠️ {self.directory}/ is being recorded by another process, not recording here", flush=True)
+                        self.enabled = False
+                        return
+                    self._writer = threading.Thread(target=self._write_loop, name="race-recorder", daemon=True)
+                    self._writer.start()
+
+    def _claim(self):
+        if fcntl is None:
+            return True
+        os.makedirs(self.directory, exist_ok=True)
+        f = open(os.path.join(self.directory, ".lock"), "a")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._lock_file = f
+        return True
+
+    def _write_loop(self):
+        os.makedirs(self.directory, exist_ok=True)
+        segment = index = None
+        last_timestamp = 0
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self._lock:
+                self._queued_bytes -= sum(entry[-1] for entry in batch)
+
+            try:
+                for timestamp, kind, source, payload, convert, size in batch:
+                    if convert:
+                        payload = convert(payload)
+                    if isinstance(payload, str):
+                        payload = payload.encode()
+                    source = source.encode()
+                    if segment is None or segment.tell() >= self.segment_bytes:
+                        segment, index = self._new_segment(segment, index, timestamp)
+                    # Entries from different threads can be queued slightly out
+                    # of order; the index stays sorted, the entry keeps its time
+                    last_timestamp = max(last_timestamp, timestamp)
+                    index.write(INDEX_ENTRY.pack(last_timestamp, segment.tell()))
+                    segment.write(ENTRY_HEADER.pack(timestamp, kind, len(source), len(payload)))
+                    segment.write(source)
+                    segment.write(payload)
+                    RECORDED.inc(kind=KIND_NAMES.get(kind, kind))
+                    RECORDED_BYTES.inc(ENTRY_HEADER.size + len(source) + len(payload))
+                segment.flush()
+                index.flush()
+            except Exception as e:
+                print(f"⚠️ Failed to write race recording: {e}", flush=True)
+
+    def _new_segment(self, segment, index, timestamp):
+        if segment is not None:
+            segment.close()
+            index.close()
+        base = os.path.join(self.directory, f"{timestamp:020d}")
+        segment = open(f"{base}.seg", "wb")
+        segment.write(SEGMENT_MAGIC)
+        index = open(f"{base}.idx", "wb")
+        self._prune()
+        return segment, index
+
+    def _prune(self):
+        for base in segment_bases(self.directory)[:-self.max_segments]:
+            for suffix in (".seg", ".idx"):
+                try:
+                    os.remove(base + suffix)
+                except FileNotFoundError:
+                    pass
+
+
+def segment_bases(directory):
+    """Path of every segment (without suffix), oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name[:-4] for name in os.listdir(directory) if name.endswith(".seg"))
+    return [os.path.join(directory, name) for name in names]
+
+
+class _IndexTimes:
+    """Sequence view of the times in a memory-mapped index, for bisect."""
+
+    def __init__(self, data):
+        self._data = data
+
+    def __len__(self):
+        return len(self._data) // INDEX_ENTRY.size
+
+    def __getitem__(self, position):
+        return INDEX_ENTRY.unpack_from(self._data, position * INDEX_ENTRY.size)[0]
+
+    def offset(self, position):
+        return INDEX_ENTRY.unpack_from(self._data, position * INDEX_ENTRY.size)[1]
+
+
+def _map(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _read_segment(base, start_ns, end_ns, kinds):
+    data = _map(f"{base}.seg")
+    if data is None:
+        return
+    try:
+        offset = len(SEGMENT_MAGIC)
+        if start_ns is not None:
+            index = _map(f"{base}.idx")
+            if index is not None:
+                try:
+                    times = _IndexTimes(index)
+                    position = bisect.bisect_left(times, start_ns)
+                    if position < len(times):
+                        offset = times.offset(position)
+                    elif len(times):
+                        # Past the last indexed entry: scan whatever follows it
+                        offset = times.offset(len(times) - 1)
+                finally:
+                    index.close()
+
+        while offset + ENTRY_HEADER.size <= len(data):
+            timestamp, kind, source_length, payload_length = ENTRY_HEADER.unpack_from(data, offset)
+            source_start = offset + ENTRY_HEADER.size
+            payload_start = source_start + source_length
+            offset = payload_start + payload_length
+            if offset > len(data):
+                # Entry still being written (or torn by a crash)
+                return
+            if end_ns is not None and timestamp > end_ns:
+                return
+            if start_ns is not None and timestamp < start_ns:
+                continue
+            if kinds and kind not in kinds:
+                continue
+            yield Record(timestamp, kind, data[source_start:payload_start].decode(), data[payload_start:offset])
+    finally:
+        data.close()
+
+def read_recording(directory=RACE_RECORDING_DIR, start_ns=None, end_ns=None, kinds=None):
+    """Yield the recorded entries between two times (ns since the epoch, inclusive).
+
+    Only the segments overlapping the range are opened; each is memory-mapped
+    and its index bisected to land on `start_ns` directly.
+    """
+    bases = segment_bases(directory)
+    if start_ns is not None:
+        # Segments are named after their first entry: skip those ending before start
+        starts = [int(os.path.basename(base)) for base in bases]
+        first = max(0, next((i for i, begin in enumerate(starts) if begin > start_ns), len(bases)) - 1)
+        bases = bases[first:]
+    for base in bases:
+        if end_ns is not None and int(os.path.basename(base)) > end_ns:
+            return
+        yield from _read_segment(base, start_ns, end_ns, kinds)
+
+
+race_recorder = RaceRecorder(RACE_RECORDING_DIR, enabled=RACE_RECORDING)
+# Raw MQTT and XMPP traffic exactly as received, for replay.py
+traffic_capture = RaceRecorder(TRAFFIC_CAPTURE_DIR, enabled=TRAFFIC_CAPTURE)
@@ -1,6 +1,14 @@
-from utils.log_utils import parse_timestamp, add_mqtt_log
+from datetime import datetime
+import threading
+import time
 
-from config import ROBOT_NAMES, PENALTY_TIME_SECONDS
+from utils.log_utils import parse_timestamp, add_mqtt_log, bump_version, RACE_PANEL
+from utils.race_journal import RaceJournal
+from utils.robot_registry import get_robot_ids
+from utils.state_store import get_state_store, ingest_action
+from utils.metrics import counter, histogram
+
+from config import PENALTY_TIME_SECONDS, RACE_JOURNAL_FILE, RACE_SNAPSHOT_FILE
 
 race_state = {
     "start_time": None,
@@ -8,45 +16,173 @@ race_state = {
     "running": False,
     "elapsed": 0.0,
     "delta": None,
-    "penalties": {robot: 0 for robot in ROBOT_NAMES},
-    "penalty_cooldown": {robot: False for robot in ROBOT_NAMES},
+    "penalties": {robot: 0 for robot in get_robot_ids()},
+    "penalty_cooldown": {robot: False for robot in get_robot_ids()},
+}
+
+RACE_STATE_KEY = "race_state"
+
+def get_race_state():
+    """Current race state; a copy from the ingest process in web workers."""
+    return get_state_store().get(RACE_STATE_KEY, race_state)
+
+def _publish():
+    get_state_store().set(RACE_STATE_KEY, race_state)
+
+# State transitions. They are applied live and replayed from the journal on
+# startup, so they must only depend on their arguments and race_state.
+def _start(timestamp):
+    race_state["start_time"] = timestamp
+    race_state["running"] = True
+    race_state["delta"] = None
+
+def _finish(topic, timestamp):
+    race_state["finish_times"][topic] = timestamp
+
+    if len(race_state["finish_times"]) >= 2:
+        finish_times = list(race_state["finish_times"].values())
+        last_finish = max(finish_times)
+        race_state["delta"] = abs((finish_times[0] - finish_times[1]).total_seconds())
+        base_elapsed = (last_finish - race_state["start_time"]).total_seconds()
+        penalty_time = sum(race_state.get("penalties", {}).values()) * PENALTY_TIME_SECONDS
+        race_state["elapsed"] = base_elapsed + penalty_time
+        race_state["running"] = False
+        return base_elapsed, penalty_time
+    return None
+
+def _penalty(robot_id):
+    race_state["penalties"][robot_id] = race_state["penalties"].get(robot_id, 0) + 1
+    race_state["elapsed"] += PENALTY_TIME_SECONDS
+
+def _reset():
+    race_state["start_time"] = None
+    race_state["finish_times"] = {}
+    race_state["running"] = False
+    race_state["elapsed"] = 0.0
+    race_state["delta"] = None
+    race_state["penalties"] = {robot: 0 for robot in get_robot_ids()}
+
+_TRANSITIONS = {
+    "start": _start,
+    "finish": _finish,
+    "penalty": _penalty,
+    "reset": _reset,
 }
 
-def handle_gate_event(topic, payload):
-    global race_state
+def _serialize_state():
+    return {
+        "start_time": race_state["start_time"].isoformat() if race_state["start_time"] else None,
+        "finish_times": {topic: ts.isoformat() for topic, ts in race_state["finish_times"].items()},
+        "running": race_state["running"],
+        "elapsed": race_state["elapsed"],
+        "delta": race_state["delta"],
+        "penalties": dict(race_state["penalties"]),
+    }
 
-    timestamp = parse_timestamp(payload)
+def _load_state(state):
+    race_state["start_time"] = datetime.fromisoformat(state["start_time"]) if state["start_time"] else None
+    race_state["finish_times"] = {topic: datetime.fromisoformat(ts) for topic, ts in state["finish_times"].items()}
+    race_state["running"] = state["running"]
+    race_state["elapsed"] = state["elapsed"]
+    race_state["delta"] = state["delta"]
+    race_state["penalties"] = {robot: 0 for robot in get_robot_ids()}
+    race_state["penalties"].update(state["penalties"])
+
+RACE_TRANSITIONS = counter("dashboard_race_transitions_total", "Race state transitions applied", ["op"])
+GATE_EVENTS = histogram("dashboard_gate_event_seconds", "Time spent handling a gate event")
+
+_journal = RaceJournal(RACE_JOURNAL_FILE, RACE_SNAPSHOT_FILE, _serialize_state)
+# Keeps journal order identical to the order transitions were applied in.
+# Reentrant: gate events hold it across their checks and the transition.
+_transition_lock = threading.RLock()
+
+def _record(op, **data):
+    with _transition_lock:
+        result = _TRANSITIONS[op](**data)
+        _publish()
+        _journal.append(op, {
+            key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in data.items()
+        })
+    RACE_TRANSITIONS.inc(op=op)
+    return result
+
+def restore_race_state():
+    """Rebuild the current race from the latest snapshot plus newer journal entries."""
+    snapshot, entries = _journal.load()
+    with _transition_lock:
+        if snapshot:
+            _load_state(snapshot)
+        for entry in entries:
+            data = {key: value for key, value in entry.items() if key not in ("seq", "op")}
+            if "timestamp" in data:
+                data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+            _TRANSITIONS[entry["op"]](**data)
+        _publish()
+
+    if snapshot or entries:
+        print(f"🔁 Race state restored ({len(entries)} journal entries replayed)", flush=True)
+        bump_version(RACE_PANEL)
+
+def handle_gate_event(topic, payload, received_at=None):
+    started = time.perf_counter()
+    # Without a timestamp in the payload, the time the message was received
+    # is closer to the real event than the time it gets processed.
+    timestamp = parse_timestamp(payload, default=received_at)
 
     print(f"{timestamp} received from payload {payload}", flush=True)
 
+    # The checks and the transition happen under one lock, so a reset from
+    # the dashboard can't land in between
     if "start" in topic and payload == "object_detected":
-        if not race_state["running"] and race_state["start_time"] is None:
-            race_state["start_time"] = timestamp
-            race_state["running"] = True
-            race_state["delta"] = None
+        with _transition_lock:
+            running = race_state["running"]
+            starting = not running and race_state["start_time"] is None
+            if starting:
+                _record("start", timestamp=timestamp)
+        if starting:
             add_mqtt_log(f"[RACE] Start triggered at {timestamp.time()}")
-        elif race_state["running"]:
+        elif running:
             add_mqtt_log("[RACE] Start gate already triggered")
         else:
             add_mqtt_log("[RACE] Already started, need to reset to restart")
 
 
     elif "finish" in topic and payload == "object_detected":
-        if topic not in race_state["finish_times"] and race_state["running"]:
-            race_state["finish_times"][topic] = timestamp
+        with _transition_lock:
+            finishing = topic not in race_state["finish_times"] and race_state["running"]
+            if finishing:
+                result = _record("finish", topic=topic, timestamp=timestamp)
+                elapsed, delta = race_state["elapsed"], race_state["delta"]
+        if finishing:
             add_mqtt_log(f"[RACE] Finish {topic} at {timestamp.time()}")
 
-            if len(race_state["finish_times"]) >= 2:
-                finish_times = list(race_state["finish_times"].values())
-                last_finish = max(finish_times)
-                race_state["delta"] = abs((finish_times[0] - finish_times[1]).total_seconds())
-                base_elapsed = (last_finish - race_state["start_time"]).total_seconds()
-                penalty_time = sum(race_state.get("penalties", {}).values()) * PENALTY_TIME_SECONDS
-                race_state["elapsed"] = base_elapsed + penalty_time
-                race_state["running"] = False
-
+            if result:
+                base_elapsed, penalty_time = result
                 add_mqtt_log(
-                    f"[RACE ✅] Base: {base_elapsed:.3f}s + Penalty: {penalty_time:.3f}s = Total: {race_state['elapsed']:.3f}s | Δ Finish: {race_state['delta']:.3f}s"
+                    f"[RACE ✅] Base: {base_elapsed:.3f}s + Penalty: {penalty_time:.3f}s = Total: {elapsed:.3f}s | Δ Finish: {delta:.3f}s"
                 )
         else:
-            add_mqtt_log(f"[RACE] Finish gate {topic} already triggered")
\ No newline at end of file
+            add_mqtt_log(f"[RACE] Finish gate {topic} already triggered")
+
+    bump_version(RACE_PANEL)
+    GATE_EVENTS.observe(time.perf_counter() - started)
+
+@ingest_action
+def reset_race():
+    _record("reset")
+    bump_version(RACE_PANEL)
+
+@ingest_action
+def apply_penalty(robot_id):
+    _record("penalty", robot_id=robot_id)
+    race_state["penalty_cooldown"][robot_id] = True
+    _publish()
+    bump_version(RACE_PANEL)
+    return race_state["penalties"].get(robot_id, 0)
+
+@ingest_action
+def clear_penalty_cooldown(robot_id):
+    race_state["penalty_cooldown"][robot_id] = False
+    _publish()
+    bump_version(RACE_PANEL)
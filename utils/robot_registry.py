@@ -0,0 +1,40 @@
+from utils.log_utils import bump_version, ROBOT_PANEL_KINDS, ROBOTS_PANEL
+from utils.state_store import get_state_store
+
+from config import ROBOT_NAMES
+
+# Robots known to the dashboard: the configured ones, plus any robot_id seen
+# in XMPP message metadata at runtime. The list itself is in the state store;
+# `_known` only saves a store round trip for robots already registered.
+_known = set()
+
+
+def get_robot_ids():
+    return get_state_store().get_robots()
+
+def is_robot(robot_id):
+    return robot_id in _known or get_state_store().is_robot(robot_id)
+
+def parse_robot_panel(panel):
+    """Return (kind, robot_id) for a per-robot panel key, or None."""
+    # Longest kinds first, so "path-image" isn't taken for "image"
+    for kind in sorted(ROBOT_PANEL_KINDS, key=len, reverse=True):
+        suffix = f"-{kind}"
+        if panel.endswith(suffix) and is_robot(panel[:-len(suffix)]):
+            return kind, panel[:-len(suffix)]
+    return None
+
+def register_robot(robot_id, announce=True):
+    """Add a robot if it is new; returns True when it was."""
+    if robot_id in _known:
+        return False
+    is_new = get_state_store().add_robot(robot_id)
+    _known.add(robot_id)
+
+    if is_new and announce:
+        print(f"🤖 New robot discovered: {robot_id}", flush=True)
+        bump_version(ROBOTS_PANEL)
+    return is_new
+
+for _robot_id in ROBOT_NAMES:
+    register_robot(_robot_id, announce=False)
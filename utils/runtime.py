@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+
+from utils.metrics import histogram, LATENCY_BUCKETS
+
+from config import RUNTIME_LAG_CHECK_SECONDS
+
+RUNTIME_LAG = histogram("dashboard_runtime_lag_seconds", "How late the shared event loop runs its callbacks", buckets=LATENCY_BUCKETS)
+
+
+class Runtime:
+    """One event loop on one thread, shared by the XMPP agents and MQTT.
+
+    Network I/O of the ingest side all happens here, so there is a single
+    thread to reason about instead of one per connection. Other threads
+    (Dash callbacks, the ingest dispatcher) hand work over with `submit`,
+    `call_soon` and `call_later`, which are thread-safe. Callbacks running on
+    the loop must not block: anything slow holds up every connection.
+    """
+
+    def __init__(self, name="runtime"):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._started = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        self._started.wait()
+        return self._loop
+
+    @property
+    def loop(self):
+        return self.start()
+
+    def in_loop(self):
+        """Whether the caller runs on the loop's thread."""
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro):
+        """Run a coroutine on the loop; returns a concurrent.futures.Future.
+
+        Errors nobody waits for are logged rather than lost.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def call_soon(self, callback, *args):
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def call_later(self, delay, callback, *args):
+        self.call_soon(self._loop.call_later, delay, callback, *args)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.create_task(self._watch_lag())
+        self._started.set()
+        self._loop.run_forever()
+
+    async def _watch_lag(self):
+        while True:
+            due = time.monotonic() + RUNTIME_LAG_CHECK_SECONDS
+            await asyncio.sleep(RUNTIME_LAG_CHECK_SECONDS)
+            RUNTIME_LAG.observe(max(0.0, time.monotonic() - due))
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"⚠️ Runtime task failed: {future.exception()!r}", flush=True)
+
+
+runtime = Runtime()
@@ -0,0 +1,231 @@
+from collections import deque
+from multiprocessing.managers import BaseManager
+import functools
+import threading
+import time
+
+from config import STATE_STORE_HOST, STATE_STORE_PORT, STATE_STORE_AUTHKEY, STATE_STORE_CONNECT_TIMEOUT_SECONDS
+
+
+class LogRing:
+    """Thread-safe bounded log where every entry gets an increasing sequence number.
+
+    Iterating yields messages newest first. Readers keep the last sequence
+    number they have seen and ask for `since(seq)` to get only the delta.
+    """
+
+    def __init__(self, maxlen):
+        self.maxlen = maxlen
+        self._entries = deque(maxlen=maxlen)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def append(self, message):
+        with self._lock:
+            self._seq += 1
+            self._entries.append((self._seq, message))
+            return self._seq
+
+    def since(self, seq):
+        """Return (entries newer than `seq` newest first, reset, last seq).
+
+        `reset` is True when the reader can't just prepend the entries: some
+        it hasn't seen were already evicted, or `seq` comes from another run.
+        """
+        with self._lock:
+            last_seq = self._seq
+            oldest_seq = self._entries[0][0] if self._entries else last_seq + 1
+            reset = seq > last_seq or seq < oldest_seq - 1
+            if reset:
+                seq = 0
+            entries = []
+            for entry in reversed(self._entries):
+                if entry[0] <= seq:
+                    break
+                entries.append(entry)
+        return entries, reset, last_seq
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def __iter__(self):
+        with self._lock:
+            messages = [message for _, message in reversed(self._entries)]
+        return iter(messages)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LocalStateStore:
+    """All live dashboard state: values, logs, panel versions, frames and robots.
+
+    Used directly when the dashboard runs as a single process. With several
+    web workers, the ingest process keeps the only instance and serves it
+    over `serve_state_store`; workers reach it through a proxy with the same
+    methods, so arguments and results are plain picklable values.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._logs = {}
+        self._versions = {}
+        self._frames = {}
+        self._robots = []
+
+    # Plain values
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def set(self, key, value):
+        self._values[key] = value
+
+    def set_field(self, key, field, value):
+        """Set one field of a dict value; returns True if it changed."""
+        with self._lock:
+            fields = self._values.setdefault(key, {})
+            changed = fields.get(field) != value
+            fields[field] = value
+        return changed
+
+    # Logs
+    def _log(self, name, maxlen=None):
+        with self._lock:
+            if name not in self._logs and maxlen:
+                self._logs[name] = LogRing(maxlen)
+            return self._logs.get(name)
+
+    def append_log(self, name, message, maxlen):
+        return self._log(name, maxlen).append(message)
+
+    def log_since(self, name, seq):
+        log = self._log(name)
+        return log.since(seq) if log else ([], seq > 0, 0)
+
+    def log_messages(self, name):
+        log = self._log(name)
+        return list(log) if log else []
+
+    def log_last_seq(self, name):
+        log = self._log(name)
+        return log.last_seq if log else 0
+
+    # Panel versions
+    def bump_version(self, panel):
+        with self._lock:
+            self._versions[panel] = self._versions.get(panel, 0) + 1
+            return self._versions[panel]
+
+    def get_versions(self):
+        with self._lock:
+            return dict(self._versions)
+
+    # Frames
+    def put_frame(self, store, source, renditions):
+        """Keep `renditions` as the latest frame of `source`; returns its version."""
+        with self._lock:
+            previous = self._frames.get((store, source))
+            version = previous[0] + 1 if previous else 1
+            self._frames[(store, source)] = (version, renditions)
+        return version
+
+    def get_frame(self, store, source):
+        """(version, renditions) of the latest frame, or None."""
+        return self._frames.get((store, source))
+
+    def get_frame_version(self, store, source):
+        """Version of the latest frame, or None; unlike get_frame, no JPEG data is copied."""
+        stored = self._frames.get((store, source))
+        return stored[0] if stored else None
+
+    # Robots
+    def add_robot(self, robot_id):
+        """Returns True if the robot was not known yet."""
+        with self._lock:
+            if robot_id in self._robots:
+                return False
+            self._robots.append(robot_id)
+            return True
+
+    def get_robots(self):
+        with self._lock:
+            return list(self._robots)
+
+    def is_robot(self, robot_id):
+        return robot_id in self._robots
+
+    # Actions
+    def run_action(self, name, args, kwargs):
+        return _actions[name](*args, **kwargs)
+
+
+# Functions that must run in the process owning the MQTT/XMPP connections
+_actions = {}
+
+def ingest_action(func):
+    """Run `func` in the ingest process when called from a web worker.
+
+    In a single process this is a plain call. Arguments and the return value
+    must be picklable.
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+    _actions[name] = func
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        store = get_state_store()
+        if isinstance(store, LocalStateStore):
+            return func(*args, **kwargs)
+        return store.run_action(name, args, kwargs)
+
+    return run
+
+
+class StateStoreManager(BaseManager):
+    pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_state_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LocalStateStore()
+    return _store
+
+def is_shared_client():
+    """True in web workers using the ingest process's state store."""
+    return not isinstance(get_state_store(), LocalStateStore)
+
+def serve_state_store():
+    """Serve this process's state store to web workers (blocks)."""
+    store = get_state_store()
+    StateStoreManager.register("state_store", callable=lambda: store)
+    manager = StateStoreManager(address=(STATE_STORE_HOST, STATE_STORE_PORT), authkey=STATE_STORE_AUTHKEY)
+    server = manager.get_server()
+    print(f"🗄️ State store serving on {STATE_STORE_HOST}:{STATE_STORE_PORT}", flush=True)
+    server.serve_forever()
+
+def connect_state_store():
+    """Use the ingest process's state store; call before importing the app."""
+    global _store
+    StateStoreManager.register("state_store")
+    manager = StateStoreManager(address=(STATE_STORE_HOST, STATE_STORE_PORT), authkey=STATE_STORE_AUTHKEY)
+    deadline = time.monotonic() + STATE_STORE_CONNECT_TIMEOUT_SECONDS
+    while True:
+        try:
+            manager.connect()
+            break
+        except ConnectionError:
+            if time.monotonic() > deadline:
+                raise
+            print("⏳ Waiting for the ingest process state store...", flush=True)
+            time.sleep(1)
+    with _store_lock:
+        _store = manager.state_store()
+    print(f"🗄️ Connected to state store on {STATE_STORE_HOST}:{STATE_STORE_PORT}", flush=True)
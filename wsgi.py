@@ -0,0 +1,21 @@
+"""WSGI entry point for the web workers, e.g.
+
+    python ingest.py
+    gunicorn --workers 4 --worker-class gthread --threads 32 --bind 0.0.0.0:8050 wsgi:application
+
+Workers read live state from the ingest process and forward commands to it.
+
+Every open dashboard holds a thread for as long as it is open: one for its
+push stream (/events), plus one per camera with USE_MJPEG_STREAM. Only the
+threads left over serve callbacks, so size workers x threads well above the
+number of open tabs times their streams; a few tabs on 4 x 8 threads are
+enough to stall every callback.
+"""
+from utils.state_store import connect_state_store
+
+# Before importing the app, so every module uses the shared store
+connect_state_store()
+
+from app import app
+
+application = app.server